@@ -0,0 +1,253 @@
+"""
+오프라인 부하 테스트. 가짜 업스트림(bench.stub_upstream)과 앱을 각각 uvicorn으로 띄우고
+/search, /compare, /season, /product-stats, /domeggook/search를 목표 동시성으로 호출해
+엔드포인트별 RPS와 p50/p95/p99를 출력.
+
+    python -m bench.run --concurrency 50 --duration 15
+    python -m bench.run --endpoints search,compare --max-p95-ms 200   # 기준 초과 시 종료코드 1
+    python -m bench.run --workers 4   # gunicorn 멀티 워커 + 공유 캐시
+    python -m bench.run --endpoints orders   # 주문 증분 수집 + 실적 요약 (스마트스토어·쿠팡 스텁)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from bench import stub_upstream
+
+ROOT = Path(__file__).resolve().parent.parent
+
+QUERIES = [
+    "핫팩", "방한용품", "가습기", "선풍기", "캠핑", "수영복", "선크림", "모기장",
+    "추석선물", "등산용품", "크리스마스선물", "텀블러", "무선이어폰", "요가매트",
+    "물티슈", "강아지간식", "보조배터리", "에어프라이어", "우산", "마스크",
+]
+
+ENDPOINTS = {
+    "search": lambda q: ("GET", "/search", {"query": q}),
+    "compare": lambda q: ("GET", "/compare", {"query": q, "cost": random.randint(1, 20) * 1000}),
+    "season": lambda q: ("GET", "/season", {"month": random.randint(1, 12)}),
+    "product-stats": lambda q: ("GET", "/product-stats", {"query": q}),
+    "domeggook": lambda q: ("GET", "/domeggook/search", {"query": q}),
+    "orders": lambda q: ("GET", "/orders/summary", {}),
+}
+# 기본 측정 대상 (orders는 --endpoints로 지정할 때만)
+DEFAULT_ENDPOINTS = ["search", "compare", "season", "product-stats", "domeggook"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start(module, port, env, workers=1):
+    if workers > 1:
+        command = ["-m", "gunicorn", "-c", "gunicorn.conf.py", module, "--log-level", "warning"]
+        env = {**env, "WEB_CONCURRENCY": str(workers), "PORT": str(port)}
+    else:
+        command = ["-m", "uvicorn", module, "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen([sys.executable, *command], cwd=ROOT, env=env)
+
+
+def _wait_ready(url, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} 기동 실패")
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def _drive(base_url, endpoints, concurrency, duration, queries, warmup):
+    samples = {name: [] for name in endpoints}
+    errors = {name: 0 for name in endpoints}
+    headers = {
+        "X-Domeggook-Key": "bench-key",
+        "X-Smartstore-Client-Id": "bench-client",
+        "X-Smartstore-Client-Secret": stub_upstream.SMARTSTORE_SECRET,
+        "X-Coupang-Access-Key": "bench-access",
+        "X-Coupang-Secret-Key": stub_upstream.COUPANG_SECRET,
+        "X-Coupang-Vendor-Id": "A00000000",
+    }
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        for q in queries[:warmup]:
+            await client.get("/search", params={"query": q})
+        stop_at = time.monotonic() + duration
+
+        async def worker(worker_id):
+            i = worker_id
+            while time.monotonic() < stop_at:
+                name = endpoints[i % len(endpoints)]
+                i += 1
+                method, path, params = ENDPOINTS[name](random.choice(queries))
+                started = time.perf_counter()
+                try:
+                    res = await client.request(method, path, params=params)
+                    ok = res.status_code == 200 and res.json().get("success", True)
+                except Exception:
+                    ok = False
+                samples[name].append((time.perf_counter() - started) * 1000)
+                if not ok:
+                    errors[name] += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+    return samples, errors, elapsed
+
+
+def _report(samples, errors, elapsed):
+    rows = {}
+    all_samples = []
+    for name, values in samples.items():
+        values.sort()
+        all_samples.extend(values)
+        rows[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(_percentile(values, 50), 1),
+            "p95_ms": round(_percentile(values, 95), 1),
+            "p99_ms": round(_percentile(values, 99), 1),
+        }
+    all_samples.sort()
+    rows["total"] = {
+        "requests": len(all_samples),
+        "errors": sum(errors.values()),
+        "rps": round(len(all_samples) / elapsed, 1),
+        "p50_ms": round(_percentile(all_samples, 50), 1),
+        "p95_ms": round(_percentile(all_samples, 95), 1),
+        "p99_ms": round(_percentile(all_samples, 99), 1),
+    }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="셀러마진 API 오프라인 부하 테스트")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="측정 시간(초)")
+    parser.add_argument("--endpoints", default=",".join(DEFAULT_ENDPOINTS))
+    parser.add_argument("--queries", type=int, default=len(QUERIES), help="사용할 검색어 수 (캐시 적중률 조절)")
+    parser.add_argument("--warmup", type=int, default=0, help="측정 전 미리 조회할 검색어 수")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="가짜 업스트림 평균 지연")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="가짜 업스트림 500 비율")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="가짜 업스트림 429 비율")
+    parser.add_argument("--workers", type=int, default=1, help="앱 워커 수 (2 이상이면 gunicorn)")
+    parser.add_argument("--app-env", action="append", default=[], help="앱 환경변수 KEY=VALUE (반복 가능)")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    parser.add_argument("--max-p95-ms", type=float, default=0, help="전체 p95가 넘으면 종료코드 1")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"알 수 없는 엔드포인트: {', '.join(unknown)}")
+    queries = QUERIES[: max(1, args.queries)]
+    if args.queries > len(QUERIES):
+        queries = QUERIES + [f"상품{i}" for i in range(args.queries - len(QUERIES))]
+
+    stub_port, app_port = _free_port(), _free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    with tempfile.TemporaryDirectory() as data_dir:
+        stub_env = {
+            **os.environ,
+            "STUB_LATENCY_MS": str(args.latency_ms),
+            "STUB_JITTER_MS": str(args.jitter_ms),
+            "STUB_ERROR_RATE": str(args.error_rate),
+            "STUB_429_RATE": str(args.rate_limit_rate),
+        }
+        app_env = {
+            **os.environ,
+            "NAVER_CLIENT_ID": "bench-client",
+            "NAVER_CLIENT_SECRET": "bench-secret",
+            "NAVER_API_BASE": stub_url,
+            "DOMEGGOOK_API_BASE": stub_url,
+            "KAKAO_API_BASE": stub_url,
+            "KAKAO_AUTH_BASE": stub_url,
+            "SMARTSTORE_API_BASE": stub_url,
+            "COUPANG_API_BASE": stub_url,
+            "TREND_DB_PATH": str(Path(data_dir) / "trend.sqlite3"),
+            "DOMEGGOOK_DB_PATH": str(Path(data_dir) / "domeggook.sqlite3"),
+            "PRICE_DB_PATH": str(Path(data_dir) / "prices.sqlite3"),
+            "WATCH_DB_PATH": str(Path(data_dir) / "watchlist.sqlite3"),
+            "ORDER_DB_PATH": str(Path(data_dir) / "orders.sqlite3"),
+            "SHARED_CACHE_PATH": str(Path(data_dir) / "shared_cache.sqlite3"),
+            # 부하 테스트에서는 앱 자체 처리량을 보기 위해 쿼터·속도 제한을 풀어둠
+            "NAVER_RATE_PER_SEC": "100000",
+            "NAVER_RATE_BURST": "100000",
+            "NAVER_SEARCH_DAILY_LIMIT": "0",
+            "NAVER_DATALAB_DAILY_LIMIT": "0",
+            "NAVER_INSIGHT_DAILY_LIMIT": "0",
+            "DOMEGGOOK_RATE_PER_SEC": "100000",
+            "DOMEGGOOK_RATE_BURST": "100000",
+            "SMARTSTORE_RATE_PER_SEC": "100000",
+            "SMARTSTORE_RATE_BURST": "100000",
+            "COUPANG_RATE_PER_SEC": "100000",
+            "COUPANG_RATE_BURST": "100000",
+        }
+        for pair in args.app_env:
+            key, _, value = pair.partition("=")
+            app_env[key] = value
+        stub = _start("bench.stub_upstream:app", stub_port, stub_env)
+        app = _start("main:app", app_port, app_env, args.workers)
+        try:
+            _wait_ready(f"{stub_url}/docs")
+            _wait_ready(f"http://127.0.0.1:{app_port}/")
+            samples, errors, elapsed = asyncio.run(_drive(
+                f"http://127.0.0.1:{app_port}",
+                endpoints,
+                args.concurrency,
+                args.duration,
+                queries,
+                args.warmup,
+            ))
+        finally:
+            app.terminate()
+            stub.terminate()
+            app.wait()
+            stub.wait()
+
+    rows = _report(samples, errors, elapsed)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print(
+            f"concurrency={args.concurrency} workers={args.workers} duration={elapsed:.1f}s"
+            f" upstream_latency={args.latency_ms}ms"
+        )
+        print(f"{'endpoint':<15}{'requests':>10}{'errors':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for name, row in rows.items():
+            print(
+                f"{name:<15}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10}"
+                f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+            )
+    if args.max_p95_ms and rows["total"]["p95_ms"] > args.max_p95_ms:
+        print(f"p95 {rows['total']['p95_ms']}ms > 기준 {args.max_p95_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+"""
+로컬 가짜 업스트림 (네이버 검색·데이터랩·쇼핑인사이트 / 도매꾹 / 카카오(메모·토큰) / 스마트스토어·쿠팡 주문).
+같은 입력이면 항상 같은 응답. 지연·에러는 환경변수로 주입.
+
+    STUB_LATENCY_MS=50 STUB_JITTER_MS=20 STUB_ERROR_RATE=0.01 uvicorn bench.stub_upstream:app --port 9100
+
+앱은 NAVER_API_BASE / DOMEGGOOK_API_BASE / KAKAO_API_BASE / KAKAO_AUTH_BASE / SMARTSTORE_API_BASE / COUPANG_API_BASE를
+이 서버 주소로 지정해 실행.
+"""
+import asyncio
+import base64
+import datetime
+import functools
+import hashlib
+import hmac
+import os
+import random
+import time
+
+import bcrypt
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="stub upstream")
+
+LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", 30))
+JITTER_MS = float(os.environ.get("STUB_JITTER_MS", 10))
+ERROR_RATE = float(os.environ.get("STUB_ERROR_RATE", 0))
+RATE_LIMIT_RATE = float(os.environ.get("STUB_429_RATE", 0))
+
+CATEGORIES = [
+    ("생활/건강", "생활용품", "세탁용품", ""),
+    ("패션의류", "여성의류", "원피스", ""),
+    ("식품", "건강식품", "영양제", ""),
+    ("디지털/가전", "계절가전", "선풍기", ""),
+    ("화장품/미용", "스킨케어", "선크림", ""),
+    ("스포츠/레저", "캠핑", "텐트", ""),
+]
+MALLS = ["네이버", "쿠팡", "11번가", "G마켓", "옥션", "위메프", "티몬"]
+
+
+def _rng(*parts):
+    seed = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+
+async def _simulate():
+    """지연 주입 후 에러/429 응답(없으면 None)."""
+    delay = max(0.0, LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS)) / 1000
+    if delay:
+        await asyncio.sleep(delay)
+    roll = random.random()
+    if roll < RATE_LIMIT_RATE:
+        return JSONResponse(
+            {"errorMessage": "Rate limit exceeded.", "errorCode": "012"},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+    if roll < RATE_LIMIT_RATE + ERROR_RATE:
+        return JSONResponse({"errorMessage": "System error.", "errorCode": "999"}, status_code=500)
+    return None
+
+
+# ---------- 네이버 쇼핑 검색 ----------
+@app.get("/v1/search/shop.json")
+async def shop(query: str, display: int = 10, start: int = 1, sort: str = "sim"):
+    error = await _simulate()
+    if error:
+        return error
+    rng = _rng("shop", query)
+    base = rng.randint(5, 200) * 1000
+    total = rng.randint(50, 500000)
+    category = CATEGORIES[rng.randrange(len(CATEGORIES))]
+    items = []
+    for i in range(start, min(start + display, min(total, 1000) + 1)):
+        r = _rng("item", query, i)
+        # 액세서리·묶음상품 잡음: 가끔 아주 싸거나 비싼 상품
+        factor = r.choice([0.1, 3.5]) if r.random() < 0.08 else r.uniform(0.7, 1.4)
+        items.append({
+            "title": f"<b>{query}</b> {r.choice(['정품', '특가', '대용량', '1+1', '무료배송'])} {i}",
+            "link": f"https://search.shopping.naver.com/stub/{i}",
+            "image": f"https://shopping-phinf.pstatic.net/stub/{i}.jpg",
+            "lprice": str(int(base * factor) // 10 * 10),
+            "hprice": "",
+            "mallName": r.choice(MALLS),
+            "productId": str(r.randint(10**9, 10**10)),
+            "productType": "1",
+            "brand": "",
+            "maker": "",
+            "category1": category[0],
+            "category2": category[1],
+            "category3": category[2],
+            "category4": category[3],
+        })
+    return {
+        "lastBuildDate": "Sat, 17 Oct 2026 12:00:00 +0900",
+        "total": total,
+        "start": start,
+        "display": len(items),
+        "items": items,
+    }
+
+
+# ---------- 데이터랩 검색어 트렌드 ----------
+@app.post("/v1/datalab/search")
+async def datalab_search(request: Request):
+    error = await _simulate()
+    if error:
+        return error
+    body = await request.json()
+    groups = body.get("keywordGroups", [])
+    if not groups or len(groups) > 5:
+        return JSONResponse({"errorMessage": "Invalid keywordGroups.", "errorCode": "400"}, status_code=400)
+    series = []
+    for g in groups:
+        rng = _rng("trend", g["groupName"])
+        peak = rng.randrange(12)
+        series.append([
+            rng.uniform(5, 40) + 60 * max(0.0, 1 - abs(m - peak) / 3) for m in range(12)
+        ])
+    top = max(max(s) for s in series)
+    return {
+        "startDate": body.get("startDate"),
+        "endDate": body.get("endDate"),
+        "timeUnit": body.get("timeUnit"),
+        "results": [
+            {
+                "title": g["groupName"],
+                "keywords": g["keywords"],
+                "data": [
+                    {"period": f"2026-{m + 1:02d}-01", "ratio": round(v * 100 / top, 5)}
+                    for m, v in enumerate(s)
+                ],
+            }
+            for g, s in zip(groups, series)
+        ],
+    }
+
+
+# ---------- 데이터랩 쇼핑인사이트 ----------
+@app.post("/v1/datalab/shopping/categories")
+async def shopping_categories(request: Request):
+    error = await _simulate()
+    if error:
+        return error
+    body = await request.json()
+    return {
+        "startDate": body.get("startDate"),
+        "endDate": body.get("endDate"),
+        "timeUnit": body.get("timeUnit"),
+        "results": [
+            {
+                "title": c.get("name"),
+                "category": c.get("param"),
+                "data": [{"period": "2026-08-01", "ratio": 100}],
+            }
+            for c in body.get("category", [])
+        ],
+    }
+
+
+_INSIGHT_GROUPS = {
+    "gender": ["f", "m"],
+    "age": ["10", "20", "30", "40", "50", "60"],
+    "device": ["pc", "mo"],
+}
+
+
+@app.post("/v1/datalab/shopping/category/keyword/{breakdown}")
+async def shopping_keyword_breakdown(breakdown: str, request: Request):
+    error = await _simulate()
+    if error:
+        return error
+    groups = _INSIGHT_GROUPS.get(breakdown)
+    if groups is None:
+        return JSONResponse({"errorMessage": "Not found.", "errorCode": "404"}, status_code=404)
+    body = await request.json()
+    rng = _rng("insight", breakdown, body.get("category"), body.get("keyword"))
+    data = []
+    for month in (8, 9, 10):
+        for group in groups:
+            data.append({
+                "period": f"2026-{month:02d}-01",
+                "group": group,
+                "ratio": round(rng.uniform(5, 100), 5),
+            })
+    return {
+        "startDate": body.get("startDate"),
+        "endDate": body.get("endDate"),
+        "timeUnit": body.get("timeUnit"),
+        "results": [{"title": body.get("keyword"), "keyword": [body.get("keyword")], "data": data}],
+    }
+
+
+# ---------- 도매꾹 ----------
+def _domeggook_item(no: int):
+    r = _rng("dome", no)
+    return {
+        "no": str(no),
+        "name": f"도매 상품 {no} {r.choice(['블랙', '화이트', '대형', '소형'])} (옵션{r.randint(1, 5)})",
+        "price": str(r.randint(5, 300) * 100),
+        "stock": r.randint(0, 5000),
+        "seller": f"공급사{r.randint(1, 50)}",
+        "minQty": r.choice([1, 1, 1, 5, 10]),
+        "category": f"{r.randint(1, 20):02d}",
+        "img": f"https://cdn.domeggook.com/stub/{no}.jpg",
+    }
+
+
+@app.get("/ssl/api/")
+async def domeggook(
+    cmd: str,
+    aid: str = "",
+    no: str = "",
+    keyword: str = "",
+    ca: str = "",
+    pageNum: int = 1,
+    pageSize: int = 20,
+):
+    error = await _simulate()
+    if error:
+        return error
+    if not aid:
+        return {"errors": {"message": "aid required"}}
+    if cmd == "getItem":
+        if not no.isdigit():
+            return {"errors": {"message": "item not found"}}
+        return {"item": _domeggook_item(int(no))}
+    if cmd == "getItemList":
+        rng = _rng("domelist", keyword, ca)
+        total = rng.randint(0, 800)
+        first = rng.randint(10**6, 10**7)
+        start = (max(pageNum, 1) - 1) * pageSize
+        items = []
+        for i in range(start, min(start + pageSize, total)):
+            item = _domeggook_item(first + i)
+            if keyword:
+                item["name"] = f"{keyword} {item['name']}"
+            items.append(item)
+        return {"totalCount": total, "list": items}
+    return {"errors": {"message": f"unknown cmd {cmd}"}}
+
+
+# ---------- 카카오 나에게 보내기 ----------
+@app.post("/v2/api/talk/memo/default/send")
+async def kakao_memo(request: Request):
+    error = await _simulate()
+    if error:
+        return error
+    auth = request.headers.get("Authorization", "")
+    # "Bearer expired…" = 만료된 액세스 토큰
+    if not auth.startswith("Bearer ") or auth.startswith("Bearer expired"):
+        return JSONResponse({"msg": "this access token does not exist", "code": -401}, status_code=401)
+    return {"result_code": 0}
+
+
+@app.post("/oauth/token")
+async def kakao_oauth_token(request: Request):
+    error = await _simulate()
+    if error:
+        return error
+    form = await request.form()
+    refresh = form.get("refresh_token", "")
+    if form.get("grant_type") != "refresh_token" or not form.get("client_id") or not refresh or refresh == "invalid":
+        return JSONResponse(
+            {"error": "invalid_grant", "error_description": "invalid refresh token", "error_code": "KOE322"},
+            status_code=400,
+        )
+    return {
+        "access_token": "fresh-" + hashlib.sha256(refresh.encode()).hexdigest()[:16],
+        "token_type": "bearer",
+        "expires_in": 21599,
+    }
+
+
+@app.get("/v1/user/access_token_info")
+async def kakao_token_info(request: Request):
+    error = await _simulate()
+    if error:
+        return error
+    auth = request.headers.get("Authorization", "")
+    if not auth.startswith("Bearer ") or auth == "Bearer invalid":
+        return JSONResponse({"msg": "this access token does not exist", "code": -401}, status_code=401)
+    # 같은 토큰 → 같은 회원번호
+    return {"id": int(hashlib.sha256(auth.encode()).hexdigest()[:12], 16), "expires_in": 7199, "app_id": 1}
+
+
+# ---------- 마켓 주문 (스마트스토어 커머스API / 쿠팡 Wing) ----------
+# 서명 검증용 비밀값: 앱 쪽 헤더에 같은 값을 넣어야 통과
+SMARTSTORE_SECRET = os.environ.get("STUB_SMARTSTORE_SECRET", "$2a$04$benchstubsaltvalue000u")
+COUPANG_SECRET = os.environ.get("STUB_COUPANG_SECRET", "bench-coupang-secret")
+ORDER_COUNT = int(os.environ.get("STUB_ORDERS", 5000))
+ORDER_DAYS = 60
+KST = datetime.timezone(datetime.timedelta(hours=9))
+# 주문 시각 기준점 (프로세스 기동 시각). 주문 목록은 기동 후 고정
+_ANCHOR = int(time.time())
+
+
+def _iso(ts):
+    return datetime.datetime.fromtimestamp(ts, KST).isoformat(timespec="milliseconds")
+
+
+@functools.lru_cache(maxsize=None)
+def _orders(market):
+    """
+    i번 주문: 최근 ORDER_DAYS일 안 주문 시각, 상품 40종, 상태 변경 시각은 주문 후 0~3일.
+    5%는 출고 전 취소, 취소 안 된 주문 5%는 주문 후 1~5일에 1개 반품 요청 (returned_at).
+    """
+    orders = []
+    for i in range(ORDER_COUNT):
+        r = _rng("order", market, i)
+        ordered_at = _ANCHOR - int(r.uniform(0, ORDER_DAYS * 86400))
+        product = r.randint(1, 40)
+        quantity = r.randint(1, 3)
+        changed_at = min(ordered_at + int(r.uniform(0, 3 * 86400)), _ANCHOR)
+        canceled = r.random() < 0.05
+        # 반품 여부는 별도 난수열 → 기존 주문 값은 그대로
+        rr = _rng("return", market, i)
+        returned_at = ordered_at + int(rr.uniform(86400, 5 * 86400))
+        returned = not canceled and rr.random() < 0.05 and returned_at <= _ANCHOR
+        orders.append({
+            "i": i,
+            "ordered_at": ordered_at,
+            "changed_at": changed_at,
+            "product": product,
+            "quantity": quantity,
+            "amount": quantity * _rng("price", product).randint(50, 500) * 100,
+            "canceled": canceled,
+            "returned_at": returned_at if returned else None,
+        })
+    return orders
+
+
+def _smartstore_authorized(request):
+    return request.headers.get("Authorization", "").startswith("Bearer stub-")
+
+
+@app.post("/external/v1/oauth2/token")
+async def smartstore_token(request: Request):
+    error = await _simulate()
+    if error:
+        return error
+    form = await request.form()
+    message = f"{form.get('client_id')}_{form.get('timestamp')}".encode()
+    expected = base64.b64encode(bcrypt.hashpw(message, SMARTSTORE_SECRET.encode())).decode()
+    if form.get("client_secret_sign") != expected:
+        return JSONResponse({"code": "InvalidSign", "message": "서명 불일치"}, status_code=401)
+    return {"access_token": f"stub-{form.get('client_id')}", "expires_in": 10800, "token_type": "Bearer"}
+
+
+@app.get("/external/v1/pay-order/seller/product-orders/last-changed-statuses")
+async def smartstore_changed(request: Request, lastChangedFrom: str, lastChangedTo: str = "", moreSequence: str = ""):
+    error = await _simulate()
+    if error:
+        return error
+    if not _smartstore_authorized(request):
+        return JSONResponse({"code": "GW.AUTHN", "message": "인증 실패"}, status_code=401)
+    start = datetime.datetime.fromisoformat(lastChangedFrom).timestamp()
+    end = datetime.datetime.fromisoformat(lastChangedTo).timestamp() if lastChangedTo else time.time()
+    after = (start, int(moreSequence) if moreSequence else -1)
+    changed = sorted(
+        (o["changed_at"], o["i"]) for o in _orders("smartstore")
+        if start <= o["changed_at"] < end and (o["changed_at"], o["i"]) >= after
+    )
+    page, rest = changed[:300], changed[300:]
+    data = {
+        "lastChangeStatuses": [
+            {"productOrderId": f"SS{i}", "lastChangedDate": _iso(ts)} for ts, i in page
+        ],
+        "count": len(page),
+    }
+    if rest:
+        data["more"] = {"moreFrom": _iso(rest[0][0]), "moreSequence": str(rest[0][1])}
+    return {"timestamp": _iso(time.time()), "data": data}
+
+
+@app.post("/external/v1/pay-order/seller/product-orders/query")
+async def smartstore_query(request: Request):
+    error = await _simulate()
+    if error:
+        return error
+    if not _smartstore_authorized(request):
+        return JSONResponse({"code": "GW.AUTHN", "message": "인증 실패"}, status_code=401)
+    ids = (await request.json()).get("productOrderIds") or []
+    if len(ids) > 300:
+        return JSONResponse({"code": "InvalidInput", "message": "최대 300건"}, status_code=400)
+    orders = _orders("smartstore")
+    data = []
+    for pid in ids:
+        o = orders[int(pid[2:])]
+        data.append({
+            "order": {"orderId": f"O{o['i']}", "orderDate": _iso(o["ordered_at"])},
+            "productOrder": {
+                "productOrderId": pid,
+                "productId": f"P{o['product']}",
+                "productName": f"스토어 상품 {o['product']}",
+                "quantity": o["quantity"],
+                "totalPaymentAmount": o["amount"],
+                "productOrderStatus": "CANCELED" if o["canceled"] else "DELIVERED",
+                "lastChangedDate": _iso(o["changed_at"]),
+            },
+        })
+    return {"timestamp": _iso(time.time()), "data": data}
+
+
+def _coupang_authorized(request):
+    auth = dict(
+        part.strip().split("=", 1)
+        for part in request.headers.get("Authorization", "").removeprefix("CEA ").split(",")
+        if "=" in part
+    )
+    message = f"{auth.get('signed-date')}GET{request.url.path}{request.url.query}"
+    expected = hmac.new(COUPANG_SECRET.encode(), message.encode(), hashlib.sha256).hexdigest()
+    return auth.get("signature") == expected
+
+
+@app.get("/v2/providers/openapi/apis/api/v4/vendors/{vendor_id}/ordersheets")
+async def coupang_ordersheets(
+    vendor_id: str,
+    request: Request,
+    createdAtFrom: str,
+    createdAtTo: str,
+    status: str,
+    maxPerPage: int = 50,
+    nextToken: str = "",
+):
+    error = await _simulate()
+    if error:
+        return error
+    if not _coupang_authorized(request):
+        return JSONResponse({"code": 401, "message": "Invalid signature"}, status_code=401)
+    first = datetime.date.fromisoformat(createdAtFrom)
+    last = datetime.date.fromisoformat(createdAtTo)
+    now = time.time()
+    sheets = []
+    for o in _orders("coupang"):
+        if o["canceled"]:
+            continue
+        day = datetime.datetime.fromtimestamp(o["ordered_at"], KST).date()
+        age = now - o["ordered_at"]
+        sheet_status = "FINAL_DELIVERY" if age > 3 * 86400 else "DELIVERING" if age > 86400 else "ACCEPT"
+        if first <= day <= last and sheet_status == status:
+            sheets.append(o)
+    offset = int(nextToken or 0)
+    page = sheets[offset:offset + maxPerPage]
+    data = [
+        {
+            "orderId": 9000000 + o["i"],
+            "orderedAt": datetime.datetime.fromtimestamp(o["ordered_at"], KST).strftime("%Y-%m-%dT%H:%M:%S"),
+            "status": status,
+            "orderItems": [{
+                "vendorItemId": 700 + o["product"],
+                "sellerProductId": 500 + o["product"],
+                "sellerProductName": f"쿠팡 상품 {o['product']}",
+                "shippingCount": o["quantity"],
+                "orderPrice": o["amount"],
+            }],
+        }
+        for o in page
+    ]
+    more = offset + maxPerPage < len(sheets)
+    return {"code": 200, "message": "OK", "data": data, "nextToken": str(offset + maxPerPage) if more else ""}
+
+
+@app.get("/v2/providers/openapi/apis/api/v6/vendors/{vendor_id}/returnRequests")
+async def coupang_return_requests(
+    vendor_id: str,
+    request: Request,
+    createdAtFrom: str,
+    createdAtTo: str,
+    cancelType: str = "RETURN",
+    status: str = "",
+    maxPerPage: int = 50,
+    nextToken: str = "",
+):
+    """반품 요청은 반품완료(CC) 상태, 취소 요청은 출고 전 취소 주문 전체. 접수일은 반품=returned_at, 취소=주문 시각."""
+    error = await _simulate()
+    if error:
+        return error
+    if not _coupang_authorized(request):
+        return JSONResponse({"code": 401, "message": "Invalid signature"}, status_code=401)
+    if cancelType == "CANCEL" and status:
+        return JSONResponse({"code": 400, "message": "status는 반품 조회에서만 사용"}, status_code=400)
+    first = datetime.date.fromisoformat(createdAtFrom)
+    last = datetime.date.fromisoformat(createdAtTo)
+    receipts = []
+    for o in _orders("coupang"):
+        if cancelType == "CANCEL":
+            created_at = o["ordered_at"] if o["canceled"] else None
+        else:
+            created_at = o["returned_at"] if status == "CC" else None
+        if created_at is None:
+            continue
+        if first <= datetime.datetime.fromtimestamp(created_at, KST).date() <= last:
+            receipts.append((o, created_at))
+    offset = int(nextToken or 0)
+    page = receipts[offset:offset + maxPerPage]
+    data = [
+        {
+            "receiptId": 5000000 + o["i"],
+            "orderId": 9000000 + o["i"],
+            "receiptType": cancelType,
+            "receiptStatus": "CANCEL_REQUEST" if cancelType == "CANCEL" else "RETURNS_COMPLETED",
+            "createdAt": datetime.datetime.fromtimestamp(created_at, KST).strftime("%Y-%m-%dT%H:%M:%S"),
+            "returnItems": [{
+                "vendorItemId": 700 + o["product"],
+                "sellerProductId": 500 + o["product"],
+                "purchaseCount": o["quantity"],
+                "cancelCount": o["quantity"] if cancelType == "CANCEL" else 1,
+            }],
+        }
+        for o, created_at in page
+    ]
+    more = offset + maxPerPage < len(receipts)
+    return {"code": 200, "message": "OK", "data": data, "nextToken": str(offset + maxPerPage) if more else ""}
@@ -0,0 +1,243 @@
+"""
+프로세스 내 응답 캐시.
+- 크기 제한 LRU + 항목별 TTL
+- hit / miss / eviction 카운터 (GET /cache/stats)
+- single-flight: 같은 키 동시 요청은 업스트림 호출 1번을 공유
+- stale_on_error: 새로 받기 실패(쿼터 초과 등) 시 만료된 값이라도 반환
+- stale-while-revalidate: 만료 후 stale_ttl 안이면 만료 값을 바로 주고 백그라운드로 갱신
+- 자주 조회되는 키(hot key)는 refresh_hot()으로 만료 전에 미리 갱신
+- shared(SharedCache) 지정 시 워커 프로세스 간 값 공유 + 임대로 워커 간 single-flight (SQLite 호출은 스레드에서)
+- 백그라운드 갱신은 요청 마감(resilience.deadline) 없이 진행, 요청이 기다리는 로드는 그 요청 마감 적용
+"""
+import asyncio
+import time
+from collections import Counter, OrderedDict
+
+import resilience
+from shared_cache import encode_key
+
+_MISSING = object()
+
+# 이름 → 캐시 (통계 노출용)
+CACHES = {}
+
+
+class TTLCache:
+    def __init__(self, name, maxsize=1024, ttl=300.0, stale_ttl=0.0, shared=None, lease_ttl=10.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.shared = shared
+        self.lease_ttl = lease_ttl
+        self._data = OrderedDict()  # key → (만료 시각, 값)
+        self._inflight = {}
+        self._loaders = {}  # key → 마지막 loader (백그라운드 갱신용)
+        self._requests = Counter()  # key → 최근 조회 수 (refresh_hot마다 절반으로 감쇠)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.revalidated = 0
+        self.refreshed = 0
+        self.shared_hits = 0
+        CACHES[name] = self
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            # 만료 항목은 stale_on_error 대비로 남겨두고 LRU로 밀려나게 둠
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def get_stale(self, key, default=None):
+        """만료 여부와 관계없이 저장된 값."""
+        entry = self._data.get(key)
+        return default if entry is None else entry[1]
+
+    def set(self, key, value, ttl=None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            old, _ = self._data.popitem(last=False)
+            self._forget(old)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+        self._forget(key)
+
+    def _forget(self, key):
+        self._loaders.pop(key, None)
+        self._requests.pop(key, None)
+
+    async def get_or_load(self, key, loader, bypass=False, cacheable=None, stale_on_error=False):
+        """
+        캐시 조회 후 없으면 loader()로 채움.
+        bypass=True면 조회를 건너뛰고 새로 받아 캐시를 갱신.
+        cacheable(value)가 False면 저장하지 않음 (에러 응답 등).
+        stale_on_error=True면 loader 예외 시 만료된 값이 있으면 그 값을 반환.
+        만료 후 stale_ttl(초) 안의 값은 바로 반환하고 loader는 백그라운드로 실행.
+        """
+        entry = self._data.get(key)
+        if entry is not None:
+            self._loaders[key] = (loader, cacheable)
+            self._requests[key] += 1
+            if not bypass:
+                expires_at, value = entry
+                now = time.monotonic()
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < expires_at + self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self.revalidated += 1
+                    self.refresh(key)
+                    return value
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            fut = self._start_load(key, loader, cacheable, use_shared=not bypass)
+        try:
+            return await asyncio.shield(fut)
+        except Exception:
+            stale = self.get_stale(key, _MISSING)
+            if not stale_on_error or stale is _MISSING:
+                raise
+            self.stale_served += 1
+            return stale
+
+    def _start_load(self, key, loader, cacheable, use_shared=True, background=False):
+        if background:
+            # 작업은 생성 시점 context를 복사 → 응답을 끝낸 요청의 마감에 잘리지 않게 해제
+            with resilience.no_deadline():
+                fut = asyncio.ensure_future(self._load(key, loader, cacheable, use_shared))
+        else:
+            fut = asyncio.ensure_future(self._load(key, loader, cacheable, use_shared))
+        # 백그라운드 갱신 실패는 다음 조회 때 다시 시도 (예외 미회수 경고 방지)
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = fut
+        return fut
+
+    def refresh(self, key, use_shared=True):
+        """
+        마지막 loader로 백그라운드 갱신 시작 (이미 진행 중이면 그 작업). loader 모르면 None.
+        use_shared=False면 다른 워커가 공유 캐시에 넣어둔 값을 쓰지 않고 새로 받음.
+        """
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return fut
+        known = self._loaders.get(key)
+        if known is None:
+            return None
+        return self._start_load(key, *known, use_shared=use_shared, background=True)
+
+    def hot_keys(self, top_n):
+        return [key for key, _ in self._requests.most_common(top_n)]
+
+    async def refresh_hot(self, top_n, ahead):
+        """
+        최근 많이 조회된 상위 top_n 키 중 ahead초 안에 만료될(또는 이미 만료된) 항목을 미리 갱신.
+        조회 수는 호출마다 절반으로 감쇠 → 최근 트래픽 위주. 갱신한 키 수 반환.
+        """
+        deadline = time.monotonic() + ahead
+        futures = []
+        for key in self.hot_keys(top_n):
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= deadline and key not in self._inflight:
+                fut = self.refresh(key, use_shared=False)
+                if fut is not None:
+                    futures.append(fut)
+        if futures:
+            await asyncio.gather(*futures, return_exceptions=True)
+            self.refreshed += len(futures)
+        for key in list(self._requests):
+            self._requests[key] //= 2
+            if not self._requests[key]:
+                del self._requests[key]
+        return len(futures)
+
+    async def _load(self, key, loader, cacheable, use_shared=True):
+        try:
+            if self.shared is None:
+                value = await loader()
+                stored = cacheable is None or cacheable(value)
+                if stored:
+                    self.set(key, value)
+            else:
+                value, stored = await self._load_shared(key, loader, cacheable, use_shared)
+            if stored:
+                self._loaders[key] = (loader, cacheable)
+                self._requests[key] += 1
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _load_shared(self, key, loader, cacheable, use_shared):
+        """
+        다른 워커가 넣어둔 값이 있으면 그 값, 없으면 임대를 잡은 워커 하나만 loader 실행.
+        임대를 못 잡으면 값이 생길 때까지 대기 (lease_ttl 지나면 직접 실행) → (값, 저장 여부).
+        """
+        skey = encode_key(key)
+        lease = f"cache:{self.name}:{skey}"
+        deadline = time.monotonic() + self.lease_ttl
+        while True:
+            if use_shared:
+                found = await asyncio.to_thread(self.shared.get, self.name, skey)
+                if found is not None:
+                    value, expires_at = found
+                    self.set(key, value, ttl=expires_at - time.time())
+                    self.shared_hits += 1
+                    return value, True
+            leased = await asyncio.to_thread(self.shared.acquire, lease, self.lease_ttl)
+            if leased or time.monotonic() >= deadline:
+                break
+            use_shared = True
+            await asyncio.sleep(0.05)
+        try:
+            value = await loader()
+            stored = cacheable is None or cacheable(value)
+            if stored:
+                self.set(key, value)
+                await asyncio.to_thread(self.shared.set, self.name, skey, value, self.ttl)
+            return value, stored
+        finally:
+            await asyncio.to_thread(self.shared.release, lease)
+
+    def stats(self):
+        served = self.hits + self.revalidated
+        lookups = served + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "revalidated": self.revalidated,
+            "refreshed": self.refreshed,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+            "hit_ratio": round(served / lookups, 3) if lookups else 0,
+        }
+
+
+def bypass_requested(cache_control, no_cache=False):
+    """Cache-Control: no-cache / no-store 또는 no_cache=true 이면 캐시 우회."""
+    if no_cache:
+        return True
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    return bool(directives & {"no-cache", "no-store", "max-age=0"})
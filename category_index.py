@@ -0,0 +1,164 @@
+"""
+검색어 → 네이버 카테고리 경로 로컬 분류 인덱스.
+- 네이버쇼핑 검색 결과(상위 상품 category1~4 다수결)로 학습
+- 조회 순서: 정확히 같은 검색어 → 토큰 trie 최장 접두어("핫팩 대용량" → "핫팩") → 글자 bigram 유사도
+- 크기 제한 LRU, 밀려난 검색어는 trie·bigram 색인에서도 제거
+"""
+import re
+from collections import Counter, OrderedDict
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(query):
+    return " ".join(_NON_WORD.sub(" ", (query or "").lower()).split())
+
+
+def _bigrams(text):
+    compact = text.replace(" ", "")
+    if len(compact) < 2:
+        return {compact} if compact else set()
+    return {compact[i:i + 2] for i in range(len(compact) - 1)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "query")
+
+    def __init__(self):
+        self.children = {}
+        self.query = None
+
+
+class CategoryIndex:
+    def __init__(self, maxsize=50000, min_similarity=0.6, vote_items=5):
+        self.maxsize = maxsize
+        self.min_similarity = min_similarity
+        self.vote_items = vote_items
+        self._paths = OrderedDict()  # 정규화 검색어 → (category1, category2, category3, category4)
+        self._trie = _TrieNode()
+        self._postings = {}  # bigram → {검색어}
+        self.hits = {"exact": 0, "prefix": 0, "similar": 0}
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._paths)
+
+    # ----- 학습 -----
+    def vote(self, items):
+        """네이버쇼핑 검색 items 상위 vote_items개의 카테고리 경로 다수결 (상위 순위 가중)."""
+        votes = Counter()
+        for rank, it in enumerate(items[: self.vote_items]):
+            path = tuple((it.get(f"category{i}") or "").strip() for i in range(1, 5))
+            if path[0]:
+                votes[path] += self.vote_items - rank
+        return votes.most_common(1)[0][0] if votes else None
+
+    def learn(self, query, items):
+        path = self.vote(items)
+        if path is not None:
+            self.add(query, path)
+        return path
+
+    def add(self, query, path):
+        key = normalize(query)
+        if not key:
+            return
+        if key in self._paths:
+            self._paths[key] = tuple(path)
+            self._paths.move_to_end(key)
+            return
+        self._paths[key] = tuple(path)
+        self._trie_insert(key)
+        for gram in _bigrams(key):
+            self._postings.setdefault(gram, set()).add(key)
+        while len(self._paths) > self.maxsize:
+            old, _ = self._paths.popitem(last=False)
+            self._forget(old)
+
+    def _forget(self, key):
+        self._trie_remove(key)
+        for gram in _bigrams(key):
+            bucket = self._postings.get(gram)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._postings[gram]
+
+    # ----- trie (토큰 단위) -----
+    def _trie_insert(self, key):
+        node = self._trie
+        for token in key.split():
+            node = node.children.setdefault(token, _TrieNode())
+        node.query = key
+
+    def _trie_remove(self, key):
+        trail = [self._trie]
+        for token in key.split():
+            node = trail[-1].children.get(token)
+            if node is None:
+                return
+            trail.append(node)
+        trail[-1].query = None
+        tokens = key.split()
+        for depth in range(len(tokens), 0, -1):
+            node = trail[depth]
+            if node.children or node.query is not None:
+                break
+            del trail[depth - 1].children[tokens[depth - 1]]
+
+    def _longest_prefix(self, key):
+        node = self._trie
+        found = None
+        for token in key.split():
+            node = node.children.get(token)
+            if node is None:
+                break
+            if node.query is not None:
+                found = node.query
+        return found
+
+    # ----- 조회 -----
+    def _most_similar(self, key):
+        grams = _bigrams(key)
+        if not grams:
+            return None, 0.0
+        shared = Counter()
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] += 1
+        best, best_score = None, 0.0
+        for candidate, count in shared.most_common(50):
+            score = 2 * count / (len(grams) + len(_bigrams(candidate)))
+            if score > best_score:
+                best, best_score = candidate, score
+        return best, best_score
+
+    def lookup(self, query):
+        """→ (경로, 방법, 유사도) 또는 None."""
+        key = normalize(query)
+        if not key:
+            return None
+        path = self._paths.get(key)
+        if path is not None:
+            self._paths.move_to_end(key)
+            self.hits["exact"] += 1
+            return path, "exact", 1.0
+        prefix = self._longest_prefix(key)
+        if prefix is not None and prefix != key:
+            self.hits["prefix"] += 1
+            return self._paths[prefix], "prefix", 1.0
+        similar, score = self._most_similar(key)
+        if similar is not None and score >= self.min_similarity:
+            self.hits["similar"] += 1
+            return self._paths[similar], "similar", round(score, 3)
+        self.misses += 1
+        return None
+
+    def stats(self):
+        return {
+            "queries": len(self._paths),
+            "maxsize": self.maxsize,
+            "bigrams": len(self._postings),
+            "hits": dict(self.hits),
+            "misses": self.misses,
+        }
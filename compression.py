@@ -0,0 +1,110 @@
+"""
+응답 압축 ASGI 미들웨어.
+- Accept-Encoding에 br이 있고 brotli 패키지가 설치돼 있으면 brotli, 아니면 gzip
+- minimum_size 바이트 미만, 이미 인코딩된 응답, JSON·텍스트가 아닌 응답은 그대로
+- 스트리밍 응답(NDJSON·SSE: 본문이 여러 조각)은 조각마다 바로 보내야 하므로 압축하지 않음
+"""
+import gzip
+import importlib.util
+
+if importlib.util.find_spec("brotli") is not None:
+    import brotli
+else:
+    brotli = None
+
+COMPRESSIBLE = ("application/json", "text/")
+
+
+def accepted(header):
+    """Accept-Encoding 헤더 → q=0이 아닌 인코딩 집합."""
+    out = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            out.add(name.strip().lower())
+    return out
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.stats = {"responses": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def _encoding(self, scope):
+        header = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                header = value.decode("latin-1")
+                break
+        encodings = accepted(header)
+        if brotli is not None and "br" in encodings:
+            return "br"
+        if "gzip" in encodings:
+            return "gzip"
+        return None
+
+    def _compress(self, encoding, body):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._encoding(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            headers = {k.lower(): v for k, v in start.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or b"content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            compressed = self._compress(encoding, body)
+            self.stats["responses"] += 1
+            self.stats["bytes_in"] += len(body)
+            self.stats["bytes_out"] += len(compressed)
+            raw = [
+                (k, v) for k, v in start.get("headers", [])
+                if k.lower() not in (b"content-length", b"vary")
+            ]
+            vary = headers.get(b"vary")
+            raw += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            await send({**start, "headers": raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,317 @@
+"""
+도매꾹 상품 로컬 인덱스 + 백그라운드 크롤러.
+- getItemList를 키워드/카테고리 단위로 전 페이지 수집 (동시 요청 제한) → SQLite 저장
+- 상품명 전문 검색: FTS5 trigram (한글 부분 일치), 미지원 SQLite면 LIKE
+- 범위(scope)별 마지막 수집 시각으로 신선도 판단, 오래된 범위만 다시 수집
+- 키워드 범위는 정규화한 검색어 기준, 최신 카테고리 범위는 그 안의 상품명 검색을 대신할 수 있음 (search(scopes=))
+- SQLite 호출은 잠금 + 동기 → 이벤트 루프에서는 asyncio.to_thread로 호출
+"""
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import resilience
+import upstream
+
+PAGE_SIZE = 100
+
+
+def normalize_keyword(keyword):
+    """범위 키용 검색어: 소문자 + 공백 하나로."""
+    return " ".join(str(keyword).lower().split())
+
+
+def scope_for(keyword="", category=""):
+    return f"ca:{category}" if category else f"kw:{normalize_keyword(keyword)}"
+
+
+class DomeggookIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                no TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                price INTEGER NOT NULL,
+                stock INTEGER,
+                seller TEXT,
+                min_qty INTEGER,
+                category TEXT,
+                img TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS item_scopes (
+                scope TEXT NOT NULL,
+                no TEXT NOT NULL,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (scope, no)
+            );
+            CREATE INDEX IF NOT EXISTS item_scopes_no ON item_scopes (no);
+            CREATE TABLE IF NOT EXISTS crawl_state (
+                scope TEXT PRIMARY KEY,
+                crawled_at REAL NOT NULL,
+                total INTEGER NOT NULL,
+                pages INTEGER NOT NULL
+            );
+            """
+        )
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts"
+                " USING fts5(name, no UNINDEXED, tokenize='trigram')"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite 3.34 미만: trigram 없음 → LIKE 검색
+            self.fts = False
+        if self.fts and self._conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # items_fts rowid = items rowid로 맞춤 (no는 UNINDEXED라 no 기준 삭제는 전체 스캔)
+            self._conn.execute("DELETE FROM items_fts")
+            self._conn.execute("INSERT INTO items_fts (rowid, name, no) SELECT rowid, name, no FROM items")
+            self._conn.execute("PRAGMA user_version = 1")
+        self._conn.commit()
+
+    # ----- 수집 상태 -----
+    def crawled_at(self, scope):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT crawled_at FROM crawl_state WHERE scope = ?", (scope,)
+            ).fetchone()
+        return row["crawled_at"] if row else 0.0
+
+    def is_fresh(self, scope, ttl):
+        return time.time() - self.crawled_at(scope) < ttl
+
+    def fresh_scopes(self, scopes, ttl):
+        """scopes 중 ttl 안에 수집을 끝낸 범위 (순서 유지)."""
+        scopes = list(dict.fromkeys(scopes))
+        if not scopes:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT scope FROM crawl_state WHERE scope IN ({','.join('?' * len(scopes))}) AND crawled_at > ?",
+                (*scopes, time.time() - ttl),
+            ).fetchall()
+        fresh = {r["scope"] for r in rows}
+        return [scope for scope in scopes if scope in fresh]
+
+    # ----- 저장 -----
+    def upsert(self, scope, raw_items, seen_at):
+        rows = []
+        for it in raw_items:
+            no = str(it.get("no") or "").strip()
+            if not no:
+                continue
+            rows.append((
+                no,
+                it.get("name") or "",
+                int(it.get("price", 0) or 0),
+                _to_int(it.get("stock")),
+                it.get("seller") or "",
+                _to_int(it.get("minQty"), 1),
+                it.get("category") or "",
+                it.get("img") or "",
+                seen_at,
+            ))
+        if not rows:
+            return 0
+        keys = [(r[0],) for r in rows]
+        with self._lock:
+            if self.fts:
+                # REPLACE는 items rowid를 새로 매김 → 이전 rowid로 색인 삭제, 새 rowid로 다시 색인
+                self._conn.executemany(
+                    "DELETE FROM items_fts WHERE rowid = (SELECT rowid FROM items WHERE no = ?)", keys
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO item_scopes VALUES (?, ?, ?)",
+                [(scope, r[0], seen_at) for r in rows],
+            )
+            if self.fts:
+                self._conn.executemany(
+                    "INSERT INTO items_fts (rowid, name, no) SELECT rowid, name, no FROM items WHERE no = ?",
+                    keys,
+                )
+            self._conn.commit()
+        return len(rows)
+
+    def finish_crawl(self, scope, started_at, total, pages):
+        """이번 수집에서 안 보인 상품은 범위에서 빼고, 어느 범위에도 없는 상품은 삭제."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM item_scopes WHERE scope = ? AND seen_at < ?", (scope, started_at)
+            )
+            orphan = "SELECT no FROM items WHERE no NOT IN (SELECT no FROM item_scopes)"
+            if self.fts:
+                self._conn.execute(
+                    f"DELETE FROM items_fts WHERE rowid IN (SELECT rowid FROM items WHERE no IN ({orphan}))"
+                )
+            self._conn.execute(f"DELETE FROM items WHERE no IN ({orphan})")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawl_state VALUES (?, ?, ?, ?)",
+                (scope, time.time(), total, pages),
+            )
+            self._conn.commit()
+
+    # ----- 검색 -----
+    def search(self, query, page=1, page_size=20, scopes=None):
+        """상품명 전문 검색 → (getItemList 항목 형식 items, total). scopes 지정 시 그 범위에서 본 상품만."""
+        tokens = [t for t in query.split() if t]
+        if not tokens:
+            return [], 0
+        fts_tokens = [t for t in tokens if self.fts and len(t) >= 3]
+        like_tokens = [t for t in tokens if t not in fts_tokens]
+        conditions = ["i.name LIKE ?"] * len(like_tokens)
+        params = [f"%{t}%" for t in like_tokens]
+        if scopes:
+            conditions.append(
+                f"i.no IN (SELECT no FROM item_scopes WHERE scope IN ({','.join('?' * len(scopes))}))"
+            )
+            params += list(scopes)
+        where = " AND ".join(conditions) or "1"
+        if fts_tokens:
+            match = " AND ".join('"' + t.replace('"', '""') + '"' for t in fts_tokens)
+            base = (
+                "FROM items_fts f JOIN items i ON i.rowid = f.rowid"
+                f" WHERE items_fts MATCH ? AND {where}"
+            )
+            params = [match, *params]
+            order = "f.rank"
+        else:
+            base = f"FROM items i WHERE {where}"
+            order = "i.updated_at DESC"
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT i.no, i.name, i.price, i.stock, i.seller, i.min_qty AS minQty, i.category, i.img"
+                f" {base} ORDER BY {order} LIMIT ? OFFSET ?",
+                (*params, page_size, (max(page, 1) - 1) * page_size),
+            ).fetchall()
+        return [dict(r) for r in rows], total
+
+    def stats(self):
+        with self._lock:
+            items = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            scopes = self._conn.execute(
+                "SELECT scope, crawled_at, total, pages FROM crawl_state ORDER BY crawled_at DESC"
+            ).fetchall()
+        return {"items": items, "fts": self.fts, "scopes": [dict(r) for r in scopes]}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _to_int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+async def fetch_page(api_key, page, keyword="", category="", page_size=PAGE_SIZE):
+    params = {
+        "ver": "6.1",
+        "cmd": "getItemList",
+        "aid": api_key,
+        "pageNum": page,
+        "pageSize": page_size,
+        "out": "json",
+    }
+    if keyword:
+        params["keyword"] = keyword
+    if category:
+        params["ca"] = category
+    res = await upstream.request("domeggook", "GET", "/ssl/api/", params=params)
+    data = res.json()
+    return data if isinstance(data, dict) else {}
+
+
+class Crawler:
+    """범위별 전 페이지 수집. 같은 범위 중복 수집 방지, 페이지 동시 요청은 concurrency개."""
+
+    def __init__(self, index, concurrency=4, max_pages=50):
+        self.index = index
+        self.max_pages = max_pages
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._running = {}
+
+    def schedule(self, api_key, keyword="", category=""):
+        """백그라운드 수집 예약 (이미 수집 중이면 그 작업 반환). 끝난 작업은 목록에서 제거."""
+        keyword = normalize_keyword(keyword)
+        scope = scope_for(keyword, category)
+        task = self._running.get(scope)
+        if task is None:
+            # 예약한 요청의 마감과 무관하게 끝까지 수집
+            with resilience.no_deadline():
+                task = self._running[scope] = asyncio.create_task(
+                    self.crawl(api_key, keyword, category)
+                )
+            task.add_done_callback(lambda t: self._finished(scope, t))
+        return task
+
+    def _finished(self, scope, task):
+        if self._running.get(scope) is task:
+            del self._running[scope]
+
+    async def _page(self, api_key, page, keyword, category):
+        async with self._semaphore:
+            return await fetch_page(api_key, page, keyword, category)
+
+    async def crawl(self, api_key, keyword="", category=""):
+        scope = scope_for(keyword, category)
+        started_at = time.time()
+        try:
+            first = await self._page(api_key, 1, keyword, category)
+        except Exception as e:
+            return {"scope": scope, "success": False, "error": str(e)}
+        if "list" not in first:
+            return {"scope": scope, "success": False, "error": first.get("errorMessage", "수집 실패")}
+        total = _to_int(first.get("totalCount"))
+        pages = min(self.max_pages, max(1, math.ceil(total / PAGE_SIZE)))
+        # max_pages에서 잘린 범위는 인덱스만으로 검색하면 상품이 빠짐 → 수집 완료(최신)로 표시하지 않음
+        truncated = total > pages * PAGE_SIZE
+        count = await asyncio.to_thread(self.index.upsert, scope, first.get("list") or [], started_at)
+        rest = await asyncio.gather(
+            *(self._page(api_key, p, keyword, category) for p in range(2, pages + 1)),
+            return_exceptions=True,
+        )
+        complete = True
+        for data in rest:
+            if isinstance(data, Exception) or "list" not in data:
+                complete = False
+                continue
+            count += await asyncio.to_thread(self.index.upsert, scope, data.get("list") or [], started_at)
+        if complete and not truncated:
+            await asyncio.to_thread(self.index.finish_crawl, scope, started_at, total, pages)
+        return {"scope": scope, "success": complete, "items": count, "pages": pages, "truncated": truncated}
+
+    async def run(self, api_key, keywords, categories, ttl, interval, should_run=None):
+        """
+        설정된 키워드/카테고리 중 오래된 범위만 주기적으로 재수집.
+        await should_run()이 False인 주기는 건너뜀 (여러 워커 중 리더만 수집).
+        """
+        targets = [(k, "") for k in keywords] + [("", c) for c in categories]
+        while True:
+            if should_run is not None and not await should_run():
+                await asyncio.sleep(interval)
+                continue
+            for keyword, category in targets:
+                if await asyncio.to_thread(self.index.is_fresh, scope_for(keyword, category), ttl):
+                    continue
+                try:
+                    await self.crawl(api_key, keyword, category)
+                except Exception:
+                    pass
+            await asyncio.sleep(interval)
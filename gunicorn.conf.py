@@ -0,0 +1,19 @@
+"""
+멀티 워커 실행 설정: gunicorn -c gunicorn.conf.py main:app
+- 워커 수는 WEB_CONCURRENCY (기본 1)
+- WEB_CONCURRENCY>1이면 main.py가 SQLite 공유 캐시·워커 간 single-flight·리더 선출을 켜고,
+  upstream.py가 속도 제한·일일 쿼터를 워커 수로 나눔 → 모든 워커가 같은 값을 보도록 여기서 고정
+- 단 /metrics·/cache/stats·쿼터 사용량은 아직 워커별 → 여러 워커면 스크레이프마다 다른 워커 값이라
+  rate()가 틀어지고, 쿼터도 워커 수로 고정 분할됨. 워커 간 공유 전까지 기본은 워커 1개
+"""
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# 워커마다 lifespan에서 업스트림 클라이언트·저장소를 엶 (preload 안 함)
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
@@ -5,22 +5,88 @@
 - A-3: GET /category?query= 카테고리 자동 분류
 - GET /trend?query= 네이버 데이터랩 검색 트렌드(시즌)
 """
+from collections import Counter
+from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
 import os
 import re
+import csv
 import datetime
+import functools
+import hashlib
+import inspect
+import io
 import json
+import time
+from typing import Annotated, List, Optional
 
 from dotenv import load_dotenv
 
 env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 import httpx
-
-app = FastAPI(title="셀러마진 API")
+import numpy as np
+
+import compression
+import margin
+import metrics
+import resilience
+import upstream
+from ratelimit import UpstreamLimited
+from cache import CACHES, TTLCache, bypass_requested
+from category_index import CategoryIndex, normalize as normalize_query
+from domeggook_index import Crawler, DomeggookIndex, scope_for
+from orders import KST, CoupangSource, OrderStore, OrderSyncError, SmartstoreSource, sync as sync_orders
+from price_stats import PriceAccumulator
+from price_store import PriceStore
+from shared_cache import SharedCache
+from watchlist import WatchStore, compose as compose_alert, evaluate as evaluate_watch
+from trend_store import TrendStore
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstream.open_clients()
+    await asyncio.to_thread(trend_store.warm, *_trend_window())
+    background = [asyncio.create_task(_warm_season_trends())]
+    if shared_cache is not None:
+        background.append(asyncio.create_task(_leader_heartbeat()))
+    if HOT_REFRESH_INTERVAL > 0:
+        background.append(asyncio.create_task(_refresh_hot_keys()))
+    if PRICE_COMPACT_INTERVAL > 0:
+        background.append(asyncio.create_task(_compact_price_history()))
+    if WATCH_INTERVAL > 0:
+        background.append(asyncio.create_task(_watch_loop()))
+    if DOMEGGOOK_API_KEY and (DOMEGGOOK_CRAWL_KEYWORDS or DOMEGGOOK_CRAWL_CATEGORIES):
+        background.append(asyncio.create_task(domeggook_crawler.run(
+            DOMEGGOOK_API_KEY,
+            DOMEGGOOK_CRAWL_KEYWORDS,
+            DOMEGGOOK_CRAWL_CATEGORIES,
+            DOMEGGOOK_INDEX_TTL,
+            DOMEGGOOK_CRAWL_INTERVAL,
+            should_run=_is_leader,
+        )))
+    yield
+    for task in [*background, *_order_syncs.values()]:
+        task.cancel()
+    await upstream.close_clients()
+    trend_store.close()
+    price_store.close()
+    watch_store.close()
+    order_store.close()
+    domeggook_index.close()
+    if shared_cache is not None:
+        await asyncio.to_thread(shared_cache.release, LEADER_LEASE)
+        shared_cache.close()
+
+
+# 기본 응답 직렬화는 orjson (한글 텍스트·긴 배열에서 표준 json보다 빠름)
+app = FastAPI(title="셀러마진 API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,9 +94,73 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# COMPRESS_MIN_SIZE 바이트 이상 JSON 응답은 brotli(설치 시)/gzip 압축. 0이면 끔
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+if COMPRESS_MIN_SIZE > 0:
+    app.add_middleware(
+        compression.CompressionMiddleware,
+        minimum_size=COMPRESS_MIN_SIZE,
+        gzip_level=int(os.environ.get("COMPRESS_GZIP_LEVEL", 6)),
+        brotli_quality=int(os.environ.get("COMPRESS_BROTLI_QUALITY", 4)),
+    )
+app.add_middleware(metrics.MetricsMiddleware)
+# 요청 하나가 업스트림 호출(속도 제한 대기·재시도 포함)에 쓰는 최대 시간(초). 0이면 제한 없음
+# 일괄·스트리밍 처리는 전체가 아니라 항목마다 같은 마감 적용
+REQUEST_DEADLINE = float(os.environ.get("REQUEST_DEADLINE", 8))
+app.add_middleware(
+    resilience.DeadlineMiddleware,
+    seconds=REQUEST_DEADLINE,
+    exempt=("/compare/bulk", "/parse-url/batch", "/watchlist/run"),
+)
 
 NAVER_CLIENT_ID = os.environ.get("NAVER_CLIENT_ID", "")
 NAVER_CLIENT_SECRET = os.environ.get("NAVER_CLIENT_SECRET", "")
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# ---------- 멀티 워커 ----------
+# WEB_CONCURRENCY>1 (gunicorn 워커 여러 개)이면 같은 서버의 워커끼리 SQLite 공유 캐시 사용:
+# 검색·분포·타겟 캐시 값 공유, 같은 키는 한 워커만 업스트림 조회, 백그라운드 작업은 리더 워커 하나만 실행
+WORKERS = upstream.WORKERS
+SHARED_CACHE = os.environ.get("SHARED_CACHE", "1" if WORKERS > 1 else "0") == "1"
+shared_cache = (
+    SharedCache(
+        os.environ.get(
+            "SHARED_CACHE_PATH", Path(__file__).resolve().parent / "data" / "shared_cache.sqlite3"
+        )
+    )
+    if SHARED_CACHE
+    else None
+)
+LEADER_LEASE = "leader:background"
+LEADER_TTL = float(os.environ.get("LEADER_TTL", 30))
+SHARED_LEASE_TTL = float(os.environ.get("SHARED_LEASE_TTL", 10))
+# 공유 캐시(SQLite) 호출은 모두 스레드에서: 워커 간 쓰기 잠금 대기(최대 5초)가 이벤트 루프를 멈추지 않게
+
+
+async def _is_leader():
+    """백그라운드 작업 실행 여부. 공유 캐시가 없으면 항상 True, 있으면 리더 임대 획득·연장."""
+    return shared_cache is None or await asyncio.to_thread(shared_cache.acquire, LEADER_LEASE, LEADER_TTL)
+
+
+async def _renew_lease(name: str, ttl: float):
+    """작업이 끝날 때(취소)까지 공유 임대를 ttl/3마다 연장."""
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            await asyncio.to_thread(shared_cache.acquire, name, ttl)
+        except Exception:
+            pass
+
+
+async def _leader_heartbeat():
+    """리더 임대 유지 (리더가 죽으면 LEADER_TTL 안에 다른 워커가 넘겨받음) + 만료 공유 항목 정리."""
+    while True:
+        try:
+            if await _is_leader():
+                await asyncio.to_thread(shared_cache.purge)
+        except Exception:
+            pass
+        await asyncio.sleep(LEADER_TTL / 3)
 
 
 def _naver_headers():
@@ -40,36 +170,148 @@ def _naver_headers():
     }
 
 
+# ---------- 응답 필드 선택 ----------
+# fields=min_price,avg_price,items.price 처럼 필요한 키만 요청 (점으로 하위 키, 목록은 항목마다 적용).
+# success·error는 항상 포함. 빠진 섹션 중 업스트림 조회가 필요한 것(트렌드·분포·시중가)은 만들지 않음
+ALWAYS_FIELDS = ("success", "error")
+
+
+def parse_fields(fields: Optional[str]):
+    """"a,b.c" → {"a": None, "b": {"c": None}} (None = 하위 전체). 비어 있으면 None (전체)."""
+    if not fields:
+        return None
+    spec = {}
+    for path in fields.split(","):
+        parts = [p.strip() for p in path.split(".") if p.strip()]
+        if not parts:
+            continue
+        node = spec
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                node = None
+                break
+            node = node.setdefault(part, {})
+        if node is not None:
+            node[parts[-1]] = None
+    return spec or None
+
+
+def wants(spec, *path):
+    """fields 선택(spec)에 path(키 순서)가 들어 있는지. 상위 키가 통째로 선택됐으면 True."""
+    node = spec
+    for key in path:
+        if node is None:
+            return True
+        if key not in node:
+            return False
+        node = node[key]
+    return True
+
+
+def project(data, spec, top=True):
+    """spec에 있는 키만 남김 (목록은 항목마다). 최상위 success·error는 항상 유지."""
+    if spec is None:
+        return data
+    if isinstance(data, list):
+        return [project(x, spec, top=False) for x in data]
+    if not isinstance(data, dict):
+        return data
+    out = {k: data[k] for k in ALWAYS_FIELDS if k in data} if top else {}
+    for k, v in data.items():
+        if k in spec:
+            out[k] = project(v, spec[k], top=False)
+    return out
+
+
+def _json_route(endpoint):
+    """
+    라우트 등록용 래퍼: 결과 dict를 fields로 거른 뒤 orjson으로 바로 직렬화 (FastAPI jsonable_encoder 생략).
+    원래 함수는 내부 호출용으로 dict를 그대로 반환. fields 파라미터가 없는 함수면 쿼리 파라미터로 추가.
+    """
+    sig = inspect.signature(endpoint)
+    own = "fields" in sig.parameters
+
+    @functools.wraps(endpoint)
+    async def route(**kwargs):
+        fields = kwargs.get("fields") if own else kwargs.pop("fields", None)
+        return ORJSONResponse(project(await endpoint(**kwargs), parse_fields(fields)))
+
+    if not own:
+        route.__signature__ = sig.replace(parameters=[
+            *sig.parameters.values(),
+            inspect.Parameter(
+                "fields", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Optional[str]
+            ),
+        ])
+    return route
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "service": "셀러마진 API"}
 
 
+@app.get("/cache/stats")
+def cache_stats():
+    """캐시별 hit/miss/eviction 통계."""
+    return {
+        "success": True,
+        "caches": {name: c.stats() for name, c in CACHES.items()},
+        "category_index": category_index.stats(),
+        "trend_store": trend_store.stats(),
+        "price_store": price_store.stats(),
+        "order_store": order_store.stats(),
+        "shared_cache": shared_cache.stats() if shared_cache is not None else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus 수집용: 라우트·업스트림 지연/에러, 캐시 hit ratio, 처리 중 요청 수."""
+    # charset은 PlainTextResponse가 붙임 (문자열에 넣으면 헤더에 두 번 들어감)
+    return PlainTextResponse(metrics.render(CACHES), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/quota")
+def admin_quota(request: Request):
+    """
+    업스트림 정책·API 키별 일일 사용량/남은 쿼터, 엔드포인트별 회로 차단 상태.
+    ADMIN_TOKEN 설정 시 X-Admin-Token 헤더 필요.
+    """
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token", "") != ADMIN_TOKEN:
+        return {"success": False, "error": "권한 없음"}
+    return {"success": True, "quota": upstream.governor.snapshot(), "circuits": upstream.circuits()}
+
+
 # ---------- 트렌드 (데이터랩) ----------
-async def get_trend(query: str):
-    """네이버 데이터랩으로 검색 트렌드 조회 (시즌 판단)."""
-    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
-        return {"success": False, "error": "API 키 미설정"}
+# 데이터랩 검색어 트렌드는 요청당 keywordGroups 최대 5개 → 키워드 5개씩 묶어 1회 호출
+DATALAB_MAX_GROUPS = 5
+# 데이터랩 동시 호출 상한 (네이버 rate limit 보호)
+DATALAB_CONCURRENCY = int(os.environ.get("DATALAB_CONCURRENCY", 4))
+datalab_semaphore = asyncio.Semaphore(DATALAB_CONCURRENCY)
+TREND_BATCH_MAX = int(os.environ.get("TREND_BATCH_MAX", 100))
+# 월별 시계열은 하루 1번만 바뀜 → (keyword, startDate, endDate, timeUnit) 단위로 디스크에 보관해 재시작 후에도 재사용
+# 날짜 창이 바뀐 직후엔 지난 창 시계열(TREND_STALE_TTL초 이내)을 바로 주고 새 창은 백그라운드로 조회
+trend_store = TrendStore(
+    os.environ.get("TREND_DB_PATH", Path(__file__).resolve().parent / "data" / "trend.sqlite3"),
+    stale_ttl=float(os.environ.get("TREND_STALE_TTL", 2 * 86400)),
+)
+TREND_WARM_SEASON = os.environ.get("TREND_WARM_SEASON", "1") == "1"
+# 검색어별 최근 조회 수 (hot key 미리 갱신용, _refresh_hot_keys마다 감쇠)
+trend_requests = Counter()
+_trend_revalidating = set()
+_revalidation_tasks = set()
+
+
+def _trend_window():
     today = datetime.date.today()
     start_date = (today - datetime.timedelta(days=365)).strftime("%Y-%m-%d")
     end_date = today.strftime("%Y-%m-%d")
-    url = "https://openapi.naver.com/v1/datalab/search"
-    headers = {**_naver_headers(), "Content-Type": "application/json"}
-    body = {
-        "startDate": start_date,
-        "endDate": end_date,
-        "timeUnit": "month",
-        "keywordGroups": [{"groupName": query, "keywords": [query]}],
-    }
-    try:
-        async with httpx.AsyncClient() as client:
-            res = await client.post(url, headers=headers, json=body)
-            data = res.json()
-    except Exception as e:
-        return {"success": False, "error": str(e)}
-    if "results" not in data or not data["results"]:
-        return {"success": False, "error": data.get("errorMessage", "트렌드 조회 실패")}
-    ratios = [r["ratio"] for r in data["results"][0]["data"]]
+    return start_date, end_date
+
+
+def _classify_trend(query: str, ratios):
+    """월별 ratio 시계열 → 성수기/비수기/보통 판단."""
     current_month = ratios[-1] if ratios else 0
     avg = sum(ratios) / len(ratios) if ratios else 0
     if current_month >= avg * 1.3:
@@ -96,12 +338,199 @@ async def get_trend(query: str):
     }
 
 
+async def _fetch_trend_chunk(queries, start_date: str, end_date: str):
+    """키워드 최대 5개를 keywordGroups로 묶어 1회 조회 → {query: 월별 ratio 리스트 또는 에러 dict}."""
+    headers = {**_naver_headers(), "Content-Type": "application/json"}
+    body = {
+        "startDate": start_date,
+        "endDate": end_date,
+        "timeUnit": "month",
+        "keywordGroups": [{"groupName": q, "keywords": [q]} for q in queries],
+    }
+    try:
+        res = await upstream.request(
+            "naver", "POST", "/v1/datalab/search", idempotent=True, headers=headers, json=body
+        )
+        data = res.json()
+    except Exception as e:
+        return {q: {"success": False, "error": str(e)} for q in queries}
+    if "results" not in data or not data["results"]:
+        error = {"success": False, "error": data.get("errorMessage", "트렌드 조회 실패")}
+        return {q: error for q in queries}
+    out = {q: {"success": False, "error": "트렌드 조회 실패"} for q in queries}
+    for result in data["results"]:
+        ratios = [r["ratio"] for r in result.get("data", [])]
+        # 여러 그룹을 한 번에 보내면 ratio가 그룹 전체 최대값 기준 → 그룹별 최대 100으로 재정규화 (단건 조회와 같은 값)
+        peak = max(ratios) if ratios else 0
+        if peak > 0:
+            ratios = [round(r * 100 / peak, 5) for r in ratios]
+        if result.get("title") in out:
+            out[result["title"]] = ratios
+    return out
+
+
+async def get_trends(queries, timeout: float = None, revalidate: bool = True):
+    """
+    여러 검색어 트렌드를 5개씩 묶어 조회 → {query: get_trend와 같은 결과}.
+    묶음 단위로 datalab_semaphore 동시성 제한, timeout(초) 초과 묶음은 실패 처리.
+    revalidate=True면 지난 날짜 창 시계열이 있는 검색어는 그 값을 바로 주고 백그라운드로 갱신.
+    """
+    unique = list(dict.fromkeys(q for q in queries if q))
+    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
+        return {q: {"success": False, "error": "API 키 미설정"} for q in unique}
+    if revalidate:
+        trend_requests.update(unique)
+    start_date, end_date = _trend_window()
+    results = {
+        q: _classify_trend(q, ratios)
+        for q, ratios in (await asyncio.to_thread(trend_store.get_many, unique, start_date, end_date)).items()
+    }
+    missing = [q for q in unique if q not in results]
+    if revalidate and missing:
+        stale = trend_store.get_stale_many(missing)
+        for q, ratios in stale.items():
+            results[q] = _classify_trend(q, ratios)
+        _revalidate_trends(list(stale))
+        missing = [q for q in missing if q not in stale]
+    if shared_cache is not None and missing:
+        missing = await _claim_trends(missing, start_date, end_date, results, timeout)
+    chunks = [missing[i:i + DATALAB_MAX_GROUPS] for i in range(0, len(missing), DATALAB_MAX_GROUPS)]
+
+    async def run(chunk):
+        async with datalab_semaphore:
+            try:
+                return await asyncio.wait_for(
+                    _fetch_trend_chunk(chunk, start_date, end_date), timeout
+                )
+            except asyncio.TimeoutError:
+                return {q: {"success": False, "error": "트렌드 조회 시간 초과"} for q in chunk}
+
+    fresh = {}
+    try:
+        for fetched in await asyncio.gather(*(run(chunk) for chunk in chunks)):
+            for q, ratios in fetched.items():
+                if isinstance(ratios, dict):
+                    results[q] = ratios
+                else:
+                    fresh[q] = ratios
+                    results[q] = _classify_trend(q, ratios)
+        await asyncio.to_thread(trend_store.put_many, fresh, start_date, end_date)
+    finally:
+        if shared_cache is not None and missing:
+            await asyncio.to_thread(_release_trend_leases, missing, start_date, end_date)
+    return results
+
+
+def _trend_lease(query: str, start_date: str, end_date: str):
+    return f"trend:{start_date}:{end_date}:{query}"
+
+
+def _acquire_trend_leases(queries, start_date: str, end_date: str):
+    """(스레드에서 실행) 임대를 잡은 키워드 집합."""
+    return {q for q in queries if shared_cache.acquire(_trend_lease(q, start_date, end_date), SHARED_LEASE_TTL)}
+
+
+def _release_trend_leases(queries, start_date: str, end_date: str):
+    for q in queries:
+        shared_cache.release(_trend_lease(q, start_date, end_date))
+
+
+async def _claim_trends(queries, start_date: str, end_date: str, results: dict, timeout: float = None):
+    """
+    워커 간 같은 키워드 중복 조회 방지 → 이 워커가 조회할 키워드 목록.
+    다른 워커가 임대 중인 키워드는 저장소에 들어오면 results에 채우고, 임대가 풀렸는데 없으면(실패) 직접 조회.
+    SHARED_LEASE_TTL(또는 timeout)이 지나도 안 들어온 키워드도 직접 조회.
+    """
+    leased = await asyncio.to_thread(_acquire_trend_leases, queries, start_date, end_date)
+    mine = [q for q in queries if q in leased]
+    waiting = [q for q in queries if q not in leased]
+    deadline = time.monotonic() + min(SHARED_LEASE_TTL, timeout or SHARED_LEASE_TTL)
+    while waiting and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        for q, ratios in (await asyncio.to_thread(trend_store.get_many, waiting, start_date, end_date)).items():
+            results[q] = _classify_trend(q, ratios)
+        waiting = [q for q in waiting if q not in results]
+        if waiting:
+            leased = await asyncio.to_thread(_acquire_trend_leases, waiting, start_date, end_date)
+            mine += [q for q in waiting if q in leased]
+            waiting = [q for q in waiting if q not in leased]
+    return mine + waiting
+
+
+def _revalidate_trends(queries):
+    """지난 창 값으로 응답한 검색어를 백그라운드로 새로 조회 (같은 검색어 중복 조회 없음)."""
+    queries = [q for q in queries if q not in _trend_revalidating]
+    if not queries:
+        return
+    _trend_revalidating.update(queries)
+
+    async def run():
+        try:
+            await get_trends(queries, revalidate=False)
+        finally:
+            _trend_revalidating.difference_update(queries)
+
+    # 응답을 끝낸 요청의 마감에 잘리지 않게 해제
+    with resilience.no_deadline():
+        task = asyncio.create_task(run())
+    _revalidation_tasks.add(task)
+    task.add_done_callback(_revalidation_tasks.discard)
+
+
+def _hot_trend_keywords(top_n: int):
+    """SEASON_KEYWORDS + 최근 많이 조회된 검색어 상위 top_n. 조회 수는 절반으로 감쇠."""
+    hot = [q for q, _ in trend_requests.most_common(top_n)]
+    for q in list(trend_requests):
+        trend_requests[q] //= 2
+        if not trend_requests[q]:
+            del trend_requests[q]
+    season = [k for kws in SEASON_KEYWORDS.values() for k in kws]
+    return list(dict.fromkeys(season + hot))
+
+
+async def _warm_season_trends():
+    """시작 시 SEASON_KEYWORDS 중 저장소에 없는 키워드만 묶음 조회로 채움."""
+    if not TREND_WARM_SEASON or not await _is_leader():
+        return
+    keywords = [k for kws in SEASON_KEYWORDS.values() for k in kws]
+    try:
+        await get_trends(keywords)
+    except Exception:
+        pass
+
+
+async def get_trend(query: str):
+    """네이버 데이터랩으로 검색 트렌드 조회 (시즌 판단)."""
+    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
+        return {"success": False, "error": "API 키 미설정"}
+    return (await get_trends([query]))[query]
+
+
 @app.get("/trend")
 async def trend_product(query: str):
     """네이버 데이터랩 검색 트렌드 (시즌 판단)."""
     return await get_trend(query)
 
 
+@app.post("/trend/batch")
+async def trend_batch(request: Request):
+    """여러 검색어 트렌드 일괄 조회. body: {"queries": ["핫팩", ...]} (최대 TREND_BATCH_MAX개)."""
+    try:
+        body = await request.json()
+    except Exception:
+        body = None
+    queries = body.get("queries") if isinstance(body, dict) else body
+    if not isinstance(queries, list) or not queries:
+        return {"success": False, "error": "queries 목록이 필요합니다."}
+    queries = [str(q).strip() for q in queries if str(q).strip()]
+    if len(queries) > TREND_BATCH_MAX:
+        return {"success": False, "error": f"한 번에 최대 {TREND_BATCH_MAX}개까지 조회할 수 있습니다."}
+    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
+        return {"success": False, "error": "API 키 미설정"}
+    trends = await get_trends(queries)
+    return {"success": True, "results": [trends[q] for q in dict.fromkeys(queries)]}
+
+
 # ---------- 시즌 캘린더 ----------
 SEASON_KEYWORDS = {
     "1월": ["핫팩", "방한용품", "가습기", "새해선물"],
@@ -119,45 +548,74 @@ SEASON_KEYWORDS = {
 }
 
 
-@app.get("/season")
-async def get_season_calendar(month: int = None):
-    """이번달 + 선택월 시즌 트렌드 조회."""
-    today = datetime.date.today()
-    target_month = month or today.month
-    key = f"{target_month}월"
-    keywords = SEASON_KEYWORDS.get(key, SEASON_KEYWORDS.get("1월", []))
+# 데이터랩 묶음(키워드 5개) 호출 타임아웃(초). 초과 시 해당 키워드는 "—" 행으로 대체
+SEASON_KEYWORD_TIMEOUT = float(os.environ.get("SEASON_KEYWORD_TIMEOUT", 5))
 
-    results = []
-    for keyword in keywords:
-        trend = await get_trend(keyword)
-        if trend.get("success"):
-            avg = trend.get("avg_ratio") or 1
-            change_pct = (
-                round((trend["current_ratio"] / avg - 1) * 100, 1) if avg > 0 else 0
-            )
-            results.append({
-                "keyword": keyword,
-                "season": trend.get("season", ""),
-                "season_icon": trend.get("season_icon", ""),
-                "current_ratio": trend.get("current_ratio", 0),
-                "avg_ratio": avg,
-                "change_pct": change_pct,
-            })
-        else:
-            results.append({
-                "keyword": keyword,
-                "season": "—",
-                "season_icon": "🟡",
-                "current_ratio": 0,
-                "avg_ratio": 1,
-                "change_pct": 0,
-            })
 
+def _season_row(keyword: str, trend: dict):
+    if trend.get("success"):
+        avg = trend.get("avg_ratio") or 1
+        change_pct = (
+            round((trend["current_ratio"] / avg - 1) * 100, 1) if avg > 0 else 0
+        )
+        return {
+            "keyword": keyword,
+            "season": trend.get("season", ""),
+            "season_icon": trend.get("season_icon", ""),
+            "current_ratio": trend.get("current_ratio", 0),
+            "avg_ratio": avg,
+            "change_pct": change_pct,
+        }
+    return {
+        "keyword": keyword,
+        "season": "—",
+        "season_icon": "🟡",
+        "current_ratio": 0,
+        "avg_ratio": 1,
+        "change_pct": 0,
+    }
+
+
+def _season_month(keywords, trends: dict):
+    results = [_season_row(keyword, trends[keyword]) for keyword in keywords]
     results.sort(
         key=lambda x: x["current_ratio"] / max(x["avg_ratio"], 0.01),
         reverse=True,
     )
-    return {"success": True, "month": target_month, "keywords": results}
+    return results
+
+
+async def _season_trends(keywords):
+    """키워드(중복 제거) 트렌드를 5개씩 묶어 동시 조회 → {keyword: trend}."""
+    return await get_trends(list(keywords), timeout=SEASON_KEYWORD_TIMEOUT)
+
+
+async def get_season_calendar(month: str = None):
+    """이번달 + 선택월 시즌 트렌드 조회. month=all 이면 12개월 전체. fields로 응답 키 선택 (예: months.keywords.keyword)."""
+    today = datetime.date.today()
+    if month == "all":
+        month_keywords = {m: SEASON_KEYWORDS.get(f"{m}월", []) for m in range(1, 13)}
+        trends = await _season_trends(k for kws in month_keywords.values() for k in kws)
+        return {
+            "success": True,
+            "month": "all",
+            "months": [
+                {"month": m, "keywords": _season_month(kws, trends)}
+                for m, kws in month_keywords.items()
+            ],
+        }
+    try:
+        target_month = int(month) if month else today.month
+    except ValueError:
+        return {"success": False, "error": "month는 1~12 또는 all 이어야 합니다."}
+    key = f"{target_month}월"
+    keywords = SEASON_KEYWORDS.get(key, SEASON_KEYWORDS.get("1월", []))
+
+    trends = await _season_trends(keywords)
+    return {"success": True, "month": target_month, "keywords": _season_month(keywords, trends)}
+
+
+app.get("/season")(_json_route(get_season_calendar))
 
 
 # ---------- 타겟층 (데이터랩 쇼핑인사이트) ----------
@@ -184,71 +642,359 @@ NAVER_CATEGORY_CODES = {
 }
 
 
-@app.get("/target")
-async def get_target_audience(query: str, category: str = ""):
-    """네이버 데이터랩 쇼핑인사이트 기반 성별/연령대. 카테고리 없으면 조회 불가."""
-    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
-        return {
-            "success": True,
-            "query": query,
-            "gender": None,
-            "age_groups": None,
-            "main_target": "조회 불가",
-        }
-    category_code = NAVER_CATEGORY_CODES.get(category or "기타", "50000167")
+# 쇼핑인사이트 키워드 성별/연령/기기 비율은 월 단위 집계 → (카테고리 코드, 검색어, 90일 창) 단위 캐시
+# 만료 후 TARGET_CACHE_STALE_TTL초는 기존 값 응답 + 백그라운드 갱신
+target_cache = TTLCache(
+    "target",
+    maxsize=int(os.environ.get("TARGET_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("TARGET_CACHE_TTL", 6 * 3600)),
+    stale_ttl=float(os.environ.get("TARGET_CACHE_STALE_TTL", 24 * 3600)),
+    shared=shared_cache,
+    lease_ttl=SHARED_LEASE_TTL,
+)
+TARGET_WINDOW_DAYS = 90
+INSIGHT_BREAKDOWNS = ("gender", "age", "device")
+GENDER_LABELS = {"f": "female", "m": "male"}
+AGE_LABELS = {"10": "10대", "20": "20대", "30": "30대", "40": "40대", "50": "50대", "60": "60대+"}
+DEVICE_LABELS = {"pc": "pc", "mo": "mobile"}
+
+
+def _target_window():
     today = datetime.date.today()
-    start_date = (today - datetime.timedelta(days=90)).strftime("%Y-%m-%d")
-    end_date = today.strftime("%Y-%m-%d")
-    url = "https://openapi.naver.com/v1/datalab/shopping/categories"
+    start_date = (today - datetime.timedelta(days=TARGET_WINDOW_DAYS)).strftime("%Y-%m-%d")
+    return start_date, today.strftime("%Y-%m-%d")
+
+
+async def _fetch_insight(breakdown: str, category_code: str, query: str, start_date: str, end_date: str):
+    """쇼핑인사이트 키워드 성별/연령/기기별 클릭 추이 → {group: 기간 합계 ratio}."""
     headers = {**_naver_headers(), "Content-Type": "application/json"}
     body = {
         "startDate": start_date,
         "endDate": end_date,
         "timeUnit": "month",
-        "category": [{"name": "검색어", "param": [query]}],
-        "device": "mo",
+        "category": category_code,
+        "keyword": query,
     }
-    try:
-        async with httpx.AsyncClient() as client:
-            res = await client.post(url, headers=headers, json=body)
-            data = res.json()
-    except Exception:
+    res = await upstream.request(
+        "naver",
+        "POST",
+        f"/v1/datalab/shopping/category/keyword/{breakdown}",
+        idempotent=True,
+        headers=headers,
+        json=body,
+    )
+    data = res.json()
+    if not data.get("results"):
+        raise ValueError(data.get("errorMessage", "쇼핑인사이트 조회 실패"))
+    totals = {}
+    for row in data["results"][0].get("data", []):
+        totals[row.get("group")] = totals.get(row.get("group"), 0.0) + float(row.get("ratio", 0))
+    return totals
+
+
+def _distribution(totals: dict, labels: dict):
+    """{group: ratio 합계} → {라벨: 비율(%)} (합 100, 없는 그룹 0)."""
+    values = [totals.get(group, 0.0) for group in labels]
+    total = sum(values)
+    if total <= 0:
+        return None
+    return {label: round(v * 100 / total, 1) for label, v in zip(labels.values(), values)}
+
+
+def _main_target(gender: dict, age_groups: dict):
+    """최다 연령대 (바로 옆 연령대가 70% 이상이면 범위로) + 한 성별이 60% 이상이면 성별."""
+    if not age_groups:
+        return "조회 불가"
+    ages = list(age_groups)
+    top = max(range(len(ages)), key=lambda i: age_groups[ages[i]])
+    near = [i for i in (top - 1, top + 1) if 0 <= i < len(ages)]
+    second = max(near, key=lambda i: age_groups[ages[i]]) if near else None
+    if second is not None and age_groups[ages[second]] >= age_groups[ages[top]] * 0.7:
+        lo, hi = sorted((top, second))
+        label = f"{ages[lo].rstrip('대+')}~{ages[hi].rstrip('+')}"
+    else:
+        label = ages[top]
+    if gender:
+        if gender["female"] >= 60:
+            label += " 여성"
+        elif gender["male"] >= 60:
+            label += " 남성"
+    return label
+
+
+@app.get("/target")
+async def get_target_audience(query: str, category: str = ""):
+    """
+    네이버 데이터랩 쇼핑인사이트 키워드 성별/연령대/기기 비율.
+    category는 카테고리명(/category 결과) 또는 코드, 없으면 카테고리 인덱스로 추정 → 실패 시 50000167.
+    성별·연령·기기 3개 조회는 동시에 요청.
+    """
+    unavailable = {
+        "success": True,
+        "query": query,
+        "gender": None,
+        "age_groups": None,
+        "device": None,
+        "main_target": "조회 불가",
+    }
+    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
+        return unavailable
+    if category.isdigit():
+        category_code = category
+    else:
+        if not category:
+            hit = await _lookup_category(query)
+            category = hit[0][0] if hit else ""
+        category_code = NAVER_CATEGORY_CODES.get(category or "기타", "50000167")
+    start_date, end_date = _target_window()
+
+    async def load():
+        results = await asyncio.gather(
+            *(
+                _fetch_insight(b, category_code, query, start_date, end_date)
+                for b in INSIGHT_BREAKDOWNS
+            ),
+            return_exceptions=True,
+        )
+        by_breakdown = dict(zip(INSIGHT_BREAKDOWNS, results))
+        failed = [b for b, r in by_breakdown.items() if isinstance(r, Exception)]
+        if len(failed) == len(INSIGHT_BREAKDOWNS):
+            raise by_breakdown[failed[0]]
+
+        def dist(breakdown, labels):
+            totals = by_breakdown[breakdown]
+            return None if isinstance(totals, Exception) else _distribution(totals, labels)
+
+        gender = dist("gender", GENDER_LABELS)
+        age_groups = dist("age", AGE_LABELS)
         return {
             "success": True,
             "query": query,
-            "gender": {"female": 50, "male": 50},
-            "age_groups": {"10대": 10, "20대": 25, "30대": 25, "40대": 20, "50대": 12, "60대+": 8},
-            "main_target": "20~30대",
+            "category_code": category_code,
+            "period": {"start": start_date, "end": end_date},
+            "gender": gender,
+            "age_groups": age_groups,
+            "device": dist("device", DEVICE_LABELS),
+            "main_target": _main_target(gender, age_groups),
+            "partial": bool(failed),
         }
-    if "results" not in data or not data.get("results"):
+
+    try:
+        return await target_cache.get_or_load(
+            (category_code, query, start_date, end_date),
+            load,
+            cacheable=lambda d: not d["partial"],
+            stale_on_error=True,
+        )
+    except Exception as e:
+        return {**unavailable, "category_code": category_code, "error": str(e)}
+
+
+# ---------- 네이버쇼핑 검색 캐시 ----------
+# /search, /product-stats, /compare, /analyze, /category가 같은 검색어를 짧은 간격으로 반복 조회 → (query, display, sort) 단위 캐시
+# display는 SEARCH_FETCH_DISPLAY 이상으로 올려 받아 잘라 씀 (display=5/10/20 요청이 업스트림 1회를 공유)
+SEARCH_FETCH_DISPLAY = int(os.environ.get("SEARCH_FETCH_DISPLAY", 20))
+shop_cache = TTLCache(
+    "shop_search",
+    maxsize=int(os.environ.get("SEARCH_CACHE_SIZE", 2048)),
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", 300)),
+    # 만료 후 이 시간(초) 안에는 기존 값을 바로 응답하고 백그라운드로 갱신 (stale-while-revalidate)
+    stale_ttl=float(os.environ.get("SEARCH_CACHE_STALE_TTL", 600)),
+    shared=shared_cache,
+    lease_ttl=SHARED_LEASE_TTL,
+)
+
+
+async def shop_search(query: str, display: int, sort: str = "sim", bypass: bool = False):
+    """네이버쇼핑 검색 원본 응답(JSON). 정상 응답(items 포함)만 캐시."""
+    fetch_display = max(display, SEARCH_FETCH_DISPLAY)
+
+    async def load():
+        params = {"query": query, "display": fetch_display, "sort": sort}
+        res = await upstream.request(
+            "naver", "GET", "/v1/search/shop.json", headers=_naver_headers(), params=params
+        )
+        data = res.json()
+        if data.get("items"):
+            await _learn_category(query, data["items"])
+            if sort == "sim":
+                # 기록은 SQLite 쓰기(압축 중이면 잠금 대기) → 이벤트 루프 밖에서
+                await asyncio.to_thread(
+                    price_store.record, query, [int(it["lprice"]) for it in data["items"] if it.get("lprice")]
+                )
+        return data
+
+    try:
+        # 쿼터 초과·속도 제한이면 만료된 캐시라도 응답
+        data = await shop_cache.get_or_load(
+            (query, fetch_display, sort),
+            load,
+            bypass=bypass,
+            cacheable=lambda d: "items" in d,
+            stale_on_error=True,
+        )
+    except UpstreamLimited as e:
+        return {"errorMessage": str(e)}
+    except (httpx.HTTPError, ValueError) as e:
+        # 재시도 후에도 연결 실패·잘못된 응답 → 500 대신 검색 실패로 응답
+        return {"errorMessage": f"네이버쇼핑 검색 실패: {type(e).__name__}"}
+    if "items" not in data:
+        return data
+    return {**data, "items": data["items"][:display]}
+
+
+# ---------- 시중가 분포 (딥 샘플링) ----------
+# 상위 20개 평균은 액세서리·묶음상품에 흔들림 → 네이버 검색 결과를 100개씩 최대 1000개(start 한도)까지 동시에 받아
+# PriceAccumulator로 흘려보내며 분포만 누적 (상품 목록은 보관하지 않음). 페이지마다 쿼터를 쓰므로 분포 단위로 캐시
+NAVER_SEARCH_PAGE = 100
+NAVER_SEARCH_MAX_START = 1000
+DEEP_SEARCH_PAGES = int(os.environ.get("DEEP_SEARCH_PAGES", 5))
+DEEP_SEARCH_CONCURRENCY = int(os.environ.get("DEEP_SEARCH_CONCURRENCY", 4))
+DEEP_MIN_RELEVANCE = float(os.environ.get("DEEP_MIN_RELEVANCE", 0.5))
+deep_cache = TTLCache(
+    "shop_deep",
+    maxsize=int(os.environ.get("DEEP_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("DEEP_CACHE_TTL", 1800)),
+    stale_ttl=float(os.environ.get("DEEP_CACHE_STALE_TTL", 3600)),
+    shared=shared_cache,
+    lease_ttl=SHARED_LEASE_TTL,
+)
+
+
+async def _fetch_shop_page(query: str, start: int):
+    params = {"query": query, "display": NAVER_SEARCH_PAGE, "start": start, "sort": "sim"}
+    res = await upstream.request(
+        "naver", "GET", "/v1/search/shop.json", headers=_naver_headers(), params=params
+    )
+    return res.json()
+
+
+async def deep_price_distribution(query: str, bypass: bool = False):
+    """
+    검색 결과 최대 DEEP_SEARCH_PAGES페이지(100개씩) 가격 분포 → 중앙값·절사평균·백분위·robust_price.
+    첫 페이지로 전체 건수를 확인한 뒤 나머지 페이지는 DEEP_SEARCH_CONCURRENCY개씩 동시 조회, 도착 순서대로 누적.
+    뒤 페이지가 실패하면 받은 페이지까지로 계산하고 partial=True.
+    """
+    async def load():
+        acc = PriceAccumulator(query, min_relevance=DEEP_MIN_RELEVANCE)
+        first = await _fetch_shop_page(query, 1)
+        if "items" not in first:
+            return {"success": False, "error": first.get("errorMessage", "검색 실패")}
+        acc.add_items(first["items"])
+        last_start = min(first.get("total", 0), NAVER_SEARCH_MAX_START, DEEP_SEARCH_PAGES * NAVER_SEARCH_PAGE)
+        starts = list(range(1 + NAVER_SEARCH_PAGE, last_start + 1, NAVER_SEARCH_PAGE))
+        semaphore = asyncio.Semaphore(DEEP_SEARCH_CONCURRENCY)
+
+        async def page(start):
+            async with semaphore:
+                return await _fetch_shop_page(query, start)
+
+        pages, failed = 1, 0
+        for next_done in asyncio.as_completed([page(start) for start in starts]):
+            try:
+                data = await next_done
+            except Exception:
+                failed += 1
+                continue
+            if "items" not in data:
+                failed += 1
+                continue
+            acc.add_items(data["items"])
+            pages += 1
         return {
             "success": True,
             "query": query,
-            "gender": {"female": 55, "male": 45},
-            "age_groups": {"10대": 5, "20대": 41, "30대": 35, "40대": 14, "50대": 4, "60대+": 1},
-            "main_target": "20~30대 여성",
+            "total": first.get("total", 0),
+            "pages": pages,
+            "partial": failed > 0,
+            **acc.summary(),
         }
-    return {
-        "success": True,
-        "query": query,
-        "gender": {"female": 67, "male": 33},
-        "age_groups": {"10대": 5, "20대": 41, "30대": 35, "40대": 14, "50대": 4, "60대+": 1},
-        "main_target": "20~30대 여성",
-    }
+
+    try:
+        return await deep_cache.get_or_load(
+            query,
+            load,
+            bypass=bypass,
+            cacheable=lambda d: d.get("success") and not d["partial"] and d["used"] > 0,
+            stale_on_error=True,
+        )
+    except UpstreamLimited as e:
+        return {"success": False, "error": str(e)}
+    except (httpx.HTTPError, ValueError) as e:
+        # 첫 페이지 연결 실패·JSON 아닌 응답(502 HTML 등) → 500 대신 분포 실패로 응답
+        return {"success": False, "error": f"가격 분포 조회 실패: {type(e).__name__}"}
+
+
+# ---------- hot key 미리 갱신 ----------
+# 트래픽 대부분이 시즌 키워드 수백 개에 몰림 → 자주 조회되는 검색·타겟 캐시는 만료 전에, 트렌드는 날짜 창이 바뀌면 바로 갱신
+HOT_REFRESH_INTERVAL = float(os.environ.get("HOT_REFRESH_INTERVAL", 60))  # 0이면 끔
+HOT_REFRESH_TOP_N = int(os.environ.get("HOT_REFRESH_TOP_N", 300))
+HOT_REFRESH_AHEAD = float(os.environ.get("HOT_REFRESH_AHEAD", 90))
+
+
+async def _refresh_hot_keys():
+    while True:
+        await asyncio.sleep(HOT_REFRESH_INTERVAL)
+        if not await _is_leader():
+            continue
+        try:
+            await shop_cache.refresh_hot(HOT_REFRESH_TOP_N, HOT_REFRESH_AHEAD)
+            await target_cache.refresh_hot(HOT_REFRESH_TOP_N, HOT_REFRESH_AHEAD)
+            await deep_cache.refresh_hot(HOT_REFRESH_TOP_N, HOT_REFRESH_AHEAD)
+            await get_trends(_hot_trend_keywords(HOT_REFRESH_TOP_N), revalidate=False)
+        except Exception:
+            pass
 
 
 # ---------- A-1: 시중가 조회 ----------
-@app.get("/search")
-async def search_product(query: str, display: int = 10, include_trend: bool = False):
-    """네이버쇼핑 시중가 조회. include_trend=true 시 트렌드(시즌) 포함."""
+async def search_product(
+    query: str,
+    display: int = 10,
+    include_trend: bool = False,
+    deep: bool = False,
+    no_cache: bool = False,
+    fields: Optional[str] = None,
+    cache_control: Annotated[Optional[str], Header()] = None,
+):
+    """
+    네이버쇼핑 시중가 조회. include_trend=true 시 트렌드(시즌) 포함. no_cache=true 또는 Cache-Control: no-cache 시 캐시 우회.
+    deep=true 시 검색 결과 최대 DEEP_SEARCH_PAGES×100개의 가격 분포(distribution)와 그 기준 robust_price.
+    fields 지정 시 그 키만 응답. trend·distribution(robust_price)·top_items가 빠지면 해당 조회·가공 생략.
+    """
     if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
         return {"success": False, "error": "API 키 미설정"}
-    url = "https://openapi.naver.com/v1/search/shop.json"
-    params = {"query": query, "display": min(display, 30), "sort": "sim"}
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url, headers=_naver_headers(), params=params)
-        data = res.json()
+    spec = parse_fields(fields)
+    include_trend = include_trend and wants(spec, "trend")
+    deep = deep and (wants(spec, "distribution") or wants(spec, "robust_price"))
+    bypass = bypass_requested(cache_control, no_cache)
+    if deep:
+        data, distribution = await asyncio.gather(
+            shop_search(query, min(display, 30), bypass=bypass),
+            deep_price_distribution(query, bypass=bypass),
+        )
+    else:
+        data = await shop_search(query, min(display, 30), bypass=bypass)
+    result = _summarize_search(query, data, top_items=wants(spec, "top_items"))
+    if deep and result.get("success"):
+        result["distribution"] = distribution
+        if distribution.get("success") and distribution.get("used"):
+            result["robust_price"] = distribution["robust_price"]
+    if include_trend and result.get("success"):
+        result["trend"] = await get_trend(query)
+    return result
+
+
+app.get("/search")(_json_route(search_product))
+
 
+def _robust_price(query: str, items):
+    acc = PriceAccumulator(query, min_relevance=DEEP_MIN_RELEVANCE)
+    acc.add_items(items)
+    return acc.summary()["robust_price"]
+
+
+def _summarize_search(query: str, data: dict, top_items: bool = True):
+    """네이버쇼핑 검색 응답 → 시중가 요약 (min/avg/max, 경쟁 수, 상위 상품). top_items=False면 상위 상품 생략."""
     if "items" not in data:
         msg = data.get("errorMessage", "검색 실패")
         if data.get("errorCode") == "024" or "Client ID" in str(msg):
@@ -272,22 +1018,66 @@ async def search_product(query: str, display: int = 10, include_trend: bool = Fa
             "image": it.get("image", ""),
         }
         for it in items[:10]
-    ]
+    ] if top_items else []
 
     competitor_count = data.get("total", len(items))
-    result = {
+    return {
         "success": True,
         "query": query,
         "min_price": min(prices) if prices else 0,
         "avg_price": int(sum(prices) / len(prices)) if prices else 0,
         "max_price": max(prices) if prices else 0,
+        # 무관 상품·가격 이상치 제외 절사평균 (마진 계산 기준)
+        "robust_price": _robust_price(query, items) or (int(sum(prices) / len(prices)) if prices else 0),
         "competitor_count": competitor_count,
         "seller_count": competitor_count,
         "top_items": top_items,
     }
-    if include_trend:
-        result["trend"] = await get_trend(query)
-    return result
+
+
+# ---------- 시중가 이력 ----------
+# 업스트림에서 새로 받은 검색 결과(정확도순)의 lprice를 검색어별 스냅샷으로 누적 → 가격 추이는 저장소만으로 계산
+price_store = PriceStore(
+    os.environ.get("PRICE_DB_PATH", Path(__file__).resolve().parent / "data" / "prices.sqlite3"),
+    min_interval=float(os.environ.get("PRICE_SNAPSHOT_INTERVAL", 3600)),
+    raw_days=int(os.environ.get("PRICE_RAW_DAYS", 3)),
+    retention_days=int(os.environ.get("PRICE_RETENTION_DAYS", 180)),
+)
+PRICE_COMPACT_INTERVAL = float(os.environ.get("PRICE_COMPACT_INTERVAL", 3600))  # 0이면 끔
+PRICE_HISTORY_MAX_POINTS = 500
+
+
+async def _compact_price_history():
+    while True:
+        try:
+            if await _is_leader():
+                await asyncio.to_thread(price_store.compact)
+        except Exception:
+            pass
+        await asyncio.sleep(PRICE_COMPACT_INTERVAL)
+
+
+@app.get("/price-history")
+async def price_history(query: str, days: int = 30, points: int = 60):
+    """검색어 시중가 추이. days일 구간을 points개 이하로 나눠 min/avg/max와 p10~p90 밴드 반환."""
+    if not 1 <= days <= price_store.retention_days:
+        return {"success": False, "error": f"days는 1~{price_store.retention_days} 사이여야 합니다."}
+    if not 1 <= points <= PRICE_HISTORY_MAX_POINTS:
+        return {"success": False, "error": f"points는 1~{PRICE_HISTORY_MAX_POINTS} 사이여야 합니다."}
+    series, summary = await asyncio.to_thread(price_store.history, query, days, points)
+    if summary is None:
+        return {"success": False, "error": "저장된 가격 이력이 없습니다. 먼저 /search로 조회하세요."}
+
+    def stamp(ts):
+        return datetime.datetime.fromtimestamp(ts).isoformat(timespec="minutes")
+
+    return {
+        "success": True,
+        "query": query,
+        "days": days,
+        "summary": {**summary, "first_ts": stamp(summary["first_ts"]), "last_ts": stamp(summary["last_ts"])},
+        "series": [{**row, "ts": stamp(row["ts"])} for row in series],
+    }
 
 
 # ---------- A-2: 리뷰/판매량·경쟁강도 ----------
@@ -297,7 +1087,10 @@ async def product_stats(query: str):
     search = await search_product(query, display=10)
     if not search.get("success"):
         return search
+    return _product_stats(query, search)
+
 
+def _product_stats(query: str, search: dict):
     items = search.get("top_items", [])
     total_review = sum(it.get("review_count", 0) for it in items)
     ratings = [it["rating"] for it in items if it.get("rating")]
@@ -332,18 +1125,108 @@ CATEGORY_MAP = {
 DEFAULT_FEE = {"스마트": 6.6, "쿠팡": 8.0, "오픈": 15.0}
 
 
+# 네이버 category1 (또는 category1, category2) → CATEGORY_MAP 키 (None이면 기타)
+NAVER_CATEGORY_TAXONOMY = {
+    "패션의류": "의류",
+    "패션잡화": "의류",
+    "화장품/미용": "화장품",
+    "디지털/가전": "전자기기",
+    "가구/인테리어": "생활용품",
+    "출산/육아": "생활용품",
+    "식품": "식품",
+    "스포츠/레저": None,
+    "생활/건강": "생활용품",
+    "여행/문화": None,
+    "면세점": None,
+    ("출산/육아", "분유"): "식품",
+    ("출산/육아", "이유식"): "식품",
+}
+OTHER_CATEGORY = {"category": "기타", "risk": "보통", "notes": []}
+# 검색어 → 카테고리 경로 로컬 인덱스 (검색 결과로 학습, 비슷한 검색어는 업스트림 없이 분류)
+category_index = CategoryIndex(
+    maxsize=int(os.environ.get("CATEGORY_INDEX_SIZE", 50000)),
+    min_similarity=float(os.environ.get("CATEGORY_INDEX_MIN_SIMILARITY", 0.6)),
+)
+# 멀티 워커: 학습한 검색어는 공유 캐시에도 기록, 다른 워커 기록은 조회 시 최대 초당 1번 가져와 반영
+CATEGORY_SHARED_TTL = float(os.environ.get("CATEGORY_SHARED_TTL", 30 * 86400))
+_category_sync = {"rowid": 0, "at": 0.0}
+
+
+async def _learn_category(query: str, items):
+    path = category_index.learn(query, items)
+    if path is not None and shared_cache is not None:
+        await asyncio.to_thread(
+            shared_cache.set, "category", normalize_query(query), list(path), CATEGORY_SHARED_TTL
+        )
+
+
+async def _lookup_category(query: str):
+    if shared_cache is not None and time.monotonic() - _category_sync["at"] >= 1.0:
+        _category_sync["at"] = time.monotonic()
+        rows, _category_sync["rowid"] = await asyncio.to_thread(
+            shared_cache.changes, "category", _category_sync["rowid"]
+        )
+        for key, path in rows:
+            category_index.add(key, path)
+    return category_index.lookup(query)
+
+
+@functools.lru_cache(maxsize=1024)
+def _category_entry(cat1: str, cat2: str = ""):
+    """네이버 카테고리 → CATEGORY_MAP 항목. 분류표에 없는 category1만 부분 문자열 매칭."""
+    key = (cat1, cat2)
+    if key in NAVER_CATEGORY_TAXONOMY or cat1 in NAVER_CATEGORY_TAXONOMY:
+        name = NAVER_CATEGORY_TAXONOMY.get(key, NAVER_CATEGORY_TAXONOMY.get(cat1))
+        return CATEGORY_MAP[name] if name else OTHER_CATEGORY
+    if cat1:
+        for name in CATEGORY_MAP:
+            if name in cat1 or cat1 in name:
+                return CATEGORY_MAP[name]
+    return OTHER_CATEGORY
+
+
+def _category_result(path, source: str, match: str = None, score: float = None):
+    cat1, sub = path[0], path[1]
+    matched = _category_entry(cat1, sub)
+    result = {
+        "success": True,
+        "category": matched["category"],
+        "sub_category": sub or cat1,
+        "naver_category": cat1,
+        "category_path": [p for p in path if p],
+        "category_code": NAVER_CATEGORY_CODES.get(cat1)
+        or NAVER_CATEGORY_CODES.get(matched["category"], "50000167"),
+        "fee_rate": DEFAULT_FEE,
+        "risk_level": matched["risk"],
+        "special_notes": matched.get("notes", []),
+        "source": source,
+    }
+    if match:
+        result["match"] = match
+        result["score"] = score
+    return result
+
+
 @app.get("/category")
 async def category_classify(query: str):
-    """네이버쇼핑 category1 기반 카테고리·수수료·리스크 반환."""
+    """
+    네이버쇼핑 category1 기반 카테고리·수수료·리스크 반환.
+    이미 본 검색어(또는 비슷한 검색어)는 로컬 인덱스로 즉시 분류, 처음 보는 검색어만 네이버 조회.
+    """
+    hit = await _lookup_category(query)
+    if hit is not None:
+        path, match, score = hit
+        return _category_result(path, "index", match, score)
     if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
         return {"success": False, "error": "API 키 미설정"}
-    url = "https://openapi.naver.com/v1/search/shop.json"
-    params = {"query": query, "display": 5, "sort": "sim"}
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url, headers=_naver_headers(), params=params)
-        data = res.json()
+    data = await shop_search(query, 5)
+    return _classify_category(data)
+
 
-    if "items" not in data or not data["items"]:
+def _classify_category(data: dict):
+    """네이버쇼핑 검색 응답 상위 상품 카테고리 경로(다수결) → 카테고리·수수료·리스크."""
+    path = category_index.vote(data.get("items") or [])
+    if path is None:
         err = data.get("errorMessage", "")
         if data.get("errorCode") == "024" or "Client ID" in str(err):
             return {"success": False, "error": "네이버 API 인증 실패: Client ID/Secret 확인"}
@@ -355,73 +1238,129 @@ async def category_classify(query: str):
             "risk_level": "보통",
             "special_notes": [],
         }
+    return _category_result(path, "naver")
 
-    # category1 값 사용 (예: "가방", "신발", "식품" 등)
-    cat1 = (data["items"][0].get("category1") or "").strip()
-    sub = (data["items"][0].get("category2") or "").strip()
-
-    matched = None
-    for key in CATEGORY_MAP:
-        if key in cat1 or cat1 in key:
-            matched = CATEGORY_MAP[key]
-            break
-    if not matched:
-        for key in ["의류", "식품", "생활용품", "전자기기", "화장품"]:
-            if key in cat1:
-                matched = CATEGORY_MAP[key]
-                break
-    if not matched:
-        matched = {"category": "기타", "risk": "보통", "notes": []}
 
+# ---------- 상품 종합 (검색·경쟁강도·카테고리·트렌드·타겟 1회 호출) ----------
+@app.get("/product/overview")
+async def product_overview(query: str):
+    """
+    /search + /product-stats + /category + /trend + /target을 한 번에.
+    검색 1회 응답으로 시중가·경쟁강도·카테고리를 함께 계산하고, 트렌드는 동시에 조회.
+    섹션별 소요 시간(timings_ms)과 실패 섹션(errors) 포함.
+    """
+    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
+        return {"success": False, "error": "API 키 미설정"}
+    timings = {}
+    errors = {}
+
+    async def timed(section, coro):
+        started = time.perf_counter()
+        try:
+            result = await coro
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        timings[section] = round((time.perf_counter() - started) * 1000, 1)
+        if not result.get("success"):
+            errors[section] = result.get("error", "조회 실패")
+        return result
+
+    async def search_chain():
+        started = time.perf_counter()
+        try:
+            data = await shop_search(query, 20)
+        except Exception as e:
+            data = {"errorMessage": str(e)}
+        timings["search"] = round((time.perf_counter() - started) * 1000, 1)
+        search = _summarize_search(query, data)
+        if not search.get("success"):
+            errors["search"] = search.get("error")
+            return search, None, None, None
+        stats = _product_stats(query, search)
+        category = _classify_category(data)
+        target_category = category.get("naver_category") or category.get("category", "")
+        if target_category not in NAVER_CATEGORY_CODES:
+            target_category = category.get("category", "")
+        target = await timed("target", get_target_audience(query, target_category))
+        return search, stats, category, target
+
+    (search, stats, category, target), trend = await asyncio.gather(
+        search_chain(), timed("trend", get_trend(query))
+    )
     return {
-        "success": True,
-        "category": matched["category"],
-        "sub_category": sub or cat1,
-        "fee_rate": DEFAULT_FEE,
-        "risk_level": matched["risk"],
-        "special_notes": matched.get("notes", []),
+        "success": search.get("success", False),
+        "query": query,
+        "partial": bool(errors),
+        "search": search,
+        "stats": stats,
+        "category": category,
+        "trend": trend,
+        "target": target,
+        "timings_ms": timings,
+        "errors": errors,
     }
 
 
 # ---------- 도매꾹 URL 파싱 ----------
-@app.get("/parse-url")
-async def parse_wholesale_url(request: Request, url: str = ""):
-    """
-    도매꾹 상품 URL에서 원가 자동 추출.
-    지원: 도매꾹 (domeggook.com)
-    미지원: 그 외 사이트 → 수동 입력 안내.
-    """
+# 공급사 상품 목록을 옮길 때 같은 상품 URL이 반복됨 → 상품번호 단위로 짧게 캐시 (가격·재고가 바뀜)
+PARSE_URL_BATCH_MAX = int(os.environ.get("PARSE_URL_BATCH_MAX", 500))
+PARSE_URL_CONCURRENCY = int(os.environ.get("PARSE_URL_CONCURRENCY", 8))
+domeggook_item_cache = TTLCache(
+    "domeggook_item",
+    maxsize=int(os.environ.get("DOMEGGOOK_ITEM_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("DOMEGGOOK_ITEM_CACHE_TTL", 120)),
+    shared=shared_cache,
+    lease_ttl=SHARED_LEASE_TTL,
+)
+
+
+def _domeggook_item_id(url: str):
+    """도매꾹 상품 URL → (상품번호, None) 또는 (None, 실패 응답)."""
     if not url or "domeggook.com" not in url:
-        return {
+        return None, {
             "success": False,
             "supported": False,
             "message": "현재 도매꾹 URL만 자동 추출 지원됩니다. 원가를 직접 입력해주세요.",
         }
     match = re.search(r"aid=(\d+)", url)
     if not match:
-        return {"success": False, "error": "상품 ID를 찾을 수 없습니다."}
-    item_id = match.group(1)
-    api_key = request.headers.get("X-Domeggook-Key", "").strip()
-    if not api_key:
-        return {
-            "success": False,
-            "error": "도매꾹 API 키 미설정",
-            "guide": "설정 탭에서 도매꾹 API 키를 입력해주세요.",
-        }
-    params = {
-        "ver": "6.1",
-        "cmd": "getItem",
-        "aid": api_key,
-        "no": item_id,
-        "out": "json",
+        return None, {"success": False, "error": "상품 ID를 찾을 수 없습니다."}
+    return match.group(1), None
+
+
+def _missing_domeggook_key():
+    return {
+        "success": False,
+        "error": "도매꾹 API 키 미설정",
+        "guide": "설정 탭에서 도매꾹 API 키를 입력해주세요.",
     }
+
+
+async def fetch_domeggook_item(api_key: str, item_id: str):
+    """getItem 상품 정보(item dict). 정상 응답만 상품번호 단위로 캐시."""
+    async def load():
+        params = {
+            "ver": "6.1",
+            "cmd": "getItem",
+            "aid": api_key,
+            "no": item_id,
+            "out": "json",
+        }
+        res = await upstream.request("domeggook", "GET", "/ssl/api/", params=params)
+        data = res.json()
+        return data.get("item", {}) if isinstance(data, dict) else {}
+
+    return await domeggook_item_cache.get_or_load(item_id, load, cacheable=bool)
+
+
+async def _parse_domeggook_url(api_key: str, url: str):
+    item_id, failed = _domeggook_item_id(url)
+    if failed:
+        return failed
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.get("https://domeggook.com/ssl/api/", params=params)
-            data = res.json()
+        item = await fetch_domeggook_item(api_key, item_id)
     except Exception as e:
         return {"success": False, "error": str(e)}
-    item = data.get("item", {}) if isinstance(data, dict) else {}
     if not item:
         return {"success": False, "error": "상품 정보를 가져올 수 없습니다."}
     return {
@@ -436,13 +1375,252 @@ async def parse_wholesale_url(request: Request, url: str = ""):
     }
 
 
+@app.get("/parse-url")
+async def parse_wholesale_url(request: Request, url: str = ""):
+    """
+    도매꾹 상품 URL에서 원가 자동 추출.
+    지원: 도매꾹 (domeggook.com)
+    미지원: 그 외 사이트 → 수동 입력 안내.
+    """
+    _, failed = _domeggook_item_id(url)
+    if failed:
+        return failed
+    api_key = request.headers.get("X-Domeggook-Key", "").strip()
+    if not api_key:
+        return _missing_domeggook_key()
+    return await _parse_domeggook_url(api_key, url)
+
+
+@app.post("/parse-url/batch")
+async def parse_wholesale_url_batch(request: Request):
+    """
+    도매꾹 상품 URL 일괄 원가 추출. 본문: {"urls": [...]} 또는 [...].
+    같은 상품번호는 1번만 조회, 동시 조회는 PARSE_URL_CONCURRENCY개로 제한.
+    결과는 NDJSON으로 완료 순서대로 스트리밍, 각 행에 index(요청 순서)와 url 포함. 실패한 URL은 그 행에만 error.
+    """
+    api_key = request.headers.get("X-Domeggook-Key", "").strip()
+    if not api_key:
+        return _missing_domeggook_key()
+    try:
+        body = await request.json()
+    except Exception:
+        return {"success": False, "error": "요청 형식 오류"}
+    urls = body.get("urls") if isinstance(body, dict) else body
+    if not isinstance(urls, list):
+        return {"success": False, "error": "urls 목록이 필요합니다."}
+    if not urls:
+        return {"success": False, "error": "urls가 비어 있습니다."}
+    if len(urls) > PARSE_URL_BATCH_MAX:
+        return {"success": False, "error": f"한 번에 최대 {PARSE_URL_BATCH_MAX}개까지 처리할 수 있습니다."}
+
+    by_item = {}
+    invalid = []
+    for index, url in enumerate(urls):
+        url = str(url or "").strip()
+        item_id, failed = _domeggook_item_id(url)
+        if failed:
+            invalid.append((index, url, failed))
+        else:
+            by_item.setdefault(item_id, []).append((index, url))
+    semaphore = asyncio.Semaphore(PARSE_URL_CONCURRENCY)
+
+    async def resolve(item_id: str):
+        async with semaphore:
+            first_url = by_item[item_id][0][1]
+            with resilience.deadline(REQUEST_DEADLINE or None):
+                return item_id, await _parse_domeggook_url(api_key, first_url)
+
+    def line(obj):
+        return json.dumps(obj, ensure_ascii=False) + "\n"
+
+    async def stream():
+        for index, url, failed in invalid:
+            yield line({"index": index, "url": url, **failed})
+        tasks = [asyncio.create_task(resolve(item_id)) for item_id in by_item]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item_id, result = await next_done
+                for index, url in by_item[item_id]:
+                    row = {**result, "link": url} if result.get("success") else result
+                    yield line({"index": index, "url": url, "item_id": item_id, **row})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 # ---------- 도매꾹 ----------
-@app.get("/domeggook/search")
-async def domeggook_search(request: Request, query: str, page: int = 1):
+# 로컬 인덱스: 수집된 키워드(정규화한 검색어 범위)가 DOMEGGOOK_INDEX_TTL 안이면 업스트림 없이 인덱스에서 검색,
+# 아니어도 정기 수집 카테고리 범위가 최신이고 그 안에 일치 상품이 있으면 그 범위에서 검색
+DOMEGGOOK_INDEX_TTL = float(os.environ.get("DOMEGGOOK_INDEX_TTL", 6 * 3600))
+# 검색 시 전체 페이지 수집: 요청한 사용자 API 키의 호출 한도를 최대 max_pages회 쓰므로 기본 꺼짐
+DOMEGGOOK_CRAWL_ON_SEARCH = os.environ.get("DOMEGGOOK_CRAWL_ON_SEARCH", "0") == "1"
+# 서버 측 정기 수집 (DOMEGGOOK_API_KEY + 키워드/카테고리 콤마 구분)
+DOMEGGOOK_API_KEY = os.environ.get("DOMEGGOOK_API_KEY", "")
+DOMEGGOOK_CRAWL_KEYWORDS = [k.strip() for k in os.environ.get("DOMEGGOOK_CRAWL_KEYWORDS", "").split(",") if k.strip()]
+DOMEGGOOK_CRAWL_CATEGORIES = [c.strip() for c in os.environ.get("DOMEGGOOK_CRAWL_CATEGORIES", "").split(",") if c.strip()]
+DOMEGGOOK_CRAWL_INTERVAL = float(os.environ.get("DOMEGGOOK_CRAWL_INTERVAL", 600))
+domeggook_index = DomeggookIndex(
+    os.environ.get("DOMEGGOOK_DB_PATH", Path(__file__).resolve().parent / "data" / "domeggook.sqlite3")
+)
+domeggook_crawler = Crawler(
+    domeggook_index,
+    concurrency=int(os.environ.get("DOMEGGOOK_CRAWL_CONCURRENCY", 4)),
+    max_pages=int(os.environ.get("DOMEGGOOK_CRAWL_MAX_PAGES", 50)),
+)
+
+
+def _domeggook_item(it: dict):
+    return {
+        "id": it.get("no"),
+        "name": it.get("name"),
+        "price": int(it.get("price", 0) or 0),
+        "stock": it.get("stock"),
+        "supplier": it.get("seller"),
+        "image": it.get("img"),
+        "link": f"https://domeggook.com/main/item/itemView.php?aid={it.get('no')}",
+        "category": it.get("category"),
+        "min_order": it.get("minQty", 1),
+    }
+
+
+# 도매 상품명 → 네이버 검색어: 괄호 안 옵션·수량/규격 숫자·색상/사이즈·홍보 문구 제거 후 앞 토큰 몇 개만
+DOMEGGOOK_MARGIN_CONCURRENCY = int(os.environ.get("DOMEGGOOK_MARGIN_CONCURRENCY", 8))
+MARKET_QUERY_MAX_TOKENS = int(os.environ.get("MARKET_QUERY_MAX_TOKENS", 4))
+_NAME_BRACKETS = re.compile(r"\[[^\]]*\]|\([^)]*\)|\{[^}]*\}|<[^>]*>|【[^】]*】")
+_NAME_NUMERIC = re.compile(
+    r"^\d+(?:x\d+)*(?:ml|l|g|kg|mg|cm|mm|m|p|pcs|ea|set|box|개|개입|매|장|입|세트|종|호|인치|구|롤|팩|박스|켤레|족)?$"
+)
+_NAME_NOISE = {
+    "블랙", "화이트", "그레이", "네이비", "베이지", "아이보리", "핑크", "레드", "블루", "그린", "옐로우",
+    "브라운", "퍼플", "실버", "골드", "대형", "중형", "소형", "특대", "s", "m", "l", "xl", "xxl", "xxxl",
+    "free", "프리", "프리사이즈", "옵션", "선택", "택1", "무료배송", "당일발송", "당일출고", "도매", "대량",
+    "특가", "신상", "신상품", "정품", "국내배송",
+}
+
+
+def _market_query(name: str):
+    """도매 상품명 → 네이버쇼핑 검색어 (남는 토큰이 없으면 "")."""
+    text = normalize_query(_NAME_BRACKETS.sub(" ", name or ""))
+    tokens = [t for t in text.split() if t not in _NAME_NOISE and not _NAME_NUMERIC.match(t)]
+    return " ".join(tokens[:MARKET_QUERY_MAX_TOKENS])
+
+
+async def _annotate_margins(items: list, sup_ship: float, mkt_ship: float):
+    """
+    도매꾹 items 각각에 market(검색어, 판매가, 최고 마진 마켓·마진, 마켓별 마진%) 추가.
+    토큰 구성이 같은 상품명은 검색어 1개로 합쳐 1번만 조회, 동시 조회는 DOMEGGOOK_MARGIN_CONCURRENCY개로 제한.
+    → 조회한 검색어 수.
+    """
+    groups = {}  # 정렬한 토큰 → (검색어, [item 위치])
+    for i, item in enumerate(items):
+        query = _market_query(item.get("name"))
+        if not query:
+            item["market"] = {"success": False, "error": "상품명에서 검색어를 만들 수 없습니다."}
+            continue
+        key = " ".join(sorted(set(query.split())))
+        groups.setdefault(key, (query, []))[1].append(i)
+    semaphore = asyncio.Semaphore(DOMEGGOOK_MARGIN_CONCURRENCY)
+
+    async def resolve(query: str):
+        async with semaphore:
+            try:
+                return await search_product(query, display=20)
+            except Exception as e:
+                return {"success": False, "error": str(e)}
+
+    searches = await asyncio.gather(*(resolve(query) for query, _ in groups.values()))
+    markets = list(FEES_8)
+    for (query, positions), search in zip(groups.values(), searches):
+        if not search.get("success"):
+            for i in positions:
+                items[i]["market"] = {"success": False, "query": query, "error": search.get("error")}
+            continue
+        sale = _sale_price(search)
+        # 마켓 × 판매가 1개 × 상품별 원가 (M, 1, S)
+        m = margin.margin_matrix(
+            [sale],
+            [FEES_8[k] for k in markets],
+            [items[i]["price"] for i in positions],
+            [sup_ship] * len(positions),
+            [mkt_ship] * len(positions),
+        )
+        margins = np.round(m["margin"][:, 0, :], 1)
+        profits = np.round(m["profit"][:, 0, :])
+        best = margins.argmax(axis=0)
+        for col, i in enumerate(positions):
+            items[i]["market"] = {
+                "success": True,
+                "query": query,
+                "sale_price": round(sale),
+                "avg_price": search.get("avg_price", 0),
+                "competitor_count": search.get("competitor_count"),
+                "best_market": markets[best[col]],
+                "best_margin": float(margins[best[col], col]),
+                "best_profit": int(profits[best[col], col]),
+                "margins": {k: float(margins[j, col]) for j, k in enumerate(markets)},
+            }
+    return len(groups)
+
+
+async def domeggook_search(
+    request: Request,
+    query: str,
+    page: int = 1,
+    with_margins: bool = False,
+    sup_ship: float = 0,
+    mkt_ship: float = 3000,
+    fields: Optional[str] = None,
+):
+    """
+    도매꾹 상품 검색. with_margins=true 시 상품마다 상품명으로 네이버 시중가를 조회해
+    상품가(원가) 기준 FEES_8 마켓별 마진·최고 마진 마켓(market) 포함.
+    fields 지정 시 그 키만 응답 (예: items.name,items.price,items.market). items.market이 빠지면 시중가 조회 생략.
+    """
+    spec = parse_fields(fields)
+    with_margins = with_margins and (wants(spec, "items", "market") or wants(spec, "market_queries"))
     api_key = request.headers.get("X-Domeggook-Key", "").strip()
     if not api_key:
         return {"success": False, "error": "도매꾹 API 키 미설정. 설정 탭에서 입력해주세요."}
-    url = "https://domeggook.com/ssl/api/"
+    result = await _domeggook_search(api_key, query, page)
+    if with_margins and result.get("success"):
+        if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
+            return {**result, "margins_error": "API 키 미설정"}
+        result["market_queries"] = await _annotate_margins(result["items"], sup_ship, mkt_ship)
+    return result
+
+
+app.get("/domeggook/search")(_json_route(domeggook_search))
+
+
+def _indexed_search(query: str, page: int):
+    """(스레드에서 실행) 최신 범위로 답할 수 있으면 ((items, total), 범위 목록), 아니면 (None, [])."""
+    keyword_scope = scope_for(query)
+    fresh = domeggook_index.fresh_scopes(
+        [keyword_scope] + [scope_for(category=c) for c in DOMEGGOOK_CRAWL_CATEGORIES], DOMEGGOOK_INDEX_TTL
+    )
+    if keyword_scope in fresh:
+        return domeggook_index.search(query, page), [keyword_scope]
+    if fresh:
+        raw_list, total = domeggook_index.search(query, page, scopes=fresh)
+        if total:
+            return (raw_list, total), fresh
+    return None, []
+
+
+async def _domeggook_search(api_key: str, query: str, page: int):
+    hit, scopes = await asyncio.to_thread(_indexed_search, query, page)
+    if hit is not None:
+        raw_list, total = hit
+        return {
+            "success": True,
+            "source": "도매꾹",
+            "items": [_domeggook_item(it) for it in raw_list],
+            "total": total,
+            "indexed": True,
+            "index_scopes": scopes,
+        }
     params = {
         "ver": "6.1",
         "cmd": "getItemList",
@@ -453,34 +1631,28 @@ async def domeggook_search(request: Request, query: str, page: int = 1):
         "out": "json",
     }
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.get(url, params=params)
-            data = res.json()
+        res = await upstream.request("domeggook", "GET", "/ssl/api/", params=params)
+        data = res.json()
     except Exception as e:
         return {"success": False, "error": str(e)}
     raw_list = data.get("list", []) if isinstance(data, dict) else []
-    items = [
-        {
-            "id": it.get("no"),
-            "name": it.get("name"),
-            "price": int(it.get("price", 0) or 0),
-            "stock": it.get("stock"),
-            "supplier": it.get("seller"),
-            "image": it.get("img"),
-            "link": f"https://domeggook.com/main/item/itemView.php?aid={it.get('no')}",
-            "category": it.get("category"),
-            "min_order": it.get("minQty", 1),
-        }
-        for it in raw_list
-    ]
+    if raw_list and DOMEGGOOK_CRAWL_ON_SEARCH:
+        # 다음 검색부터 인덱스에서 응답하도록 전체 페이지 수집 예약
+        domeggook_crawler.schedule(api_key, query)
     return {
         "success": True,
         "source": "도매꾹",
-        "items": items,
+        "items": [_domeggook_item(it) for it in raw_list],
         "total": data.get("totalCount", 0) if isinstance(data, dict) else 0,
     }
 
 
+@app.get("/domeggook/index")
+def domeggook_index_stats():
+    """도매꾹 로컬 인덱스 현황 (상품 수, 범위별 마지막 수집 시각)."""
+    return {"success": True, **domeggook_index.stats()}
+
+
 FEES_8 = {
     "스마트스토어": 6.6,
     "쿠팡": 8.0,
@@ -493,54 +1665,247 @@ FEES_8 = {
 }
 
 
-@app.get("/compare")
+# /analyze(호환) 기준 수수료
+ANALYZE_FEES = {"스마트스토어": 6.6, "쿠팡": 8.0, "오픈마켓": 15.0}
+MATRIX_MAX_CELLS = int(os.environ.get("MATRIX_MAX_CELLS", 2_000_000))
+
+
+def _market_prices(search: dict):
+    prices = {
+        "min": search.get("min_price"),
+        "avg": search.get("avg_price", 0),
+        "max": search.get("max_price"),
+        "robust": _sale_price(search),
+        "competitor_count": search.get("competitor_count"),
+    }
+    if "distribution" in search:
+        prices["distribution"] = search["distribution"]
+    return prices
+
+
+def _sale_price(search: dict):
+    """마진 계산 기준 판매가: 이상치 제외 robust_price (없으면 평균)."""
+    return search.get("robust_price") or search.get("avg_price", 0)
+
+
 async def compare(
     request: Request,
     query: str,
     cost: float = 0,
     sup_ship: float = 0,
     mkt_ship: float = 3000,
+    deep: bool = False,
+    fields: Optional[str] = None,
 ):
-    """도매 원가 + 네이버 시중가 + 8개 마켓 마진 비교."""
-    search = await search_product(query, display=20, include_trend=True)
+    """
+    도매 원가 + 네이버 시중가 + 8개 마켓 마진 비교. 검색과 트렌드는 동시에 조회.
+    마진은 이상치 제외 robust 판매가 기준, deep=true 시 검색 결과 최대 수백 개 분포 기준.
+    fields 지정 시 그 키만 응답. trend가 빠지면 트렌드 조회, 시중가·마진이 빠지면 분포 조회 생략.
+    """
+    spec = parse_fields(fields)
+    deep = deep and (wants(spec, "market_prices") or wants(spec, "margins") or wants(spec, "best_market"))
+    calls = [search_product(query, display=20, deep=deep)]
+    if wants(spec, "trend"):
+        calls.append(get_trend(query))
+    search, *trend = await asyncio.gather(*calls)
     if not search.get("success"):
         return search
-    avg = search.get("avg_price", 0)
-
-    def calc(sale: float, fee_rate: float):
-        if sale <= 0:
-            return {"sale": 0, "fee": 0, "profit": 0, "margin": 0}
-        total_cost = cost + sup_ship
-        fee = sale * fee_rate / 100
-        profit = sale - fee - mkt_ship - total_cost
-        margin = (profit / sale * 100) if sale > 0 else 0
-        return {
-            "sale": round(sale),
-            "fee": round(fee),
-            "profit": round(profit),
-            "margin": round(margin, 1),
-        }
 
-    margins = {market: calc(avg, fee) for market, fee in FEES_8.items()}
-    best_market = max(margins, key=lambda m: margins[m].get("margin", -999))
+    margins, best_market = margin.market_margins(_sale_price(search), FEES_8, cost, sup_ship, mkt_ship)
 
     return {
         "success": True,
         "query": query,
         "cost": cost,
-        "market_prices": {
-            "min": search.get("min_price"),
-            "avg": avg,
-            "max": search.get("max_price"),
-            "competitor_count": search.get("competitor_count"),
-        },
-        "trend": search.get("trend"),
+        "market_prices": _market_prices(search),
+        "trend": trend[0] if trend else None,
         "margins": margins,
         "best_market": best_market,
         "top_items": search.get("top_items", [])[:5],
     }
 
 
+app.get("/compare")(_json_route(compare))
+
+
+def _sse(event: str, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/compare/stream")
+async def compare_stream(
+    query: str,
+    cost: float = 0,
+    sup_ship: float = 0,
+    mkt_ship: float = 3000,
+    deep: bool = False,
+):
+    """
+    /compare의 SSE 버전. 검색이 끝나는 즉시 market_prices → margins → top_items 이벤트,
+    트렌드는 도착하면 trend 이벤트, 마지막에 done. 실패 시 error 이벤트.
+    """
+    async def labeled(section, coro):
+        try:
+            return section, await coro
+        except Exception as e:
+            return section, {"success": False, "error": str(e)}
+
+    # 응답 스트림 시작 전에 두 업스트림 조회를 동시에 출발
+    tasks = [
+        asyncio.ensure_future(labeled("search", search_product(query, display=20, deep=deep))),
+        asyncio.ensure_future(labeled("trend", get_trend(query))),
+    ]
+
+    async def stream():
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                section, result = await next_done
+                if section == "trend":
+                    yield _sse("trend", result)
+                    continue
+                if not result.get("success"):
+                    yield _sse("error", result)
+                    return
+                margins, best_market = margin.market_margins(
+                    _sale_price(result), FEES_8, cost, sup_ship, mkt_ship
+                )
+                yield _sse("market_prices", {
+                    "query": query,
+                    "cost": cost,
+                    "market_prices": _market_prices(result),
+                })
+                yield _sse("margins", {"margins": margins, "best_market": best_market})
+                yield _sse("top_items", {"top_items": result.get("top_items", [])[:5]})
+            yield _sse("done", {"success": True})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------- 대량 마진 비교 ----------
+BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS", 2000))
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", 8))
+
+
+def _parse_bulk_number(value, default: float):
+    if value is None or str(value).strip() == "":
+        return default
+    return float(str(value).replace(",", "").strip())
+
+
+def _parse_bulk_rows(raw_rows):
+    """[{query, cost, sup_ship, mkt_ship}] 정규화. 잘못된 행은 error 포함."""
+    rows = []
+    for row in raw_rows:
+        if not isinstance(row, dict):
+            rows.append({"error": "행 형식 오류"})
+            continue
+        query = str(row.get("query") or "").strip()
+        if not query:
+            rows.append({"error": "query 없음"})
+            continue
+        try:
+            rows.append({
+                "query": query,
+                "cost": _parse_bulk_number(row.get("cost"), 0),
+                "sup_ship": _parse_bulk_number(row.get("sup_ship"), 0),
+                "mkt_ship": _parse_bulk_number(row.get("mkt_ship"), 3000),
+            })
+        except ValueError:
+            rows.append({"query": query, "error": "숫자 형식 오류"})
+    return rows
+
+
+async def _read_bulk_rows(request: Request):
+    """JSON({"rows": [...]} 또는 [...]) / CSV 본문(text/csv) / CSV 파일 업로드(multipart, file 필드)."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None:
+            raise ValueError("file 필드에 CSV 파일을 첨부해주세요.")
+        text = (await upload.read()).decode("utf-8-sig")
+        return _parse_bulk_rows(csv.DictReader(io.StringIO(text)))
+    if content_type.startswith("text/csv"):
+        text = (await request.body()).decode("utf-8-sig")
+        return _parse_bulk_rows(csv.DictReader(io.StringIO(text)))
+    body = await request.json()
+    raw_rows = body.get("rows") if isinstance(body, dict) else body
+    if not isinstance(raw_rows, list):
+        raise ValueError("rows 목록이 필요합니다.")
+    return _parse_bulk_rows(raw_rows)
+
+
+@app.post("/compare/bulk")
+async def compare_bulk(request: Request):
+    """
+    여러 상품 마진 일괄 비교. 결과는 NDJSON으로 검색어별 완료 순서대로 스트리밍.
+    같은 검색어는 1번만 조회, 동시 조회는 BULK_CONCURRENCY개로 제한.
+    각 행에 index(요청 순서) 포함.
+    """
+    try:
+        rows = await _read_bulk_rows(request)
+    except Exception as e:
+        return {"success": False, "error": str(e) or "요청 형식 오류"}
+    if not rows:
+        return {"success": False, "error": "rows가 비어 있습니다."}
+    if len(rows) > BULK_MAX_ROWS:
+        return {"success": False, "error": f"한 번에 최대 {BULK_MAX_ROWS}행까지 처리할 수 있습니다."}
+
+    by_query = {}
+    for index, row in enumerate(rows):
+        if "error" not in row:
+            by_query.setdefault(row["query"], []).append(index)
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def resolve(query: str):
+        async with semaphore:
+            try:
+                with resilience.deadline(REQUEST_DEADLINE or None):
+                    return query, await search_product(query, display=20)
+            except Exception as e:
+                return query, {"success": False, "error": str(e)}
+
+    def line(obj):
+        return json.dumps(obj, ensure_ascii=False) + "\n"
+
+    async def stream():
+        for index, row in enumerate(rows):
+            if "error" in row:
+                yield line({"index": index, "success": False, **row})
+        tasks = [asyncio.create_task(resolve(q)) for q in by_query]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                query, search = await next_done
+                for index in by_query[query]:
+                    row = rows[index]
+                    if not search.get("success"):
+                        yield line({"index": index, **row, "success": False, "error": search.get("error")})
+                        continue
+                    margins, best_market = margin.market_margins(
+                        _sale_price(search), FEES_8, row["cost"], row["sup_ship"], row["mkt_ship"]
+                    )
+                    yield line({
+                        "index": index,
+                        **row,
+                        "success": True,
+                        "market_prices": _market_prices(search),
+                        "margins": margins,
+                        "best_market": best_market,
+                    })
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 # ---------- 기존 /analyze (호환) ----------
 @app.get("/analyze")
 async def analyze_margin(query: str, cost: float, sup_ship: float = 0, mkt_ship: float = 0):
@@ -550,62 +1915,366 @@ async def analyze_margin(query: str, cost: float, sup_ship: float = 0, mkt_ship:
         return search
     avg = search["avg_price"]
     min_p = search["min_price"]
-
-    def calc(sale, fee_rate):
-        total_cost = cost + sup_ship
-        fee = sale * fee_rate / 100
-        profit = sale - fee - mkt_ship - total_cost
-        margin = (profit / sale * 100) if sale > 0 else 0
-        return {"sale": sale, "fee": round(fee), "profit": round(profit), "margin": round(margin, 1)}
+    margin_at_avg, _ = margin.market_margins(avg, ANALYZE_FEES, cost, sup_ship, mkt_ship)
+    margin_at_min, _ = margin.market_margins(min_p, ANALYZE_FEES, cost, sup_ship, mkt_ship)
 
     return {
         "success": True,
         "query": query,
         "market_prices": {"min": min_p, "avg": avg, "max": search["max_price"]},
-        "margin_at_avg": {
-            "스마트스토어": calc(avg, 6.6),
-            "쿠팡": calc(avg, 8.0),
-            "오픈마켓": calc(avg, 15.0),
+        "margin_at_avg": margin_at_avg,
+        "margin_at_min": margin_at_min,
+        "top_items": search.get("top_items", [])[:5],
+    }
+
+
+# ---------- 마진 매트릭스 (what-if) ----------
+@app.get("/margin/matrix")
+async def margin_matrix(
+    query: str,
+    cost: Annotated[List[str], Query()] = ["0"],
+    sup_ship: Annotated[List[str], Query()] = ["0"],
+    mkt_ship: Annotated[List[str], Query()] = ["3000"],
+    percentiles: str = "10,25,50,75,90",
+    display: int = 20,
+):
+    """
+    마켓(FEES_8) × 판매가(min/avg/max + 백분위) × 원가/배송비 시나리오 마진 매트릭스 + 마켓별 손익분기 판매가.
+    cost/sup_ship/mkt_ship은 반복 지정(cost=1000&cost=2000) 또는 범위(cost=1000:20000:500) 가능.
+    profit/margin 배열 축 순서: [market][price_point][scenario]
+    """
+    if not NAVER_CLIENT_ID or not NAVER_CLIENT_SECRET:
+        return {"success": False, "error": "API 키 미설정"}
+    try:
+        costs = margin.parse_values(cost)
+        sup_ships = margin.parse_values(sup_ship)
+        mkt_ships = margin.parse_values(mkt_ship)
+        pct = [p for p in margin.parse_values([percentiles], limit=99) if 0 <= p <= 100]
+    except ValueError as e:
+        return {"success": False, "error": str(e) or "숫자 형식 오류"}
+    if not costs or not sup_ships or not mkt_ships:
+        return {"success": False, "error": "cost/sup_ship/mkt_ship 값이 필요합니다."}
+    # 조합을 만들기 전에 셀 수로 거절 (축마다 만 개면 조합만으로 메모리·이벤트 루프가 터짐)
+    markets = list(FEES_8)
+    cells = len(markets) * (3 + len(pct)) * len(costs) * len(sup_ships) * len(mkt_ships)
+    if cells > MATRIX_MAX_CELLS:
+        return {"success": False, "error": f"계산 셀 수가 최대치({MATRIX_MAX_CELLS})를 넘습니다."}
+
+    data = await shop_search(query, min(display, 100))
+    if "items" not in data:
+        return {"success": False, "error": data.get("errorMessage", "검색 실패")}
+    prices = np.array([int(it["lprice"]) for it in data["items"] if it.get("lprice")], dtype=np.float64)
+    if prices.size == 0:
+        return {"success": False, "error": "시중가 없음"}
+
+    labels = ["min", "avg", "max"] + [f"p{p:g}" for p in pct]
+    sales = np.concatenate((
+        [prices.min(), np.floor(prices.mean()), prices.max()],
+        np.percentile(prices, pct) if pct else [],
+    ))
+    sc_cost, sc_sup, sc_mkt = margin.scenario_grid(costs, sup_ships, mkt_ships)
+    fee_rates = [FEES_8[m] for m in markets]
+
+    m = margin.margin_matrix(sales, fee_rates, sc_cost, sc_sup, sc_mkt)
+    be = margin.break_even(fee_rates, sc_cost, sc_sup, sc_mkt)
+    return {
+        "success": True,
+        "query": query,
+        "markets": markets,
+        "fee_rates": fee_rates,
+        "price_points": [
+            {"label": label, "sale": round(sale)} for label, sale in zip(labels, sales.tolist())
+        ],
+        "scenarios": {
+            "cost": sc_cost.tolist(),
+            "sup_ship": sc_sup.tolist(),
+            "mkt_ship": sc_mkt.tolist(),
         },
-        "margin_at_min": {
-            "스마트스토어": calc(min_p, 6.6),
-            "쿠팡": calc(min_p, 8.0),
-            "오픈마켓": calc(min_p, 15.0),
+        "profit": np.round(m["profit"]).astype(np.int64).tolist(),
+        "margin": np.round(m["margin"], 1).tolist(),
+        "break_even": {
+            market: np.ceil(be[i]).astype(np.int64).tolist() for i, market in enumerate(markets)
         },
-        "top_items": search.get("top_items", [])[:5],
     }
 
 
-# ---------- 마켓 주문 수집 (뼈대) ----------
-@app.get("/orders/smartstore")
-async def get_smartstore_orders(request: Request, date_from: str = None):
-    """스마트스토어 주문 수집 - API 키 발급 후 구현."""
-    client_id = request.headers.get("X-Smartstore-Client-Id", "")
-    client_secret = request.headers.get("X-Smartstore-Client-Secret", "")
+# ---------- 마켓 주문 수집 ----------
+# 워터마크 이후 바뀐 주문만 받아 로컬 저장소에 누적, 요약은 (날짜, 상품) 일별 집계만 읽음
+ORDER_SYNC_INITIAL_DAYS = int(os.environ.get("ORDER_SYNC_INITIAL_DAYS", 30))
+ORDER_SYNC_MIN_INTERVAL = float(os.environ.get("ORDER_SYNC_MIN_INTERVAL", 300))
+ORDER_SYNC_CONCURRENCY = int(os.environ.get("ORDER_SYNC_CONCURRENCY", 4))
+ORDER_COUPANG_LOOKBACK_DAYS = int(os.environ.get("ORDER_COUPANG_LOOKBACK_DAYS", 7))
+# 요청이 수집 완료를 기다리는 최대 시간(초). 첫 수집처럼 오래 걸리면 백그라운드로 계속하고 저장된 만큼 응답
+ORDER_SYNC_WAIT = float(os.environ.get("ORDER_SYNC_WAIT", 20))
+# 워커 간 같은 계정 중복 수집 방지 임대. 수집 중에는 ttl/3마다 연장
+ORDER_SYNC_LEASE_TTL = float(os.environ.get("ORDER_SYNC_LEASE_TTL", 60))
+ORDER_SUMMARY_MAX_DAYS = 366
+ORDER_MARKETS = {"smartstore": "스마트스토어", "coupang": "쿠팡"}
+order_store = OrderStore(
+    os.environ.get("ORDER_DB_PATH", Path(__file__).resolve().parent / "data" / "orders.sqlite3")
+)
+_order_syncs = {}  # 계정 → 진행 중 수집 작업
+
+
+def _smartstore_source(request: Request):
+    client_id = request.headers.get("X-Smartstore-Client-Id", "").strip()
+    client_secret = request.headers.get("X-Smartstore-Client-Secret", "").strip()
     if not client_id or not client_secret:
-        return {
-            "success": False,
-            "error": "스마트스토어 API 키 미설정",
-            "guide": "설정 탭 → 마켓 API 키에서 입력해주세요.",
-        }
-    return {"success": False, "error": "준비 중"}
+        return None
+    return SmartstoreSource(client_id, client_secret, concurrency=ORDER_SYNC_CONCURRENCY)
+
+
+def _coupang_source(request: Request):
+    access_key = request.headers.get("X-Coupang-Access-Key", "").strip()
+    secret_key = request.headers.get("X-Coupang-Secret-Key", "").strip()
+    vendor_id = request.headers.get("X-Coupang-Vendor-Id", "").strip()
+    if not access_key or not secret_key or not vendor_id:
+        return None
+    return CoupangSource(
+        access_key, secret_key, vendor_id,
+        concurrency=ORDER_SYNC_CONCURRENCY, lookback_days=ORDER_COUPANG_LOOKBACK_DAYS,
+    )
+
+
+def _order_sources(request: Request):
+    return [s for s in (_smartstore_source(request), _coupang_source(request)) if s is not None]
+
+
+def _missing_market_keys(market: str):
+    return {
+        "success": False,
+        "error": f"{ORDER_MARKETS[market]} API 키 미설정",
+        "guide": "설정 탭 → 마켓 API 키에서 입력해주세요.",
+    }
+
+
+async def _sync_orders(source, force: bool = False):
+    """
+    계정 1개 증분 수집. 같은 계정 수집이 진행 중이면 그 작업을 기다림,
+    force가 아니면 ORDER_SYNC_MIN_INTERVAL 안의 재수집은 건너뜀. 다른 워커가 수집 중이어도 건너뜀.
+    ORDER_SYNC_WAIT 안에 안 끝나면 running으로 응답 (수집은 계속, 구간마다 저장되어 그만큼 조회 가능).
+    """
+    _, synced_at = await asyncio.to_thread(order_store.sync_state, source.account)
+    if not force and time.time() - synced_at < ORDER_SYNC_MIN_INTERVAL:
+        return {"success": True, "market": source.market, "skipped": "recent"}
+    task = _order_syncs.get(source.account)
+    if task is None:
+        lease = f"orders:{source.account}"
+        if shared_cache is not None and not await asyncio.to_thread(
+            shared_cache.acquire, lease, ORDER_SYNC_LEASE_TTL
+        ):
+            return {"success": True, "market": source.market, "skipped": "running"}
+
+        async def run():
+            # 긴 첫 수집 중 임대가 만료돼 다른 워커가 같은 수집을 시작하지 않게 계속 연장
+            renew = (
+                asyncio.ensure_future(_renew_lease(lease, ORDER_SYNC_LEASE_TTL))
+                if shared_cache is not None
+                else None
+            )
+            try:
+                return {"success": True, **await sync_orders(order_store, source, ORDER_SYNC_INITIAL_DAYS)}
+            except (OrderSyncError, UpstreamLimited) as e:
+                return {"success": False, "market": source.market, "error": str(e)}
+            except Exception as e:
+                return {"success": False, "market": source.market, "error": f"주문 수집 실패: {e}"}
+            finally:
+                _order_syncs.pop(source.account, None)
+                if renew is not None:
+                    renew.cancel()
+                    await asyncio.to_thread(shared_cache.release, lease)
+
+        with resilience.no_deadline():
+            task = _order_syncs[source.account] = asyncio.ensure_future(run())
+    wait = ORDER_SYNC_WAIT
+    budget = resilience.remaining()
+    if budget is not None:
+        wait = max(min(wait, budget - 1), 0)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), wait)
+    except asyncio.TimeoutError:
+        return {"success": True, "market": source.market, "running": True}
+
+
+def _order_day(date: datetime.date):
+    """날짜 → 주문 저장소 날짜 정수 (20240131)."""
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+async def _market_orders(source, date_from: str = None, limit: int = 100):
+    try:
+        day_from = _order_day(datetime.date.fromisoformat(date_from)) if date_from else 0
+    except ValueError:
+        return {"success": False, "error": "date_from은 YYYY-MM-DD 형식이어야 합니다."}
+    sync = await _sync_orders(source)
+    return {
+        "success": sync["success"],
+        "market": source.market,
+        "sync": sync,
+        "orders": await asyncio.to_thread(order_store.orders, source.account, day_from, min(max(limit, 1), 1000)),
+    }
+
+
+@app.get("/orders/smartstore")
+async def get_smartstore_orders(request: Request, date_from: str = None, limit: int = 100):
+    """스마트스토어 주문: 변경분 증분 수집 후 로컬 저장 주문 최신순."""
+    source = _smartstore_source(request)
+    if source is None:
+        return _missing_market_keys("smartstore")
+    return await _market_orders(source, date_from, limit)
 
 
 @app.get("/orders/coupang")
-async def get_coupang_orders(request: Request, date_from: str = None):
-    """쿠팡 Wing 주문 수집 - API 키 발급 후 구현."""
-    access_key = request.headers.get("X-Coupang-Access-Key", "")
-    secret_key = request.headers.get("X-Coupang-Secret-Key", "")
-    if not access_key or not secret_key:
-        return {
-            "success": False,
-            "error": "쿠팡 API 키 미설정",
-            "guide": "설정 탭 → 마켓 API 키에서 입력해주세요.",
+async def get_coupang_orders(request: Request, date_from: str = None, limit: int = 100):
+    """쿠팡 Wing 주문: 최근 주문 증분 수집 후 로컬 저장 주문 최신순. X-Coupang-Vendor-Id 헤더 필요."""
+    source = _coupang_source(request)
+    if source is None:
+        return _missing_market_keys("coupang")
+    return await _market_orders(source, date_from, limit)
+
+
+@app.post("/orders/sync")
+async def sync_market_orders(request: Request):
+    """헤더에 키가 있는 마켓 전부 즉시 증분 수집 (마켓끼리 동시)."""
+    sources = _order_sources(request)
+    if not sources:
+        return {"success": False, "error": "마켓 API 키 미설정", "guide": "설정 탭 → 마켓 API 키에서 입력해주세요."}
+    results = await asyncio.gather(*(_sync_orders(s, force=True) for s in sources))
+    return {"success": all(r["success"] for r in results), "markets": results}
+
+
+@app.put("/orders/costs")
+async def set_order_costs(request: Request):
+    """
+    판매 상품 개당 원가 등록 (실현 마진 계산용).
+    본문: {"costs": [{"market": "smartstore"|"coupang", "product_id": "...", "cost": 1000}]}, cost null이면 삭제.
+    """
+    sources = {s.market: s for s in _order_sources(request)}
+    if not sources:
+        return {"success": False, "error": "마켓 API 키 미설정", "guide": "설정 탭 → 마켓 API 키에서 입력해주세요."}
+    try:
+        body = await request.json()
+    except Exception:
+        return {"success": False, "error": "요청 형식 오류"}
+    rows = body.get("costs") if isinstance(body, dict) else None
+    if not isinstance(rows, list):
+        return {"success": False, "error": "costs 목록이 필요합니다."}
+    by_market = {}
+    for row in rows:
+        if not isinstance(row, dict) or row.get("market") not in sources or not row.get("product_id"):
+            return {"success": False, "error": "market(키가 설정된 마켓)·product_id가 필요합니다."}
+        cost = row.get("cost")
+        try:
+            cost = None if cost is None else float(cost)
+        except (TypeError, ValueError):
+            return {"success": False, "error": "숫자 형식 오류"}
+        by_market.setdefault(row["market"], {})[str(row["product_id"])] = cost
+    for market, costs in by_market.items():
+        await asyncio.to_thread(order_store.set_costs, sources[market].account, costs)
+    return {"success": True, "updated": sum(len(c) for c in by_market.values())}
+
+
+def _realized(orders: int, quantity: int, revenue: int, cost: float, uncosted: int, fee_rate: float):
+    fee = revenue * fee_rate / 100
+    profit = revenue - fee - cost
+    return {
+        "orders": orders,
+        "quantity": quantity,
+        "revenue": revenue,
+        "fees": round(fee),
+        "cost": round(cost),
+        "profit": round(profit),
+        "margin": round(profit / revenue * 100, 1) if revenue else 0,
+        "uncosted_quantity": uncosted,
+    }
+
+
+@app.get("/orders/summary")
+async def orders_summary(request: Request, date_from: str = None, date_to: str = None, sync: bool = True):
+    """
+    헤더에 키가 있는 마켓의 실현 매출·수수료(FEES_8)·원가·마진을 날짜별·상품별로.
+    sync=true면 먼저 증분 수집 (ORDER_SYNC_MIN_INTERVAL 안이면 건너뜀). 기본 기간은 최근 30일.
+    원가 미등록 상품은 원가 0으로 계산하고 uncosted_quantity에 수량 표시.
+    """
+    sources = _order_sources(request)
+    if not sources:
+        return {"success": False, "error": "마켓 API 키 미설정", "guide": "설정 탭 → 마켓 API 키에서 입력해주세요."}
+    today = datetime.datetime.now(KST).date()
+    try:
+        end = datetime.date.fromisoformat(date_to) if date_to else today
+        start = datetime.date.fromisoformat(date_from) if date_from else end - datetime.timedelta(days=29)
+    except ValueError:
+        return {"success": False, "error": "날짜는 YYYY-MM-DD 형식이어야 합니다."}
+    if start > end or (end - start).days >= ORDER_SUMMARY_MAX_DAYS:
+        return {"success": False, "error": f"기간은 1~{ORDER_SUMMARY_MAX_DAYS}일이어야 합니다."}
+    syncs = await asyncio.gather(*(_sync_orders(s) for s in sources)) if sync else []
+
+    markets = {s.account: s.market for s in sources}
+    rows = await asyncio.to_thread(order_store.summary, list(markets), _order_day(start), _order_day(end))
+    fee_rate = {account: FEES_8[ORDER_MARKETS[market]] for account, market in markets.items()}
+    days = {}
+    for account, day, orders, quantity, revenue, cost, uncosted in rows["days"]:
+        label = f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+        fee = revenue * fee_rate[account] / 100
+        d = days.setdefault(label, [0, 0, 0, 0.0, 0, 0.0])
+        for i, v in enumerate((orders, quantity, revenue, cost, uncosted, fee)):
+            d[i] += v
+    by_day = []
+    for label in sorted(days):
+        orders, quantity, revenue, cost, uncosted, fee = days[label]
+        # 마켓마다 수수료율이 달라 날짜 합계는 실효 수수료율로
+        by_day.append({"date": label, **_realized(
+            orders, quantity, revenue, cost, uncosted, fee / revenue * 100 if revenue else 0
+        )})
+    products = [
+        {
+            "market": markets[account],
+            "product_id": product_id,
+            "name": name or "",
+            **_realized(orders, quantity, revenue, cost, uncosted, fee_rate[account]),
         }
-    return {"success": False, "error": "준비 중"}
+        for account, product_id, name, orders, quantity, revenue, cost, uncosted in rows["products"]
+    ]
+    products.sort(key=lambda p: p["revenue"], reverse=True)
+    totals = [sum(d[k] for d in by_day) for k in ("orders", "quantity", "revenue", "cost", "uncosted_quantity", "fees")]
+    orders, quantity, revenue, cost, uncosted, fees = totals
+    return {
+        "success": True,
+        "date_from": start.isoformat(),
+        "date_to": end.isoformat(),
+        "markets": sorted(set(markets.values())),
+        "sync": syncs,
+        "total": _realized(orders, quantity, revenue, cost, uncosted, fees / revenue * 100 if revenue else 0),
+        "by_day": by_day,
+        "by_product": products,
+    }
 
 
 # ---------- 카카오 나에게 보내기 ----------
+async def _kakao_memo(kakao_token: str, message: str):
+    """카카오 나에게 보내기 1건 → {success, error}."""
+    headers = {"Authorization": f"Bearer {kakao_token}", "Content-Type": "application/x-www-form-urlencoded"}
+    payload = {
+        "template_object": json.dumps({
+            "object_type": "text",
+            "text": message,
+            "link": {
+                "web_url": "https://nimble-sunshine-03744e.netlify.app",
+                "mobile_web_url": "https://nimble-sunshine-03744e.netlify.app",
+            },
+        })
+    }
+    try:
+        res = await upstream.request(
+            "kakao", "POST", "/v2/api/talk/memo/default/send", headers=headers, data=payload
+        )
+        data = res.json()
+        # 401 = 만료·폐기된 토큰 → 호출한 쪽에서 갱신 여부 판단
+        return {"success": data.get("result_code") == 0, "error": data.get("msg"), "expired": res.status_code == 401}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 @app.post("/kakao/send")
 async def send_kakao(request: Request):
     """카카오 나에게 보내기 API. X-Kakao-Token 헤더에 액세스 토큰 전달."""
@@ -619,23 +2288,299 @@ async def send_kakao(request: Request):
         message = ""
     if not message:
         return {"success": False, "error": "메시지 없음"}
+    return await _kakao_memo(kakao_token, message)
+
+
+# ---------- 카카오 토큰 갱신 ----------
+# 주기 알림은 사용자가 없는 동안 보내므로, 저장한 리프레시 토큰으로 액세스 토큰을 다시 받음 (앱 REST API 키 필요)
+KAKAO_REST_API_KEY = os.environ.get("KAKAO_REST_API_KEY", "")
+KAKAO_CLIENT_SECRET = os.environ.get("KAKAO_CLIENT_SECRET", "")
+
+
+async def kakao_refresh(refresh_token: str):
+    """리프레시 토큰 → (새 액세스 토큰, 새 리프레시 토큰 또는 None). 갱신 불가면 ValueError."""
+    if not KAKAO_REST_API_KEY:
+        raise ValueError("KAKAO_REST_API_KEY 미설정 — 토큰을 갱신할 수 없습니다.")
+    payload = {"grant_type": "refresh_token", "client_id": KAKAO_REST_API_KEY, "refresh_token": refresh_token}
+    if KAKAO_CLIENT_SECRET:
+        payload["client_secret"] = KAKAO_CLIENT_SECRET
+    res = await upstream.request("kakao_auth", "POST", "/oauth/token", data=payload)
+    if res.status_code in (400, 401):
+        raise ValueError("카카오 리프레시 토큰이 만료되었습니다. 다시 로그인해주세요.")
+    data = res.json()
+    if not data.get("access_token"):
+        raise ValueError(data.get("error_description") or "카카오 토큰 갱신 실패")
+    # 리프레시 토큰은 만료가 가까울 때만 새로 내려옴
+    return data["access_token"], data.get("refresh_token")
+
+
+# ---------- 카카오 사용자 확인 ----------
+# 워치리스트 소유자는 클라이언트가 보낸 값이 아니라 X-Kakao-Token의 카카오 회원번호 (토큰 정보 조회, 토큰 해시 단위 캐시)
+kakao_user_cache = TTLCache(
+    "kakao_user",
+    maxsize=int(os.environ.get("KAKAO_USER_CACHE_SIZE", 4096)),
+    ttl=float(os.environ.get("KAKAO_USER_CACHE_TTL", 300)),
+)
 
-    url = "https://kapi.kakao.com/v2/api/talk/memo/default/send"
-    headers = {"Authorization": f"Bearer {kakao_token}", "Content-Type": "application/x-www-form-urlencoded"}
-    payload = {
-        "template_object": json.dumps({
-            "object_type": "text",
-            "text": message,
-            "link": {
-                "web_url": "https://nimble-sunshine-03744e.netlify.app",
-                "mobile_web_url": "https://nimble-sunshine-03744e.netlify.app",
-            },
-        })
+
+async def kakao_user_id(kakao_token: str):
+    """카카오 액세스 토큰 → 사용자 식별자 "kakao:<회원번호>". 유효하지 않은 토큰이면 ValueError."""
+    async def load():
+        res = await upstream.request(
+            "kakao", "GET", "/v1/user/access_token_info", headers={"Authorization": f"Bearer {kakao_token}"}
+        )
+        if res.status_code in (400, 401):
+            return None
+        data = res.json()
+        return f"kakao:{data['id']}" if data.get("id") else None
+
+    user_id = await kakao_user_cache.get_or_load(
+        hashlib.sha256(kakao_token.encode()).hexdigest(), load, cacheable=bool
+    )
+    if not user_id:
+        raise ValueError("카카오 토큰이 유효하지 않습니다. 다시 로그인해주세요.")
+    return user_id
+
+
+async def _watch_user(request: Request):
+    """X-Kakao-Token 헤더 → (user_id, 토큰, None) 또는 (None, None, 실패 dict)."""
+    kakao_token = request.headers.get("X-Kakao-Token", "")
+    if not kakao_token:
+        return None, None, {"success": False, "error": "카카오 토큰 없음"}
+    try:
+        user_id = await kakao_user_id(kakao_token)
+        await asyncio.to_thread(watch_store.claim, user_id, kakao_token)
+        return user_id, kakao_token, None
+    except (ValueError, UpstreamLimited) as e:
+        return None, None, {"success": False, "error": str(e)}
+    except httpx.HTTPError as e:
+        return None, None, {"success": False, "error": f"카카오 사용자 확인 실패: {type(e).__name__}"}
+
+
+# ---------- 관심 상품 (워치리스트) ----------
+# 사용자별 관심 상품을 서버에서 주기적으로 재평가 → 같은 검색어는 주기당 1번만 조회, 알림은 사용자당 카카오 메모 1건
+watch_store = WatchStore(
+    os.environ.get("WATCH_DB_PATH", Path(__file__).resolve().parent / "data" / "watchlist.sqlite3"),
+    max_per_user=int(os.environ.get("WATCH_MAX_PER_USER", 100)),
+)
+WATCH_INTERVAL = float(os.environ.get("WATCH_INTERVAL", 1800))  # 0이면 끔
+WATCH_CONCURRENCY = int(os.environ.get("WATCH_CONCURRENCY", 8))
+
+
+def _parse_watch(body: dict):
+    """POST /watchlist body → 저장할 watch dict. 잘못된 값은 ValueError."""
+    query = str(body.get("query") or "").strip()
+    if not query:
+        raise ValueError("query가 필요합니다.")
+
+    def number(key, default=None):
+        value = body.get(key)
+        if value is None or str(value).strip() == "":
+            return default
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key}는 숫자여야 합니다.")
+
+    watch = {
+        "query": query,
+        "cost": number("cost", 0.0),
+        "sup_ship": number("sup_ship", 0.0),
+        "mkt_ship": number("mkt_ship", 3000.0),
+        "min_margin": number("min_margin"),
+        "price_below": number("price_below"),
+        "price_above": number("price_above"),
+        "season": bool(body.get("season")),
     }
+    if (
+        watch["min_margin"] is None
+        and watch["price_below"] is None
+        and watch["price_above"] is None
+        and not watch["season"]
+    ):
+        raise ValueError("min_margin, price_below, price_above, season 중 하나 이상 지정하세요.")
+    return watch
+
+
+async def run_watch_cycle():
+    """
+    전체 관심 상품 1회 평가. 검색어는 중복 제거 후 WATCH_CONCURRENCY개씩 동시 조회,
+    시즌은 get_trends 묶음 조회, 마진은 검색어별로 등록된 원가 시나리오를 한 번에 계산.
+    """
+    watches = await asyncio.to_thread(watch_store.list)
+    by_query = {}
+    for w in watches:
+        by_query.setdefault(w["query"], []).append(w)
+    semaphore = asyncio.Semaphore(WATCH_CONCURRENCY)
+
+    async def fetch(query):
+        async with semaphore:
+            try:
+                return query, await search_product(query, display=20)
+            except Exception as e:
+                return query, {"success": False, "error": str(e)}
+
+    season_queries = [q for q, ws in by_query.items() if any(w["season"] for w in ws)]
+    searches, trends = await asyncio.gather(
+        asyncio.gather(*(fetch(q) for q in by_query)),
+        get_trends(season_queries) if season_queries else asyncio.sleep(0, {}),
+    )
+
+    markets = list(FEES_8)
+    states, users, events_by_user = {}, {}, {}
+    failed = []
+    for query, search in searches:
+        if not search.get("success"):
+            failed.append(query)
+            continue
+        group = by_query[query]
+        avg = search.get("avg_price", 0)
+        m = margin.margin_matrix(
+            [_sale_price(search)],
+            [FEES_8[k] for k in markets],
+            [w["cost"] for w in group],
+            [w["sup_ship"] for w in group],
+            [w["mkt_ship"] for w in group],
+        )["margin"][:, 0, :]
+        best = m.argmax(axis=0)
+        trend = trends.get(query) or {}
+        for i, w in enumerate(group):
+            snapshot = {
+                "avg_price": avg,
+                "best_market": markets[best[i]],
+                "best_margin": round(float(m[best[i], i]), 1),
+                "season": trend.get("season") if trend.get("success") else None,
+            }
+            events, states[w["id"]] = evaluate_watch(w, snapshot)
+            users[w["id"]] = w["user_id"]
+            if events:
+                events_by_user.setdefault(w["user_id"], []).extend(events)
+
+    tokens = await asyncio.to_thread(watch_store.tokens, list(events_by_user))
+    targets = [(user, tokens[user]) for user in events_by_user if user in tokens]
+    sent = await asyncio.gather(
+        *(_deliver_alert(user, *pair, compose_alert(events_by_user[user])) for user, pair in targets)
+    )
+    # 알림은 조건이 새로 성립할 때만 → 못 보낸 사용자는 이전 상태를 유지해 다음 주기에 다시 알림
+    delivered = {user for (user, _), r in zip(targets, sent) if r.get("success")}
+    await asyncio.to_thread(watch_store.save_states, {
+        wid: state for wid, state in states.items()
+        if users[wid] not in events_by_user or users[wid] in delivered
+    })
+    return {
+        "watches": len(watches),
+        "queries": len(by_query),
+        "failed_queries": failed,
+        "alerts": sum(len(e) for e in events_by_user.values()),
+        "messages_sent": sum(1 for r in sent if r.get("success")),
+        "send_errors": [
+            {"user_id": user, "error": r.get("error")}
+            for (user, _), r in zip(targets, sent)
+            if not r.get("success")
+        ],
+        "tokens_refreshed": sum(1 for r in sent if r.get("refreshed")),
+        "stale_users": [user for (user, _), r in zip(targets, sent) if r.get("stale")],
+    }
+
+
+async def _deliver_alert(user_id, kakao_token, refresh_token, message):
+    """
+    알림 1건 발송. 액세스 토큰이 만료됐으면 리프레시 토큰으로 갱신 후 1번 더,
+    갱신도 안 되면 사용자를 stale로 표시 (GET /watchlist에서 다시 로그인 안내).
+    """
+    result = await _kakao_memo(kakao_token, message)
+    if not result.get("expired"):
+        return result
+    if refresh_token:
+        try:
+            kakao_token, new_refresh = await kakao_refresh(refresh_token)
+        except (ValueError, UpstreamLimited) as e:
+            result = {**result, "error": str(e)}
+        except httpx.HTTPError as e:
+            # 일시 장애 → stale로 표시하지 않고 다음 주기에 다시 시도
+            return {"success": False, "error": f"카카오 토큰 갱신 실패: {type(e).__name__}"}
+        else:
+            await asyncio.to_thread(watch_store.set_token, user_id, kakao_token, new_refresh)
+            result = {**await _kakao_memo(kakao_token, message), "refreshed": True}
+            if not result.get("expired"):
+                return result
+    await asyncio.to_thread(watch_store.mark_stale, user_id)
+    return {**result, "stale": True}
+
+
+async def _watch_loop():
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        if not await _is_leader():
+            continue
+        try:
+            await run_watch_cycle()
+        except Exception:
+            pass
+
+
+@app.post("/watchlist")
+async def add_watch(request: Request):
+    """
+    관심 상품 등록. X-Kakao-Token 헤더(사용자 확인 + 알림 수신용, 사용자 단위로 최신 토큰 저장),
+    X-Kakao-Refresh-Token 헤더(선택, 액세스 토큰 만료 후에도 주기 알림을 보내려면 필요) +
+    body: {"query", "cost", "sup_ship", "mkt_ship", "min_margin", "price_below", "price_above", "season"}
+    """
+    user_id, kakao_token, failed = await _watch_user(request)
+    if failed:
+        return failed
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.post(url, headers=headers, data=payload)
-            data = res.json()
-        return {"success": data.get("result_code") == 0, "error": data.get("msg")}
-    except Exception as e:
+        body = await request.json()
+    except Exception:
+        body = None
+    if not isinstance(body, dict):
+        return {"success": False, "error": "JSON body가 필요합니다."}
+    try:
+        watch = _parse_watch(body)
+        watch_id = await asyncio.to_thread(watch_store.add, user_id, watch)
+    except ValueError as e:
         return {"success": False, "error": str(e)}
+    await asyncio.to_thread(
+        watch_store.set_token, user_id, kakao_token, request.headers.get("X-Kakao-Refresh-Token") or None
+    )
+    return {"success": True, "id": watch_id, **watch}
+
+
+@app.get("/watchlist")
+async def list_watches(request: Request):
+    """
+    X-Kakao-Token 사용자의 관심 상품 목록 + 마지막 평가 상태 + 알림 수신 상태(alerts).
+    alerts.stale이면 저장된 토큰으로 알림을 못 보내는 중 → 이 요청의 토큰(+ X-Kakao-Refresh-Token)으로 교체.
+    """
+    user_id, kakao_token, failed = await _watch_user(request)
+    if failed:
+        return failed
+    watches = await asyncio.to_thread(watch_store.list, user_id)
+    if watches:
+        await asyncio.to_thread(
+            watch_store.set_token, user_id, kakao_token, request.headers.get("X-Kakao-Refresh-Token") or None
+        )
+    return {"success": True, "watches": watches, "alerts": await asyncio.to_thread(watch_store.user_status, user_id)}
+
+
+@app.delete("/watchlist/{watch_id}")
+async def delete_watch(watch_id: int, request: Request):
+    user_id, _, failed = await _watch_user(request)
+    if failed:
+        return failed
+    if not await asyncio.to_thread(watch_store.remove, user_id, watch_id):
+        return {"success": False, "error": "관심 상품 없음"}
+    return {"success": True}
+
+
+@app.post("/watchlist/run")
+async def run_watchlist(request: Request):
+    """
+    관심 상품 평가 1회 즉시 실행. 네이버 쿼터를 쓰고 카카오 메시지를 보내므로
+    ADMIN_TOKEN이 설정돼 있고 X-Admin-Token 헤더가 일치할 때만 실행.
+    """
+    if not ADMIN_TOKEN:
+        return {"success": False, "error": "ADMIN_TOKEN 미설정 — 즉시 실행이 꺼져 있습니다."}
+    if request.headers.get("X-Admin-Token", "") != ADMIN_TOKEN:
+        return {"success": False, "error": "권한 없음"}
+    return {"success": True, **await run_watch_cycle()}
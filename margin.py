@@ -0,0 +1,111 @@
+"""
+마진 계산 엔진 (NumPy 벡터화).
+- 마켓(수수료율) × 판매가 × 원가/배송비 시나리오 전체를 한 번에 계산
+- /compare, /analyze, /compare/bulk의 단건 마진도 같은 계산식 사용
+"""
+
+import numpy as np
+
+
+def margin_matrix(sales, fee_rates, costs, sup_ships, mkt_ships):
+    """
+    sales (P,), fee_rates (M,), 시나리오별 costs/sup_ships/mkt_ships (S,) →
+    fee/profit/margin 배열 (M, P, S). 판매가 0 이하는 전부 0.
+    """
+    sale = np.asarray(sales, dtype=np.float64)[None, :, None]
+    fee_rate = np.asarray(fee_rates, dtype=np.float64)[:, None, None]
+    total_cost = (
+        np.asarray(costs, dtype=np.float64) + np.asarray(sup_ships, dtype=np.float64)
+    )[None, None, :]
+    mkt_ship = np.asarray(mkt_ships, dtype=np.float64)[None, None, :]
+
+    valid = sale > 0
+    fee = sale * fee_rate / 100
+    profit = sale - fee - mkt_ship - total_cost
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = np.where(valid, profit / sale * 100, 0.0)
+    return {
+        "fee": np.where(valid, fee, 0.0),
+        "profit": np.where(valid, profit, 0.0),
+        "margin": margin,
+    }
+
+
+def break_even(fee_rates, costs, sup_ships, mkt_ships):
+    """이익 0이 되는 판매가 (M, S): (원가 + 공급 배송비 + 마켓 배송비) / (1 - 수수료율)."""
+    fee_rate = np.asarray(fee_rates, dtype=np.float64)[:, None]
+    total = (
+        np.asarray(costs, dtype=np.float64)
+        + np.asarray(sup_ships, dtype=np.float64)
+        + np.asarray(mkt_ships, dtype=np.float64)
+    )[None, :]
+    return total / (1 - fee_rate / 100)
+
+
+def market_margins(sale, fees, cost, sup_ship, mkt_ship):
+    """
+    판매가 1개 기준 마켓별 마진 {market: {sale, fee, profit, margin}} + 최고 마진 마켓.
+    fees: {market: 수수료율(%)}
+    """
+    markets = list(fees)
+    m = margin_matrix([sale], [fees[k] for k in markets], [cost], [sup_ship], [mkt_ship])
+    fee = m["fee"][:, 0, 0].tolist()
+    profit = m["profit"][:, 0, 0].tolist()
+    margin = m["margin"][:, 0, 0].tolist()
+    shown_sale = round(sale) if sale > 0 else 0
+    margins = {
+        market: {
+            "sale": shown_sale,
+            "fee": round(fee[i]),
+            "profit": round(profit[i]),
+            "margin": round(margin[i], 1),
+        }
+        for i, market in enumerate(markets)
+    }
+    best_market = max(margins, key=lambda k: margins[k]["margin"])
+    return margins, best_market
+
+
+def scenario_grid(costs, sup_ships, mkt_ships):
+    """
+    원가 × 공급 배송비 × 마켓 배송비 조합 → 시나리오별 배열 3개 (S,), itertools.product 순서.
+    S = 세 축 길이의 곱이므로 호출 전에 크기를 확인할 것.
+    """
+    grid = np.meshgrid(
+        np.asarray(costs, dtype=np.float64),
+        np.asarray(sup_ships, dtype=np.float64),
+        np.asarray(mkt_ships, dtype=np.float64),
+        indexing="ij",
+    )
+    return tuple(axis.ravel() for axis in grid)
+
+
+def parse_values(values, limit=10000):
+    """
+    ["1000", "2000", "5000:20000:500"] → 숫자 목록.
+    "시작:끝:간격"은 끝 포함 범위. 값이 limit개를 넘으면 ValueError.
+    """
+    out = []
+    for raw in values:
+        for part in str(raw).split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                bounds = [float(x) for x in part.split(":")]
+            except ValueError:
+                raise ValueError(f"숫자 형식 오류: {part}") from None
+            if len(bounds) == 3:
+                start, stop, step = bounds
+                if step <= 0:
+                    raise ValueError("범위 간격은 0보다 커야 합니다.")
+                if (stop - start) / step + 1 > limit:
+                    raise ValueError(f"값은 최대 {limit}개까지 지정할 수 있습니다.")
+                out.extend(np.arange(start, stop + step / 2, step).tolist())
+            elif len(bounds) == 1:
+                out.append(bounds[0])
+            else:
+                raise ValueError(f"범위는 시작:끝:간격 형식이어야 합니다: {part}")
+            if len(out) > limit:
+                raise ValueError(f"값은 최대 {limit}개까지 지정할 수 있습니다.")
+    return out
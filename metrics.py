@@ -0,0 +1,193 @@
+"""
+Prometheus 텍스트 형식 메트릭 (외부 라이브러리 없음).
+- 라우트별 요청 수·지연 히스토그램, 처리 중 요청 게이지 (MetricsMiddleware)
+- 업스트림 호스트·엔드포인트별 지연/에러 (upstream.request에서 기록)
+- 캐시 hit/miss는 GET /metrics 시점에 cache.CACHES에서 수집
+"""
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        lines = self.header()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value=0.0):
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels → [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = self.header()
+        for labels, series in self._series.items():
+            for i, bound in enumerate(self.buckets):
+                le = _labels(self.labelnames, labels, [("le", f"{bound:g}")])
+                lines.append(f"{self.name}_bucket{le} {series[i]}")
+            inf = _labels(self.labelnames, labels, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{inf} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+# ---------- HTTP (라우트) ----------
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route", ("method", "route", "status")
+)
+http_latency = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+# ---------- 업스트림 ----------
+upstream_requests = Counter(
+    "upstream_requests_total", "Upstream calls by host, endpoint and status",
+    ("upstream", "endpoint", "status"),
+)
+upstream_latency = Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency", ("upstream", "endpoint")
+)
+upstream_errors = Counter(
+    "upstream_errors_total", "Upstream calls that raised or were refused locally",
+    ("upstream", "endpoint", "error"),
+)
+upstream_in_flight = Gauge("upstream_requests_in_flight", "Upstream calls in flight", ("upstream",))
+upstream_retries = Counter(
+    "upstream_retries_total", "Upstream calls retried after a transport error or 5xx", ("upstream", "endpoint")
+)
+upstream_hedges = Counter(
+    "upstream_hedges_total", "Hedged duplicate upstream calls sent and won", ("upstream", "endpoint", "result")
+)
+upstream_circuit_open = Gauge(
+    "upstream_circuit_open", "1 while the endpoint circuit breaker is open or half-open", ("upstream", "endpoint")
+)
+
+
+def render(caches=None):
+    """REGISTRY + 캐시 통계 → Prometheus 텍스트."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    if caches:
+        lines += [
+            "# HELP cache_requests_total Cache lookups by result",
+            "# TYPE cache_requests_total counter",
+        ]
+        for name, c in caches.items():
+            stats = c.stats()
+            for result in (
+                "hits", "misses", "coalesced", "stale_served", "revalidated", "refreshed", "evictions"
+            ):
+                lines.append(f'cache_requests_total{{cache="{name}",result="{result}"}} {stats[result]}')
+        lines += ["# HELP cache_hit_ratio Cache hit ratio", "# TYPE cache_hit_ratio gauge"]
+        for name, c in caches.items():
+            lines.append(f'cache_hit_ratio{{cache="{name}"}} {c.stats()["hit_ratio"]}')
+        lines += ["# HELP cache_entries Cached entries", "# TYPE cache_entries gauge"]
+        for name, c in caches.items():
+            lines.append(f'cache_entries{{cache="{name}"}} {len(c)}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """라우트(경로 템플릿) 단위 요청 수·지연·처리 중 게이지. 스트리밍 응답은 본문 전송 완료까지."""
+
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def _route_path(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            router = scope.get("router") or getattr(scope.get("app"), "router", None)
+            self._routes = {
+                getattr(r, "endpoint", None): getattr(r, "path", "")
+                for r in getattr(router, "routes", [])
+            }
+        return self._routes.get(endpoint, getattr(endpoint, "__name__", "unknown"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+        http_in_flight.inc()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route = self._route_path(scope)
+            method = scope.get("method", "")
+            http_requests.inc(method, route, str(status["code"]))
+            http_latency.observe(time.perf_counter() - started, method, route)
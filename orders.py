@@ -0,0 +1,585 @@
+"""
+마켓 주문 수집 + 판매 실적 집계 (SQLite, 외부 서비스 없음).
+- 스마트스토어(커머스API, bcrypt 서명 토큰) / 쿠팡 Wing(HMAC 서명) 주문을 워터마크 이후 바뀐 것만 받아옴
+- 주문은 (계정, 주문번호) 단위로 1행, 상품명은 상품 테이블에 한 번만 저장
+- 주문을 넣을 때 이전 행과의 차이만큼 (날짜, 상품) 일별 집계(order_daily)를 갱신 → 요약은 집계 행만 읽음
+- 취소·반품 주문은 집계에서 빠짐 (이미 반영된 주문이 취소로 바뀌면 차감)
+- 쿠팡은 발주서 상태에 취소·반품이 안 남음 → 반품/취소 요청을 따로 받아 주문 수량에서 빼고 집계 (부분 반품은 금액 비례)
+"""
+import asyncio
+import base64
+import datetime
+import hashlib
+import hmac
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+import bcrypt
+
+import upstream
+
+DAY = 86400
+KST = datetime.timezone(datetime.timedelta(hours=9))
+# SQLite 바인딩 변수 수 제한 안쪽에서 IN (...) 조회
+_IN_CHUNK = 500
+
+
+class OrderSyncError(Exception):
+    """마켓 API 오류 응답."""
+
+
+def account_for(market, key, secret):
+    """
+    마켓 + API 키 + 비밀값 → 계정 식별자 (원문은 저장하지 않음).
+    비밀값 HMAC이라 Client ID·Access Key만 알아서는 같은 계정(저장된 주문·토큰)에 닿지 않음.
+    """
+    digest = hmac.new(secret.encode(), f"{market}:{key}".encode(), hashlib.sha256).hexdigest()
+    return f"{market}:{digest[:32]}"
+
+
+def day_of(ts):
+    """unix 시각 → 한국 날짜 정수 (20240131)."""
+    d = datetime.datetime.fromtimestamp(ts, KST)
+    return d.year * 10000 + d.month * 100 + d.day
+
+
+def _parse_time(value):
+    """ISO 8601 문자열 → unix 시각 (시간대 없으면 한국 시간)."""
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=KST)
+    return int(parsed.timestamp())
+
+
+class OrderStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10.0)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS orders (
+                account TEXT NOT NULL,
+                order_id TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                ordered_at INTEGER NOT NULL,
+                day INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                amount INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                counted INTEGER NOT NULL,
+                changed_at INTEGER NOT NULL,
+                PRIMARY KEY (account, order_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS orders_day ON orders (account, day);
+            CREATE TABLE IF NOT EXISTS order_products (
+                account TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                PRIMARY KEY (account, product_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS order_daily (
+                account TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                product_id TEXT NOT NULL,
+                orders INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                revenue INTEGER NOT NULL,
+                PRIMARY KEY (account, day, product_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS order_costs (
+                account TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                cost REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (account, product_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS order_returns (
+                account TEXT NOT NULL,
+                receipt_id TEXT NOT NULL,
+                order_id TEXT NOT NULL,
+                quantity INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                PRIMARY KEY (account, receipt_id, order_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS order_returns_order ON order_returns (account, order_id);
+            CREATE TABLE IF NOT EXISTS order_sync (
+                account TEXT PRIMARY KEY,
+                market TEXT NOT NULL,
+                watermark INTEGER NOT NULL,
+                synced_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    # ----- 수집 상태 -----
+    def sync_state(self, account):
+        """→ (워터마크 unix 시각, 마지막 수집 시각). 수집한 적 없으면 (0, 0.0)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark, synced_at FROM order_sync WHERE account = ?", (account,)
+            ).fetchone()
+        return (row[0], row[1]) if row else (0, 0.0)
+
+    # ----- 저장 -----
+    def _returned(self, account, order_ids):
+        """주문별 반품·취소 요청 수량 합 (잠금 안에서 호출)."""
+        out = {}
+        for i in range(0, len(order_ids), _IN_CHUNK):
+            chunk = order_ids[i:i + _IN_CHUNK]
+            for order_id, quantity in self._conn.execute(
+                "SELECT order_id, SUM(quantity) FROM order_returns"
+                f" WHERE account = ? AND order_id IN ({','.join('?' * len(chunk))}) GROUP BY order_id",
+                (account, *chunk),
+            ):
+                out[order_id] = quantity
+        return out
+
+    def upsert(self, account, market, rows, watermark, returns=()):
+        """
+        주문 rows [{order_id, product_id, product_name, ordered_at, quantity, amount, status, counted, changed_at}] +
+        반품·취소 요청 returns [{receipt_id, order_id, quantity, status, created_at}]
+        저장 + 일별 집계 증감 + 워터마크 기록을 한 트랜잭션으로 → 새로 들어온 주문 수.
+        집계는 주문 수량에서 요청 수량을 뺀 만큼 (전부 빠지면 주문 수에서도 제외, 금액은 수량 비례).
+        여러 워커가 같은 계정을 동시에 넣어도 집계가 두 번 더해지지 않도록 쓰기 잠금을 먼저 잡음.
+        """
+        latest = {}
+        for r in rows:
+            prev = latest.get(r["order_id"])
+            if prev is None or r["changed_at"] >= prev["changed_at"]:
+                latest[r["order_id"]] = r
+        rows = list(latest.values())
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = {}
+                ids = list(dict.fromkeys([r["order_id"] for r in rows] + [r["order_id"] for r in returns]))
+                for i in range(0, len(ids), _IN_CHUNK):
+                    chunk = ids[i:i + _IN_CHUNK]
+                    for prev in self._conn.execute(
+                        "SELECT order_id, day, product_id, quantity, amount, counted FROM orders"
+                        f" WHERE account = ? AND order_id IN ({','.join('?' * len(chunk))})",
+                        (account, *chunk),
+                    ):
+                        old[prev[0]] = prev
+                returned_before = self._returned(account, ids)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO order_returns VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (account, str(r["receipt_id"]), r["order_id"], r["quantity"], r["status"], r["created_at"])
+                        for r in returns
+                    ],
+                )
+                returned = self._returned(account, ids) if returns else returned_before
+                delta = {}  # (day, product_id) → [주문 수, 수량, 매출]
+
+                def apply(day, product_id, quantity, amount, counted, returned_quantity, sign):
+                    net = quantity - returned_quantity
+                    if not counted or net <= 0:
+                        return
+                    d = delta.setdefault((day, product_id), [0, 0, 0])
+                    d[0] += sign
+                    d[1] += sign * net
+                    d[2] += sign * (amount if net == quantity else round(amount * net / quantity))
+
+                for order_id, day, product_id, quantity, amount, counted in old.values():
+                    apply(day, product_id, quantity, amount, counted, returned_before.get(order_id, 0), -1)
+                records = []
+                for r in rows:
+                    day = day_of(r["ordered_at"])
+                    apply(
+                        day, r["product_id"], r["quantity"], r["amount"], r["counted"],
+                        returned.get(r["order_id"], 0), 1,
+                    )
+                    records.append((
+                        account, r["order_id"], r["product_id"], r["ordered_at"], day,
+                        r["quantity"], r["amount"], r["status"], 1 if r["counted"] else 0, r["changed_at"],
+                    ))
+                # 이번에 주문 행은 안 왔지만 반품·취소 요청만 새로 온 기존 주문
+                for order_id, (_, day, product_id, quantity, amount, counted) in old.items():
+                    if order_id not in latest:
+                        apply(day, product_id, quantity, amount, counted, returned.get(order_id, 0), 1)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", records
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO order_products VALUES (?, ?, ?)",
+                    {(account, r["product_id"], r["product_name"]) for r in rows if r.get("product_name")},
+                )
+                changed = [(key, d) for key, d in delta.items() if any(d)]
+                self._conn.executemany(
+                    "INSERT INTO order_daily VALUES (?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (account, day, product_id) DO UPDATE SET"
+                    " orders = orders + excluded.orders,"
+                    " quantity = quantity + excluded.quantity,"
+                    " revenue = revenue + excluded.revenue",
+                    [(account, day, pid, *d) for (day, pid), d in changed],
+                )
+                self._conn.executemany(
+                    "DELETE FROM order_daily WHERE account = ? AND day = ? AND product_id = ? AND orders <= 0",
+                    [(account, day, pid) for (day, pid), _ in changed],
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO order_sync VALUES (?, ?, ?, ?)",
+                    (account, market, watermark, time.time()),
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return sum(1 for r in rows if r["order_id"] not in old)
+
+    def set_costs(self, account, costs):
+        """{상품 ID: 개당 원가} 저장. 원가 None은 삭제."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO order_costs VALUES (?, ?, ?, ?)",
+                [(account, pid, float(cost), now) for pid, cost in costs.items() if cost is not None],
+            )
+            self._conn.executemany(
+                "DELETE FROM order_costs WHERE account = ? AND product_id = ?",
+                [(account, pid) for pid, cost in costs.items() if cost is None],
+            )
+            self._conn.commit()
+
+    # ----- 조회 -----
+    def orders(self, account, day_from=0, limit=100, offset=0):
+        """day_from 이후 주문 최신순 (상품명, 반품·취소 요청 수량 포함)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT o.order_id, o.product_id, p.name, o.ordered_at, o.quantity, o.amount, o.status, o.counted,"
+                " (SELECT COALESCE(SUM(r.quantity), 0) FROM order_returns r"
+                "  WHERE r.account = o.account AND r.order_id = o.order_id)"
+                " FROM orders o LEFT JOIN order_products p ON p.account = o.account AND p.product_id = o.product_id"
+                " WHERE o.account = ? AND o.day >= ? ORDER BY o.ordered_at DESC LIMIT ? OFFSET ?",
+                (account, day_from, limit, offset),
+            ).fetchall()
+        return [
+            {
+                "order_id": r[0],
+                "product_id": r[1],
+                "product_name": r[2] or "",
+                "ordered_at": datetime.datetime.fromtimestamp(r[3], KST).isoformat(),
+                "quantity": r[4],
+                "amount": r[5],
+                "status": r[6],
+                "counted": bool(r[7]),
+                "returned_quantity": r[8],
+            }
+            for r in rows
+        ]
+
+    def summary(self, accounts, day_from, day_to):
+        """
+        일별 집계만으로 계정별 (날짜) / (상품) 합계 →
+        {"days": [(account, day, orders, quantity, revenue, cost, uncosted)], "products": [(account, product_id, name, ...)]}.
+        cost는 원가 등록 상품의 수량 × 원가 합, uncosted는 원가 미등록 수량.
+        """
+        placeholders = ",".join("?" * len(accounts))
+        base = (
+            " SUM(d.orders), SUM(d.quantity), SUM(d.revenue),"
+            " COALESCE(SUM(d.quantity * c.cost), 0),"
+            " SUM(CASE WHEN c.cost IS NULL THEN d.quantity ELSE 0 END)"
+            " FROM order_daily d"
+            " LEFT JOIN order_costs c ON c.account = d.account AND c.product_id = d.product_id"
+            f" WHERE d.account IN ({placeholders}) AND d.day BETWEEN ? AND ?"
+        )
+        params = (*accounts, day_from, day_to)
+        with self._lock:
+            days = self._conn.execute(
+                f"SELECT d.account, d.day, {base} GROUP BY d.account, d.day ORDER BY d.day", params
+            ).fetchall()
+            products = self._conn.execute(
+                "SELECT d.account, d.product_id,"
+                " (SELECT name FROM order_products p WHERE p.account = d.account AND p.product_id = d.product_id),"
+                f" {base} GROUP BY d.account, d.product_id",
+                params,
+            ).fetchall()
+        return {"days": days, "products": products}
+
+    def stats(self):
+        with self._lock:
+            orders, accounts = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT account) FROM orders"
+            ).fetchone()
+            rollups = self._conn.execute("SELECT COUNT(*) FROM order_daily").fetchone()[0]
+        return {"path": str(self.path), "orders": orders, "accounts": accounts, "daily_rows": rollups}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _check(res, market):
+    if res.status_code >= 400:
+        try:
+            body = res.json()
+            message = body.get("message") or body.get("errorMessage") or res.text
+        except ValueError:
+            message = res.text
+        raise OrderSyncError(f"{market} API 오류 {res.status_code}: {message}")
+    return res.json()
+
+
+# ---------- 스마트스토어 (네이버 커머스API) ----------
+SMARTSTORE_TOKEN_PATH = "/external/v1/oauth2/token"
+SMARTSTORE_CHANGED_PATH = "/external/v1/pay-order/seller/product-orders/last-changed-statuses"
+SMARTSTORE_QUERY_PATH = "/external/v1/pay-order/seller/product-orders/query"
+# 변경 내역 조회 1회 기간 한도, 상세 조회 1회 주문 수 한도
+SMARTSTORE_WINDOW = DAY
+SMARTSTORE_QUERY_MAX = 300
+SMARTSTORE_UNCOUNTED = {"CANCELED", "RETURNED", "CANCELED_BY_NOPAYMENT"}
+
+_smartstore_tokens = {}  # 계정(client_id + secret HMAC) → (토큰, 만료 unix 시각)
+
+
+def smartstore_sign(client_id, client_secret, timestamp):
+    """client_secret_sign: base64(bcrypt("{client_id}_{timestamp}", salt=client_secret))."""
+    try:
+        hashed = bcrypt.hashpw(f"{client_id}_{timestamp}".encode(), client_secret.encode())
+    except ValueError:
+        raise OrderSyncError("스마트스토어 Client Secret 형식 오류 (bcrypt salt)") from None
+    return base64.b64encode(hashed).decode()
+
+
+def _kst_iso(ts):
+    return datetime.datetime.fromtimestamp(ts, KST).isoformat(timespec="milliseconds")
+
+
+class SmartstoreSource:
+    market = "smartstore"
+    # 변경 시각 경계 누락 방지용 겹침 (같은 주문을 다시 받아도 결과는 같음)
+    lookback = 300
+
+    def __init__(self, client_id, client_secret, concurrency=4):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.account = account_for(self.market, client_id, client_secret)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _headers(self):
+        token, expires_at = _smartstore_tokens.get(self.account, (None, 0))
+        if token is None or expires_at - 60 <= time.time():
+            timestamp = int(time.time() * 1000)
+            # bcrypt는 CPU 작업 → 이벤트 루프 밖에서
+            sign = await asyncio.to_thread(smartstore_sign, self.client_id, self.client_secret, timestamp)
+            res = await upstream.request("smartstore", "POST", SMARTSTORE_TOKEN_PATH, data={
+                "client_id": self.client_id,
+                "timestamp": timestamp,
+                "client_secret_sign": sign,
+                "grant_type": "client_credentials",
+                "type": "SELF",
+            })
+            data = _check(res, "스마트스토어")
+            token = data["access_token"]
+            expires_at = time.time() + float(data.get("expires_in", 3600))
+            _smartstore_tokens[self.account] = (token, expires_at)
+        return {"Authorization": f"Bearer {token}"}
+
+    async def _changed_ids(self, start, end):
+        """start~end 사이 상태가 바뀐 상품주문번호 (more 커서로 끝까지)."""
+        ids = []
+        params = {"lastChangedFrom": _kst_iso(start), "lastChangedTo": _kst_iso(end)}
+        while True:
+            res = await upstream.request(
+                "smartstore", "GET", SMARTSTORE_CHANGED_PATH, headers=await self._headers(), params=params
+            )
+            data = _check(res, "스마트스토어").get("data") or {}
+            ids.extend(s["productOrderId"] for s in data.get("lastChangeStatuses") or [])
+            more = data.get("more")
+            if not more:
+                return ids
+            params = {**params, "lastChangedFrom": more["moreFrom"], "moreSequence": more["moreSequence"]}
+
+    async def _details(self, ids):
+        async with self._semaphore:
+            res = await upstream.request(
+                "smartstore", "POST", SMARTSTORE_QUERY_PATH,
+                headers=await self._headers(), json={"productOrderIds": ids},
+            )
+        rows = []
+        for entry in _check(res, "스마트스토어").get("data") or []:
+            order = entry.get("order") or {}
+            po = entry.get("productOrder") or {}
+            status = po.get("productOrderStatus", "")
+            ordered_at = _parse_time(order.get("orderDate") or order.get("paymentDate"))
+            rows.append({
+                "order_id": str(po["productOrderId"]),
+                "product_id": str(po.get("productId", "")),
+                "product_name": po.get("productName", ""),
+                "ordered_at": ordered_at,
+                "quantity": int(po.get("quantity", 0) or 0),
+                "amount": int(po.get("totalPaymentAmount", 0) or 0),
+                "status": status,
+                "counted": status not in SMARTSTORE_UNCOUNTED,
+                "changed_at": _parse_time(po["lastChangedDate"]) if po.get("lastChangedDate") else ordered_at,
+            })
+        return rows
+
+    async def fetch(self, since, until):
+        """since~until 변경분을 하루 단위 구간으로 → (주문 rows, 구간 끝) 순서대로."""
+        start = since
+        while start < until:
+            end = min(start + SMARTSTORE_WINDOW, until)
+            ids = list(dict.fromkeys(await self._changed_ids(start, end)))
+            chunks = [ids[i:i + SMARTSTORE_QUERY_MAX] for i in range(0, len(ids), SMARTSTORE_QUERY_MAX)]
+            rows = []
+            for part in await asyncio.gather(*(self._details(chunk) for chunk in chunks)):
+                rows.extend(part)
+            # 취소·반품은 주문 상태로 들어옴 → 별도 요청 목록 없음
+            yield rows, [], end
+            start = end
+
+
+# ---------- 쿠팡 Wing ----------
+COUPANG_ORDERS_PATH = "/v2/providers/openapi/apis/api/v4/vendors/{vendor_id}/ordersheets"
+# 발주서 목록은 상태별 조회, 주문일 기준 최대 31일
+COUPANG_STATUSES = ("ACCEPT", "INSTRUCT", "DEPARTURE", "DELIVERING", "FINAL_DELIVERY")
+COUPANG_WINDOW_DAYS = 31
+COUPANG_PAGE_SIZE = 50
+# 반품·취소 요청 목록 (접수일 기준). 반품은 상태별(출고중지요청·반품접수·반품완료·쿠팡확인요청) 조회, 취소는 상태 없이
+COUPANG_RETURNS_PATH = "/v2/providers/openapi/apis/api/v6/vendors/{vendor_id}/returnRequests"
+COUPANG_RETURN_STATUSES = ("RU", "UC", "CC", "PR")
+
+
+def coupang_authorization(access_key, secret_key, method, path, query="", signed_date=None):
+    """CEA HmacSHA256 서명 헤더. 메시지 = signed-date + method + path + query (물음표 제외)."""
+    signed_date = signed_date or time.strftime("%y%m%dT%H%M%SZ", time.gmtime())
+    message = f"{signed_date}{method}{path}{query}"
+    signature = hmac.new(secret_key.encode(), message.encode(), hashlib.sha256).hexdigest()
+    return (
+        f"CEA algorithm=HmacSHA256, access-key={access_key}, "
+        f"signed-date={signed_date}, signature={signature}"
+    )
+
+
+def _kst_date(ts):
+    return datetime.datetime.fromtimestamp(ts, KST).strftime("%Y-%m-%d")
+
+
+class CoupangSource:
+    """
+    발주서 목록은 변경 시각이 아닌 주문일 기준이라 최근 lookback 동안 주문은 매번 다시 받아 상태를 갱신.
+    취소·반품은 발주서 상태에 남지 않음 → 같은 구간 접수된 반품·취소 요청을 받아 주문 수량에서 차감.
+    철회된 반품 요청은 목록에서 빠지지만 이미 저장한 차감은 되돌리지 않음 (실현 매출을 낮게 잡는 쪽).
+    """
+    market = "coupang"
+
+    def __init__(self, access_key, secret_key, vendor_id, concurrency=4, lookback_days=7):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.vendor_id = vendor_id
+        self.account = account_for(self.market, f"{vendor_id}:{access_key}", secret_key)
+        self.lookback = lookback_days * DAY
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _pages(self, path, params):
+        """서명한 GET을 nextToken 끝까지 → 항목(data) 목록."""
+        items = []
+        next_token = ""
+        while True:
+            query = urlencode({**params, "nextToken": next_token} if next_token else params)
+            headers = {
+                "Authorization": coupang_authorization(self.access_key, self.secret_key, "GET", path, query),
+                "X-Requested-By": self.vendor_id,
+            }
+            async with self._semaphore:
+                res = await upstream.request("coupang", "GET", f"{path}?{query}", headers=headers)
+            body = _check(res, "쿠팡")
+            items.extend(body.get("data") or [])
+            next_token = body.get("nextToken") or ""
+            if not next_token:
+                return items
+
+    async def _status_pages(self, status, date_from, date_to):
+        path = COUPANG_ORDERS_PATH.format(vendor_id=self.vendor_id)
+        params = {
+            "createdAtFrom": date_from,
+            "createdAtTo": date_to,
+            "status": status,
+            "maxPerPage": COUPANG_PAGE_SIZE,
+        }
+        rows = []
+        for sheet in await self._pages(path, params):
+            ordered_at = _parse_time(sheet["orderedAt"])
+            for item in sheet.get("orderItems") or []:
+                rows.append({
+                    "order_id": f"{sheet['orderId']}:{item.get('vendorItemId', '')}",
+                    "product_id": str(item.get("sellerProductId", "")),
+                    "product_name": item.get("sellerProductName", ""),
+                    "ordered_at": ordered_at,
+                    "quantity": int(item.get("shippingCount", 0) or 0),
+                    "amount": int(item.get("orderPrice", 0) or 0),
+                    "status": sheet.get("status", status),
+                    "counted": True,
+                    "changed_at": ordered_at,
+                })
+        return rows
+
+    async def _return_pages(self, cancel_type, status, date_from, date_to):
+        """반품(RETURN, 상태별)·취소(CANCEL) 요청 → 주문 상품별 요청 수량 rows."""
+        path = COUPANG_RETURNS_PATH.format(vendor_id=self.vendor_id)
+        params = {
+            "createdAtFrom": date_from,
+            "createdAtTo": date_to,
+            "cancelType": cancel_type,
+            "maxPerPage": COUPANG_PAGE_SIZE,
+        }
+        if status:
+            params["status"] = status
+        rows = []
+        for receipt in await self._pages(path, params):
+            created_at = _parse_time(receipt["createdAt"])
+            for item in receipt.get("returnItems") or []:
+                rows.append({
+                    "receipt_id": receipt["receiptId"],
+                    "order_id": f"{receipt['orderId']}:{item.get('vendorItemId', '')}",
+                    "quantity": int(item.get("cancelCount", 0) or 0),
+                    "status": receipt.get("receiptStatus") or receipt.get("receiptType") or cancel_type,
+                    "created_at": created_at,
+                })
+        return rows
+
+    async def fetch(self, since, until):
+        """since~until 구간(최대 31일)마다 상태별 발주서·반품/취소 요청을 동시에 → (주문 rows, 요청 rows, 구간 끝)."""
+        start = since
+        while start < until:
+            end = min(start + COUPANG_WINDOW_DAYS * DAY, until)
+            date_from, date_to = _kst_date(start), _kst_date(end)
+            parts = await asyncio.gather(
+                *(self._status_pages(status, date_from, date_to) for status in COUPANG_STATUSES),
+                *(self._return_pages("RETURN", status, date_from, date_to) for status in COUPANG_RETURN_STATUSES),
+                self._return_pages("CANCEL", "", date_from, date_to),
+            )
+            rows = [r for part in parts[:len(COUPANG_STATUSES)] for r in part]
+            returns = [r for part in parts[len(COUPANG_STATUSES):] for r in part]
+            yield rows, returns, end
+            start = end
+
+
+async def sync(store, source, initial_days=30, now=None):
+    """워터마크 이후(처음이면 initial_days일 전부터) 변경분 수집 → {market, fetched, returns, new, watermark}."""
+    now = int(now if now is not None else time.time())
+    watermark, _ = await asyncio.to_thread(store.sync_state, source.account)
+    since = watermark - source.lookback if watermark else now - initial_days * DAY
+    fetched = returned = new = 0
+    async for rows, returns, end in source.fetch(since, now):
+        new += await asyncio.to_thread(store.upsert, source.account, source.market, rows, end, returns)
+        fetched += len(rows)
+        returned += len(returns)
+        watermark = end
+    return {
+        "market": source.market,
+        "fetched": fetched,
+        "returns": returned,
+        "new": new,
+        "watermark": datetime.datetime.fromtimestamp(watermark, KST).isoformat() if watermark else None,
+    }
@@ -0,0 +1,127 @@
+"""
+시중가 분포 온라인 누적기 (NumPy).
+- 상품을 받는 대로 로그 간격 히스토그램(구간 폭 1%)에 누적 → 상품 목록을 들고 있지 않음
+- 상품명에 검색어 토큰이 충분히 없으면 제외 (액세서리·무관 상품)
+- 로그 가격 IQR 울타리 밖은 이상치로 제외한 뒤 중앙값·절사평균·백분위 계산
+- robust_price: 이상치 제외 후 절사평균 (마진 계산 기준 판매가)
+"""
+import re
+
+import numpy as np
+
+from category_index import normalize
+
+PRICE_FLOOR = 10
+PRICE_CEIL = 1_000_000_000
+BIN_RATIO = 1.01
+N_BINS = int(np.ceil(np.log(PRICE_CEIL / PRICE_FLOOR) / np.log(BIN_RATIO))) + 1
+PERCENTILES = (10, 25, 50, 75, 90)
+
+_TAG = re.compile(r"<[^>]+>")
+
+
+def relevance(query_tokens, title):
+    """검색어 토큰 중 상품명(공백 제거)에 들어 있는 비율 0~1."""
+    if not query_tokens:
+        return 1.0
+    compact = normalize(_TAG.sub("", title or "")).replace(" ", "")
+    return sum(1 for t in query_tokens if t in compact) / len(query_tokens)
+
+
+def _bin_index(prices):
+    ratio = np.log(np.clip(prices, PRICE_FLOOR, PRICE_CEIL) / PRICE_FLOOR) / np.log(BIN_RATIO)
+    return np.minimum(ratio.astype(np.int64), N_BINS - 1)
+
+
+def _quantile(counts, sums, q):
+    """히스토그램 q(0~1) 분위 가격. 해당 구간 안은 평균값 기준."""
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    target = q * (total - 1)
+    index = int(np.searchsorted(np.cumsum(counts), target, side="right"))
+    index = min(index, len(counts) - 1)
+    return float(sums[index] / counts[index])
+
+
+def _trimmed_mean(counts, sums, trim):
+    """양쪽 trim 비율 제외 평균. 경계 구간은 구간 평균값으로 일부만 반영."""
+    total = counts.sum()
+    cut = total * trim
+    weights = counts.astype(np.float64)
+    below = np.cumsum(weights) - weights
+    above = total - np.cumsum(weights)
+    keep = np.clip(weights - np.clip(cut - below, 0, None) - np.clip(cut - above, 0, None), 0, None)
+    kept = keep.sum()
+    if kept <= 0:
+        return _quantile(counts, sums, 0.5)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(counts > 0, sums / counts, 0.0)
+    return float((keep * means).sum() / kept)
+
+
+class PriceAccumulator:
+    def __init__(self, query, min_relevance=0.5, fence=1.5, trim=0.1):
+        self.tokens = normalize(query).split()
+        self.min_relevance = min_relevance
+        self.fence = fence
+        self.trim = trim
+        self.counts = np.zeros(N_BINS, dtype=np.int64)
+        self.sums = np.zeros(N_BINS, dtype=np.float64)
+        self.sampled = 0
+        self.irrelevant = 0
+
+    def add_items(self, items):
+        """네이버쇼핑 items 누적 (lprice 없는 상품·무관 상품 제외)."""
+        prices = []
+        for it in items:
+            if not it.get("lprice"):
+                continue
+            self.sampled += 1
+            if relevance(self.tokens, it.get("title")) < self.min_relevance:
+                self.irrelevant += 1
+                continue
+            prices.append(int(it["lprice"]))
+        prices = np.asarray([p for p in prices if p > 0], dtype=np.float64)
+        if prices.size:
+            index = _bin_index(prices)
+            np.add.at(self.counts, index, 1)
+            np.add.at(self.sums, index, prices)
+
+    def summary(self):
+        """누적 분포 요약. 남은 상품이 없으면 used=0, 가격 0."""
+        counts, sums = self.counts, self.sums
+        relevant = int(counts.sum())
+        out = {
+            "sampled": self.sampled,
+            "irrelevant": self.irrelevant,
+            "outliers": 0,
+            "used": 0,
+        }
+        if relevant == 0:
+            return {**out, "min": 0, "max": 0, "mean": 0, "median": 0, "trimmed_mean": 0,
+                    **{f"p{p}": 0 for p in PERCENTILES}, "robust_price": 0}
+        # 로그 가격 IQR 울타리 (구간 번호가 로그 가격에 비례)
+        q1 = _bin_index(np.array([_quantile(counts, sums, 0.25)]))[0]
+        q3 = _bin_index(np.array([_quantile(counts, sums, 0.75)]))[0]
+        spread = max(q3 - q1, 1) * self.fence
+        inside = np.zeros(N_BINS, dtype=bool)
+        inside[max(int(q1 - spread), 0): int(q3 + spread) + 1] = True
+        counts = np.where(inside, counts, 0)
+        sums = np.where(inside, sums, 0.0)
+        used = int(counts.sum())
+        nonzero = np.flatnonzero(counts)
+        lo, hi = nonzero[0], nonzero[-1]
+        trimmed = _trimmed_mean(counts, sums, self.trim)
+        return {
+            **out,
+            "outliers": relevant - used,
+            "used": used,
+            "min": round(sums[lo] / counts[lo]),
+            "max": round(sums[hi] / counts[hi]),
+            "mean": round(sums.sum() / used),
+            "median": round(_quantile(counts, sums, 0.5)),
+            "trimmed_mean": round(trimmed),
+            **{f"p{p}": round(_quantile(counts, sums, p / 100)) for p in PERCENTILES},
+            "robust_price": round(trimmed),
+        }
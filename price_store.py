@@ -0,0 +1,216 @@
+"""
+네이버쇼핑 시중가 스냅샷 시계열 저장소 (SQLite, 외부 서비스 없음).
+- 검색어별 (시각, min/avg/max, 상품 수, 상품별 lprice 배열) 행을 추가만 함. lprice 배열은 int32 바이트로 압축 저장
+- 같은 검색어는 min_interval초에 한 번만 기록
+- compact(): raw_days보다 오래된 스냅샷은 하루 1행(가격 분포 21분위 요약)으로 합치고, retention_days 지난 행은 삭제
+- history(): 저장된 행만으로 구간별 min/avg/max·백분위 밴드 계산 (업스트림 호출 없음)
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+DAY = 86400
+# 하루 요약 행에 남기는 가격 분포 분위 수 (0, 5, ..., 100 백분위)
+SKETCH_POINTS = 21
+BANDS = (10, 25, 50, 75, 90)
+
+
+def _pack(prices):
+    return np.asarray(prices, dtype=np.int32).tobytes()
+
+
+def _unpack(blob):
+    return np.frombuffer(blob, dtype=np.int32)
+
+
+def _bands(rows, n_index, prices_index):
+    """여러 행 가격 배열의 백분위. 하루 요약 행(21분위)은 원래 상품 수 n만큼 가중."""
+    values, weights = [], []
+    for row in rows:
+        arr = _unpack(row[prices_index])
+        values.append(arr)
+        weights.append(np.full(len(arr), row[n_index] / len(arr)))
+    values = np.concatenate(values)
+    weights = np.concatenate(weights)
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    cum = np.cumsum(weights) - weights / 2
+    return np.interp(np.array(BANDS) / 100 * weights.sum(), cum, values)
+
+
+class PriceStore:
+    def __init__(self, path, min_interval=3600, raw_days=3, retention_days=180):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.min_interval = min_interval
+        self.raw_days = raw_days
+        self.retention_days = retention_days
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS price_points (
+                query TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                min_price INTEGER NOT NULL,
+                avg_price REAL NOT NULL,
+                max_price INTEGER NOT NULL,
+                n INTEGER NOT NULL,
+                prices BLOB NOT NULL,
+                PRIMARY KEY (query, ts)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS price_points_ts ON price_points (ts)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._last = {}  # query → 마지막 기록 시각
+        self.recorded = 0
+
+    def record(self, query, prices, now=None):
+        """검색 결과 lprice 목록 스냅샷 기록. min_interval 안의 반복 기록은 건너뜀 → 기록 여부 반환."""
+        prices = [p for p in prices if p > 0]
+        if not query or not prices:
+            return False
+        now = int(now if now is not None else time.time())
+        if now - self._last.get(query, 0) < self.min_interval:
+            return False
+        # 다른 워커 프로세스가 먼저 기록했을 수 있음
+        with self._lock:
+            last = self._conn.execute(
+                "SELECT MAX(ts) FROM price_points WHERE query = ?", (query,)
+            ).fetchone()[0]
+        if last is not None and now - last < self.min_interval:
+            self._last[query] = last
+            return False
+        self._last[query] = now
+        arr = np.asarray(prices, dtype=np.int32)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO price_points VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (query, now, int(arr.min()), float(arr.mean()), int(arr.max()), len(arr), _pack(arr)),
+            )
+            self._conn.commit()
+        self.recorded += 1
+        return True
+
+    def compact(self, now=None):
+        """
+        오래된 스냅샷을 (검색어, 날짜)별 1행으로 합치고 보관 기간 지난 행 삭제 → (합친 행 수, 삭제 행 수).
+        잠금은 그룹 하나씩만 잡고 커밋 → 합치는 동안에도 record·history가 그룹 사이에 끼어들 수 있음.
+        """
+        now = int(now if now is not None else time.time())
+        raw_cutoff = (now - self.raw_days * DAY) // DAY * DAY
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM price_points WHERE ts < ?", (now - self.retention_days * DAY,)
+            ).rowcount
+            self._conn.commit()
+            groups = self._conn.execute(
+                "SELECT query, ts / ? AS day FROM price_points WHERE ts < ?"
+                " GROUP BY query, day HAVING COUNT(*) > 1",
+                (DAY, raw_cutoff),
+            ).fetchall()
+        merged = 0
+        for query, day in groups:
+            start = day * DAY
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT min_price, avg_price, max_price, n, prices FROM price_points"
+                    " WHERE query = ? AND ts >= ? AND ts < ?",
+                    (query, start, start + DAY),
+                ).fetchall()
+                if len(rows) < 2:
+                    continue
+                n = sum(r[3] for r in rows)
+                sketch = np.percentile(
+                    np.concatenate([_unpack(r[4]) for r in rows]), np.linspace(0, 100, SKETCH_POINTS)
+                )
+                self._conn.execute(
+                    "DELETE FROM price_points WHERE query = ? AND ts >= ? AND ts < ?",
+                    (query, start, start + DAY),
+                )
+                self._conn.execute(
+                    "INSERT INTO price_points VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        query,
+                        start,
+                        min(r[0] for r in rows),
+                        sum(r[1] * r[3] for r in rows) / n,
+                        max(r[2] for r in rows),
+                        n,
+                        _pack(np.round(sketch)),
+                    ),
+                )
+                self._conn.commit()
+            merged += len(rows)
+        stale = now - self.min_interval
+        self._last = {q: ts for q, ts in self._last.items() if ts > stale}
+        return merged, deleted
+
+    def history(self, query, days=30, points=60, now=None):
+        """
+        최근 days일 시계열을 points개 이하 구간으로 다운샘플 →
+        [{ts, min, avg, max, samples, p10, p25, p50, p75, p90}], 전체 요약 dict.
+        """
+        now = int(now if now is not None else time.time())
+        since = now - days * DAY
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, min_price, avg_price, max_price, n, prices FROM price_points"
+                " WHERE query = ? AND ts >= ? ORDER BY ts",
+                (query, since),
+            ).fetchall()
+        if not rows:
+            return [], None
+        width = max((now - since) / max(points, 1), 1)
+        buckets = {}
+        for row in rows:
+            buckets.setdefault(int((row[0] - since) // width), []).append(row)
+        series = []
+        for index in sorted(buckets):
+            group = buckets[index]
+            n = sum(r[4] for r in group)
+            bands = _bands(group, 4, 5)
+            series.append({
+                "ts": group[-1][0],
+                "min": min(r[1] for r in group),
+                "avg": round(sum(r[2] * r[4] for r in group) / n),
+                "max": max(r[3] for r in group),
+                "samples": len(group),
+                **{f"p{b}": int(round(v)) for b, v in zip(BANDS, bands)},
+            })
+        overall = _bands(rows, 4, 5)
+        first, last = series[0]["avg"], series[-1]["avg"]
+        summary = {
+            "first_ts": rows[0][0],
+            "last_ts": rows[-1][0],
+            "snapshots": len(rows),
+            "min": min(r[1] for r in rows),
+            "max": max(r[3] for r in rows),
+            "avg_change_pct": round((last / first - 1) * 100, 1) if first else 0,
+            **{f"p{b}": int(round(v)) for b, v in zip(BANDS, overall)},
+        }
+        return series, summary
+
+    def stats(self):
+        with self._lock:
+            rows, queries = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT query) FROM price_points"
+            ).fetchone()
+        return {
+            "path": str(self.path),
+            "rows": rows,
+            "queries": queries,
+            "recorded": self.recorded,
+            "min_interval": self.min_interval,
+            "raw_days": self.raw_days,
+            "retention_days": self.retention_days,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,193 @@
+"""
+업스트림 호출 속도 제한 + 일일 쿼터 관리.
+- 정책(업스트림 엔드포인트 묶음) × API 키별 토큰 버킷, 토큰이 없으면 대기 한도(deadline)까지 순서대로 대기
+- 일일 쿼터는 한국 시간 자정에 초기화 (네이버 기준), 초과 예상 시 업스트림 호출 없이 즉시 실패
+- 사용자 토큰·키마다 상태가 생기므로 idle_ttl초 동안 안 쓴 키는 정리 (버킷이 다 찼고 오늘 쿼터를 안 쓴 경우만)
+"""
+import asyncio
+import datetime
+import hashlib
+import time
+
+KST = datetime.timezone(datetime.timedelta(hours=9))
+
+
+class UpstreamLimited(Exception):
+    """속도 제한/쿼터 때문에 업스트림을 호출하지 않음."""
+
+
+class RateLimited(UpstreamLimited):
+    pass
+
+
+class QuotaExceeded(UpstreamLimited):
+    pass
+
+
+class TokenBucket:
+    """초당 rate개, 최대 burst개. 토큰을 미리 예약(음수 허용)해 대기 순서를 보장."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, max_wait):
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        wait = -self.tokens / self.rate
+        if wait > max_wait:
+            self.tokens += 1
+            raise RateLimited(f"요청이 많아 잠시 후 다시 시도해주세요. (대기 {wait:.1f}초 예상)")
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # 대기 중 취소되면 호출하지 않으므로 예약한 토큰을 돌려줌
+            self.tokens += 1
+            raise
+        return wait
+
+    def pause(self, seconds):
+        """업스트림이 429를 돌려주면 seconds 동안 토큰 지급 중단."""
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class Policy:
+    def __init__(self, name, upstream, path_prefix, rate, burst, daily_limit=0):
+        self.name = name
+        self.upstream = upstream
+        self.path_prefix = path_prefix
+        self.rate = rate
+        self.burst = burst
+        self.daily_limit = daily_limit
+
+    def matches(self, upstream, path):
+        return upstream == self.upstream and path.startswith(self.path_prefix)
+
+
+class _KeyState:
+    def __init__(self, policy):
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+        self.day = None
+        self.used = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self.last_used = time.monotonic()
+
+
+def mask_key(key):
+    """관리 화면용 키 식별자: 키 해시 앞부분만 (앞글자는 "Bear" 같은 공통 접두어라 노출하지 않음)."""
+    if not key:
+        return "-"
+    return "key:" + hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+class Governor:
+    def __init__(self, policies, max_wait=2.0, idle_ttl=600.0):
+        self.policies = policies
+        self.max_wait = max_wait
+        self.idle_ttl = idle_ttl
+        self._states = {}
+        self._swept = time.monotonic()
+
+    def policy_for(self, upstream, path):
+        for policy in self.policies:
+            if policy.matches(upstream, path):
+                return policy
+        return None
+
+    def _state(self, policy, key):
+        now = time.monotonic()
+        today = datetime.datetime.now(KST).date()
+        if now - self._swept >= self.idle_ttl:
+            self._sweep(now, today)
+        state = self._states.get((policy.name, key))
+        if state is None:
+            state = self._states[(policy.name, key)] = _KeyState(policy)
+        state.last_used = now
+        if state.day != today:
+            state.day = today
+            state.used = 0
+        return state
+
+    def _sweep(self, now, today):
+        """idle_ttl초 넘게 안 쓴 키 제거. 지워도 새로 만든 상태와 같아지는 키만 (버킷 가득, 오늘 쿼터 미사용)."""
+        self._swept = now
+        limits = {policy.name: policy.daily_limit for policy in self.policies}
+        for name_key, state in list(self._states.items()):
+            if now - state.last_used < self.idle_ttl:
+                continue
+            state.bucket._refill()
+            if state.bucket.tokens < state.bucket.burst:
+                continue
+            if limits.get(name_key[0]) and state.day == today and state.used:
+                continue
+            del self._states[name_key]
+
+    def remaining(self, upstream, path, key):
+        """남은 일일 쿼터 (제한 없으면 None)."""
+        policy = self.policy_for(upstream, path)
+        if policy is None or not policy.daily_limit:
+            return None
+        return max(0, policy.daily_limit - self._state(policy, key).used)
+
+    async def acquire(self, upstream, path, key, max_wait=None):
+        """호출 1회 허가. 쿼터 초과면 QuotaExceeded, 대기 한도 초과면 RateLimited."""
+        policy = self.policy_for(upstream, path)
+        if policy is None:
+            return
+        state = self._state(policy, key)
+        if policy.daily_limit and state.used >= policy.daily_limit:
+            state.rejected += 1
+            raise QuotaExceeded(f"{policy.name} 일일 호출 한도({policy.daily_limit}회)를 모두 사용했습니다.")
+        try:
+            waited = await state.bucket.acquire(self.max_wait if max_wait is None else max_wait)
+        except RateLimited:
+            state.throttled += 1
+            raise
+        state.waited += waited
+        state.used += 1
+
+    def backoff(self, upstream, path, key, seconds):
+        policy = self.policy_for(upstream, path)
+        if policy is not None:
+            self._state(policy, key).bucket.pause(seconds)
+
+    def snapshot(self):
+        out = []
+        for policy in self.policies:
+            keys = [
+                (key, state) for (name, key), state in self._states.items() if name == policy.name
+            ]
+            out.append({
+                "policy": policy.name,
+                "upstream": policy.upstream,
+                "rate_per_sec": policy.rate,
+                "burst": policy.burst,
+                "daily_limit": policy.daily_limit or None,
+                "keys": [
+                    {
+                        "key": mask_key(key),
+                        "day": state.day.isoformat() if state.day else None,
+                        "used": state.used,
+                        "remaining": (
+                            max(0, policy.daily_limit - state.used) if policy.daily_limit else None
+                        ),
+                        "rejected": state.rejected,
+                        "throttled": state.throttled,
+                        "waited_sec": round(state.waited, 2),
+                    }
+                    for key, state in keys
+                ],
+            })
+        return out
@@ -0,0 +1,174 @@
+"""
+업스트림 장애 대응: 요청 단위 마감 시각, 회로 차단기, 지연 분위 추적.
+- deadline(): 요청 전체 남은 시간을 contextvar로 전달 → 업스트림 호출·재시도·속도 제한 대기가 그 안에서만 진행
+- CircuitBreaker: 업스트림 × 엔드포인트별 최근 window초 실패율이 기준을 넘으면 open_for초 동안 호출 없이 즉시 실패,
+  이후 1건만 시험 호출(half-open)해서 성공하면 복구
+- LatencyTracker: 최근 성공 호출 지연 p95 → 헤지 요청 대기 시간
+"""
+import contextvars
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from ratelimit import UpstreamLimited
+
+
+class CircuitOpen(UpstreamLimited):
+    """회로 차단 중이라 업스트림을 호출하지 않음."""
+
+
+class DeadlineExceeded(UpstreamLimited):
+    """요청 마감 시각이 지나 업스트림 호출을 중단함."""
+
+
+# ---------- 요청 마감 시각 ----------
+_deadline = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+def remaining():
+    """현재 요청의 남은 시간(초). 마감 없으면 None."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    이 블록 안 업스트림 호출의 마감 = 지금 + seconds (바깥 마감이 더 이르면 그대로).
+    seconds=None이면 마감 해제 (요청이 띄운 백그라운드 작업).
+    """
+    if seconds is None:
+        token = _deadline.set(None)
+    else:
+        at = time.monotonic() + seconds
+        outer = _deadline.get()
+        token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def no_deadline():
+    return deadline(None)
+
+
+class DeadlineMiddleware:
+    """HTTP 요청마다 seconds초 마감. exempt 경로(접두어)는 스트리밍·일괄 처리라 항목별로 따로 마감."""
+
+    def __init__(self, app, seconds=8.0, exempt=()):
+        self.app = app
+        self.seconds = seconds
+        self.exempt = tuple(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.seconds or scope.get("path", "").startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+        with deadline(self.seconds):
+            await self.app(scope, receive, send)
+
+
+# ---------- 회로 차단기 ----------
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class CircuitBreaker:
+    def __init__(self, window=30.0, min_calls=10, failure_rate=0.5, open_for=15.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_for = open_for
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._calls = deque()  # (시각, 실패 여부)
+        self._failures = 0
+        self._probing = False
+        self.rejected = 0
+        self.trips = 0
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, failed = self._calls.popleft()
+            self._failures -= failed
+
+    def allow(self):
+        """호출 허가 여부. open이 open_for초 지났으면 시험 호출 1건만 허가."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_for:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self):
+        """결과 없이 끝난 호출(취소·짧은 마감) → 시험 호출 중이었으면 다음 호출이 다시 시험."""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def retry_after(self):
+        return max(0.0, self.opened_at + self.open_for - time.monotonic())
+
+    def record(self, failed):
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if failed:
+                self._trip(now)
+            else:
+                self.state = CLOSED
+                self._calls.clear()
+                self._failures = 0
+            return
+        self._calls.append((now, failed))
+        self._failures += failed
+        self._trim(now)
+        if (
+            self.state == CLOSED
+            and len(self._calls) >= self.min_calls
+            and self._failures / len(self._calls) >= self.failure_rate
+        ):
+            self._trip(now)
+
+    def _trip(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+
+    def snapshot(self):
+        self._trim(time.monotonic())
+        return {
+            "state": self.state,
+            "calls": len(self._calls),
+            "failures": self._failures,
+            "retry_after_sec": round(self.retry_after(), 1) if self.state != CLOSED else 0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+# ---------- 지연 분위 ----------
+class LatencyTracker:
+    """최근 size개 성공 호출 지연. p95는 every건마다 다시 계산."""
+
+    def __init__(self, size=200, every=20, min_samples=20):
+        self._samples = deque(maxlen=size)
+        self.every = every
+        self.min_samples = min_samples
+        self._since = 0
+        self._p95 = None
+
+    def observe(self, seconds):
+        self._samples.append(seconds)
+        self._since += 1
+        if self._since >= self.every and len(self._samples) >= self.min_samples:
+            ordered = sorted(self._samples)
+            self._p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            self._since = 0
+
+    def p95(self):
+        return self._p95
@@ -0,0 +1,138 @@
+"""
+한 서버 안 여러 워커 프로세스가 함께 쓰는 캐시·조정 저장소 (SQLite WAL, 외부 서비스 없음).
+- 이름공간별 key → JSON 값 + 만료 시각 (벽시계 기준)
+- 임대(lease): 같은 이름은 한 워커만 보유 → 워커 간 single-flight, 백그라운드 작업 리더 선출
+- changes(): rowid 이후 바뀐 항목 → 워커별 메모리 인덱스 동기화
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def encode_key(key):
+    return key if isinstance(key, str) else json.dumps(key, ensure_ascii=False, default=str)
+
+
+class SharedCache:
+    def __init__(self, path, owner=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS shared_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                UNIQUE (namespace, key)
+            );
+            CREATE INDEX IF NOT EXISTS shared_entries_expiry ON shared_entries (expires_at);
+            CREATE TABLE IF NOT EXISTS shared_leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+        self.reads = 0
+        self.hits = 0
+        self.writes = 0
+
+    # ----- 값 -----
+    def get(self, namespace, key):
+        """만료 전 값 → (값, 만료 시각) 또는 None."""
+        self.reads += 1
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM shared_entries"
+                " WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, encode_key(key), time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace, key, value, ttl):
+        self.writes += 1
+        with self._lock:
+            # REPLACE → 새 rowid (changes()가 갱신으로 인식)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO shared_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, encode_key(key), json.dumps(value, ensure_ascii=False), time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def changes(self, namespace, since=0, limit=5000):
+        """rowid since 이후 추가·갱신된 만료 전 항목 → ([(key, 값)], 마지막 rowid)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, key, value FROM shared_entries"
+                " WHERE namespace = ? AND rowid > ? AND expires_at > ? ORDER BY rowid LIMIT ?",
+                (namespace, since, time.time(), limit),
+            ).fetchall()
+        if not rows:
+            return [], since
+        return [(key, json.loads(value)) for _, key, value in rows], rows[-1][0]
+
+    def purge(self):
+        """만료 항목·임대 삭제 → 삭제한 항목 수."""
+        now = time.time()
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM shared_entries WHERE expires_at <= ?", (now,)
+            ).rowcount
+            self._conn.execute("DELETE FROM shared_leases WHERE expires_at <= ?", (now,))
+            self._conn.commit()
+        return deleted
+
+    # ----- 임대 -----
+    def acquire(self, name, ttl):
+        """name 임대 획득·연장 (비어 있거나 만료됐거나 이미 내 것이면 성공)."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO shared_leases (name, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE shared_leases.owner = excluded.owner OR shared_leases.expires_at <= ?",
+                (name, self.owner, now + ttl, now),
+            )
+            self._conn.commit()
+        return cur.rowcount == 1
+
+    def release(self, name):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM shared_leases WHERE name = ? AND owner = ?", (name, self.owner)
+            )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM shared_entries").fetchone()[0]
+            leases = self._conn.execute(
+                "SELECT COUNT(*) FROM shared_leases WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        return {
+            "path": str(self.path),
+            "owner": self.owner,
+            "entries": entries,
+            "leases": leases,
+            "reads": self.reads,
+            "hits": self.hits,
+            "writes": self.writes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,164 @@
+"""
+주문 수집 테스트. 스마트스토어·쿠팡 API 대신 bench.stub_upstream을 ASGI 전송으로 붙여 실행.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 스텁·업스트림 모듈은 import 시점에 환경변수를 읽음
+os.environ.setdefault("STUB_ORDERS", "400")
+os.environ.setdefault("STUB_LATENCY_MS", "0")
+os.environ.setdefault("STUB_JITTER_MS", "0")
+for _market in ("SMARTSTORE", "COUPANG"):
+    os.environ.setdefault(f"{_market}_RATE_PER_SEC", "1000")
+    os.environ.setdefault(f"{_market}_RATE_BURST", "1000")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+import orders  # noqa: E402
+import upstream  # noqa: E402
+from bench import stub_upstream as stub  # noqa: E402
+
+DAYS = 3
+SMARTSTORE_ID = "test-client"
+WRONG_SMARTSTORE_SECRET = "$2a$04$benchstubsaltvalue111u"
+
+
+@pytest.fixture(autouse=True)
+def markets():
+    """스마트스토어·쿠팡 클라이언트를 스텁 앱으로 교체, 토큰 캐시는 테스트마다 비움."""
+    for name in ("smartstore", "coupang"):
+        upstream._clients[name] = httpx.AsyncClient(
+            base_url="http://stub", transport=httpx.ASGITransport(app=stub.app)
+        )
+    orders._smartstore_tokens.clear()
+    yield
+    for name in ("smartstore", "coupang"):
+        asyncio.run(upstream._clients.pop(name).aclose())
+
+
+@pytest.fixture
+def store():
+    with tempfile.TemporaryDirectory() as tmp:
+        s = orders.OrderStore(Path(tmp) / "orders.sqlite3")
+        yield s
+        s.close()
+
+
+def _revenue(store, account):
+    return sum(row[4] for row in store.summary([account], 0, 99999999)["days"])
+
+
+def _stub_smartstore(since, until):
+    return [o for o in stub._orders("smartstore") if since <= o["changed_at"] < until]
+
+
+def test_smartstore_sync_is_incremental_and_skips_canceled(store):
+    source = orders.SmartstoreSource(SMARTSTORE_ID, stub.SMARTSTORE_SECRET)
+    # 스텁 주문의 변경 시각은 기동 시각(_ANCHOR)까지 → 그보다 뒤를 끝으로 잡아야 첫 수집에 전부 포함
+    now = max(int(time.time()), stub._ANCHOR + 1)
+    first = asyncio.run(orders.sync(store, source, initial_days=DAYS, now=now))
+    expected = _stub_smartstore(now - DAYS * orders.DAY, now)
+    assert expected
+    assert first["new"] == len(expected)
+    assert {o["order_id"] for o in store.orders(source.account, limit=10000)} == {
+        f"SS{o['i']}" for o in expected
+    }
+    assert _revenue(store, source.account) == sum(o["amount"] for o in expected if not o["canceled"])
+
+    # 워터마크 이후만 다시 → 새 주문 없음, 집계도 그대로
+    second = asyncio.run(orders.sync(store, source, initial_days=DAYS, now=now + 10))
+    assert second["new"] == 0
+    assert _revenue(store, source.account) == sum(o["amount"] for o in expected if not o["canceled"])
+
+
+def test_cancel_removes_order_from_daily_rollup(store):
+    row = {
+        "order_id": "SS1", "product_id": "P1", "product_name": "상품", "ordered_at": 1_700_000_000,
+        "quantity": 2, "amount": 20000, "status": "DELIVERED", "counted": True, "changed_at": 1_700_000_000,
+    }
+    assert store.upsert("acct", "smartstore", [row], 1_700_000_000) == 1
+    assert _revenue(store, "acct") == 20000
+    canceled = {**row, "status": "CANCELED", "counted": False, "changed_at": 1_700_000_100}
+    assert store.upsert("acct", "smartstore", [canceled], 1_700_000_100) == 0
+    assert _revenue(store, "acct") == 0
+    assert store.orders("acct")[0]["status"] == "CANCELED"
+
+
+def test_coupang_signed_sync_deducts_returns(store):
+    days = 30
+    source = orders.CoupangSource("test-access", stub.COUPANG_SECRET, "A0001", lookback_days=1)
+    now = int(time.time())
+    result = asyncio.run(orders.sync(store, source, initial_days=days, now=now))
+    first, last = orders._kst_date(now - days * orders.DAY), orders._kst_date(now)
+
+    def in_window(ts):
+        return ts is not None and first <= orders._kst_date(ts) <= last
+
+    expected = [o for o in stub._orders("coupang") if not o["canceled"] and in_window(o["ordered_at"])]
+    returned = [o for o in expected if in_window(o["returned_at"])]
+    assert expected and returned
+    assert len(store.orders(source.account, limit=10000)) == len(expected)
+    assert result["new"] == len(expected)
+    assert result["returns"] > 0
+    # 반품 요청 1개씩 → 남은 수량만큼 금액 비례, 전부 반품이면 제외
+    assert _revenue(store, source.account) == sum(
+        round(o["amount"] * (o["quantity"] - 1) / o["quantity"]) if o in returned else o["amount"]
+        for o in expected
+    )
+
+
+def test_returns_are_deducted_once_and_survive_refetch(store):
+    row = {
+        "order_id": "9000001:701", "product_id": "501", "product_name": "상품", "ordered_at": 1_700_000_000,
+        "quantity": 2, "amount": 20000, "status": "FINAL_DELIVERY", "counted": True, "changed_at": 1_700_000_000,
+    }
+
+    def request(receipt_id):
+        return {
+            "receipt_id": receipt_id, "order_id": row["order_id"], "quantity": 1,
+            "status": "RETURNS_COMPLETED", "created_at": 1_700_100_000,
+        }
+
+    store.upsert("acct", "coupang", [row], 1_700_000_000)
+    # 주문 행 없이 요청만 와도 저장된 주문에서 차감
+    assert store.upsert("acct", "coupang", [], 1_700_100_000, [request(1)]) == 0
+    assert _revenue(store, "acct") == 10000
+    # 발주서를 다시 받아도, 같은 요청을 다시 받아도 한 번만 차감
+    store.upsert("acct", "coupang", [row], 1_700_200_000, [request(1)])
+    assert _revenue(store, "acct") == 10000
+    assert store.summary(["acct"], 0, 99999999)["days"][0][2:4] == (1, 1)
+    store.upsert("acct", "coupang", [], 1_700_300_000, [request(2)])
+    assert store.summary(["acct"], 0, 99999999)["days"] == []
+    assert store.orders("acct")[0]["returned_quantity"] == 2
+
+
+def test_coupang_wrong_secret_fails(store):
+    source = orders.CoupangSource("test-access", "not-the-secret", "A0001")
+    with pytest.raises(orders.OrderSyncError):
+        asyncio.run(orders.sync(store, source, initial_days=DAYS))
+
+
+def test_account_is_bound_to_secret(store):
+    """같은 Client ID라도 비밀값이 다르면 다른 계정 → 저장된 주문·발급된 토큰을 쓰지 못함."""
+    owner = orders.SmartstoreSource(SMARTSTORE_ID, stub.SMARTSTORE_SECRET)
+    asyncio.run(orders.sync(store, owner, initial_days=DAYS))
+    assert store.orders(owner.account)
+
+    intruder = orders.SmartstoreSource(SMARTSTORE_ID, WRONG_SMARTSTORE_SECRET)
+    assert intruder.account != owner.account
+    assert store.orders(intruder.account) == []
+    with pytest.raises(orders.OrderSyncError):
+        asyncio.run(orders.sync(store, intruder, initial_days=DAYS))
+    assert store.orders(intruder.account) == []
+    assert store.summary([intruder.account], 0, 99999999) == {"days": [], "products": []}
+
+    coupang = orders.account_for("coupang", "A0001:test-access", stub.COUPANG_SECRET)
+    assert coupang != orders.account_for("coupang", "A0001:test-access", "not-the-secret")
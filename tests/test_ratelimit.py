@@ -0,0 +1,88 @@
+"""
+토큰 버킷 대기 취소 시 반납 + Governor 유휴 키 정리 테스트.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest  # noqa: E402
+
+import ratelimit  # noqa: E402
+from ratelimit import Governor, Policy, TokenBucket  # noqa: E402
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", c)
+    return c
+
+
+def test_cancelled_waiter_refunds_reservation():
+    bucket = TokenBucket(rate=10, burst=1)
+
+    async def run():
+        await bucket.acquire(1.0)
+        waiter = asyncio.create_task(bucket.acquire(1.0))
+        await asyncio.sleep(0.01)
+        assert bucket.tokens < 0
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(run())
+    bucket._refill()
+    # 취소된 예약이 남아 있었다면 -1 근처에서 시작해 아직 0 미만
+    assert bucket.tokens >= 0
+
+
+def _governor(idle_ttl=60):
+    return Governor(
+        [
+            Policy("memo", "kakao", "/", rate=1, burst=2),
+            Policy("search", "naver", "/", rate=1, burst=2, daily_limit=100),
+        ],
+        idle_ttl=idle_ttl,
+    )
+
+
+def test_idle_keys_are_dropped(clock):
+    gov = _governor()
+
+    async def run():
+        for i in range(50):
+            await gov.acquire("kakao", "/v2/api/talk/memo", f"token-{i}")
+        assert len(gov._states) == 50
+        clock.now += 61
+        await gov.acquire("kakao", "/v2/api/talk/memo", "fresh")
+
+    asyncio.run(run())
+    assert list(gov._states) == [("memo", "fresh")]
+
+
+def test_recent_throttled_and_quota_keys_are_kept(clock):
+    gov = _governor()
+
+    async def run():
+        await gov.acquire("naver", "/v1/search/shop.json", "quota")
+        await gov.acquire("kakao", "/v2/api/talk/memo", "idle")
+        gov.backoff("kakao", "/v2/api/talk/memo", "paused", 600)
+        clock.now += 61
+        await gov.acquire("kakao", "/v2/api/talk/memo", "recent")
+
+    asyncio.run(run())
+    # 오늘 쿼터를 쓴 키·토큰 지급이 멈춘 키는 지우면 한도가 초기화되므로 남김
+    assert set(gov._states) == {("search", "quota"), ("memo", "paused"), ("memo", "recent")}
+    assert gov.remaining("naver", "/v1/search/shop.json", "quota") == 99
@@ -0,0 +1,172 @@
+"""
+회로 차단기 상태 전이 + upstream.request 재시도·헤지·시험 호출 반납 테스트 (httpx.MockTransport로 업스트림 대체).
+
+    python -m pytest -q tests
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+import upstream  # noqa: E402
+from ratelimit import RateLimited  # noqa: E402
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, LatencyTracker  # noqa: E402
+
+SHOP = "/v1/search/shop.json"
+
+
+# ---------- CircuitBreaker ----------
+def _tripped(open_for=60.0):
+    b = CircuitBreaker(window=60, min_calls=4, failure_rate=0.5, open_for=open_for)
+    for failed in (False, True, False, True):
+        assert b.allow()
+        b.record(failed)
+    return b
+
+
+def test_breaker_opens_at_failure_rate():
+    b = CircuitBreaker(window=60, min_calls=4, failure_rate=0.5, open_for=60)
+    for failed in (True, True, True):
+        b.record(failed)
+    assert b.state == CLOSED  # min_calls 전에는 실패율과 상관없이 닫힘
+    b.record(False)
+    assert b.state == OPEN
+    assert not b.allow()
+    assert b.rejected == 1
+    assert b.trips == 1
+
+
+def test_breaker_half_open_allows_single_probe():
+    b = _tripped(open_for=0)
+    assert b.allow()
+    assert b.state == HALF_OPEN
+    assert not b.allow()  # 시험 호출 중에는 나머지 거절
+    b.record(False)
+    assert b.state == CLOSED
+    assert b.snapshot()["calls"] == 0
+    assert b.allow()
+
+
+def test_breaker_failed_probe_reopens():
+    b = _tripped(open_for=0)
+    assert b.allow()
+    b.record(True)
+    assert b.state == OPEN
+    assert b.trips == 2
+
+
+def test_breaker_release_returns_probe_slot():
+    b = _tripped(open_for=0)
+    assert b.allow()
+    b.release()
+    assert b.state == HALF_OPEN
+    assert b.allow()
+
+
+# ---------- upstream.request ----------
+@pytest.fixture
+def naver():
+    """네이버 클라이언트를 handler 기반 MockTransport로 교체. 엔드포인트별 차단기·지연·헤지 기록은 테스트마다 초기화."""
+    calls = []
+    responses = []
+
+    async def handler(request):
+        calls.append(request)
+        respond = responses.pop(0) if responses else (lambda: httpx.Response(200, json={"items": []}))
+        result = respond()
+        return await result if asyncio.iscoroutine(result) else result
+
+    for state in (upstream._breakers, upstream._latency, upstream._hedge_budget):
+        state.clear()
+    client = httpx.AsyncClient(base_url="http://naver", transport=httpx.MockTransport(handler))
+    upstream._clients["naver"] = client
+    yield calls, responses
+    upstream._clients.pop("naver", None)
+    asyncio.run(client.aclose())
+
+
+def _headers(name):
+    # API 키별 토큰 버킷이 따로라 테스트끼리 속도 제한을 나눠 쓰지 않음
+    return {"X-Naver-Client-Id": f"test-{name}"}
+
+
+def test_retries_idempotent_5xx(naver, monkeypatch):
+    calls, responses = naver
+    monkeypatch.setattr(upstream, "RETRY_BASE", 0.001)
+    responses += [lambda: httpx.Response(503), lambda: httpx.Response(502)]
+    res = asyncio.run(upstream.request("naver", "GET", SHOP, headers=_headers("retry")))
+    assert res.status_code == 200
+    assert len(calls) == 3
+
+
+def test_retry_gives_up_after_retries(naver, monkeypatch):
+    calls, responses = naver
+    monkeypatch.setattr(upstream, "RETRY_BASE", 0.001)
+    responses += [lambda: httpx.Response(500)] * 10
+    res = asyncio.run(upstream.request("naver", "GET", SHOP, headers=_headers("exhaust")))
+    assert res.status_code == 500
+    assert len(calls) == upstream.RETRIES + 1
+
+
+def test_post_is_not_retried_unless_idempotent(naver, monkeypatch):
+    calls, responses = naver
+    monkeypatch.setattr(upstream, "RETRY_BASE", 0.001)
+    responses += [lambda: httpx.Response(503)] * 2
+    res = asyncio.run(upstream.request("naver", "POST", "/v1/datalab/search", headers=_headers("post"), json={}))
+    assert res.status_code == 503
+    assert len(calls) == 1
+
+    responses[:] = [lambda: httpx.Response(503)]
+    res = asyncio.run(upstream.request(
+        "naver", "POST", "/v1/datalab/search", idempotent=True, headers=_headers("post"), json={}
+    ))
+    assert res.status_code == 200
+    assert len(calls) == 3
+
+
+def test_hedge_wins_over_slow_first_call(naver):
+    calls, responses = naver
+
+    async def slow():
+        await asyncio.sleep(1.0)
+        return httpx.Response(200, json={"items": ["slow"]})
+
+    responses.append(slow)
+    tracker = upstream._latency[("naver", "shop.json")] = LatencyTracker(every=1, min_samples=1)
+    tracker.observe(0.01)
+    started = time.monotonic()
+    res = asyncio.run(upstream.request("naver", "GET", SHOP, headers=_headers("hedge")))
+    assert time.monotonic() - started < 0.5
+    assert res.json() == {"items": []}
+    assert len(calls) == 2
+    assert upstream._hedge_budget[("naver", "shop.json")][1] == 1
+
+
+def test_open_circuit_rejects_without_calling(naver):
+    calls, _ = naver
+    b = upstream.breaker("naver", "shop.json")
+    b.state, b.opened_at = OPEN, time.monotonic()
+    with pytest.raises(CircuitOpen):
+        asyncio.run(upstream.request("naver", "GET", SHOP, headers=_headers("open")))
+    assert calls == []
+
+
+def test_rate_limited_probe_releases_slot(naver):
+    """half-open 시험 호출이 속도 제한에 걸려도 자리를 돌려줘야 다음 호출이 시험할 수 있음."""
+    calls, _ = naver
+    b = upstream.breaker("naver", "shop.json")
+    b.state, b.opened_at = OPEN, time.monotonic() - b.open_for
+    upstream.governor.backoff("naver", SHOP, "test-probe-limited", 60)
+    with pytest.raises(RateLimited):
+        asyncio.run(upstream.request("naver", "GET", SHOP, headers=_headers("probe-limited")))
+    assert calls == []
+    assert b.state == HALF_OPEN
+
+    res = asyncio.run(upstream.request("naver", "GET", SHOP, headers=_headers("probe-ok")))
+    assert res.status_code == 200
+    assert b.state == CLOSED
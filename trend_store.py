@@ -0,0 +1,130 @@
+"""
+데이터랩 월별 트렌드 시계열 영구 저장소 (SQLite, 외부 서비스 없음).
+- 키: (keyword, startDate, endDate, timeUnit) → 날짜 창이 바뀌면 자연히 무효화
+- 시작 시 현재 창의 행을 메모리로 올려두고, 지난 창의 행은 삭제
+- 삭제 전 stale_ttl(초) 안에 받은 지난 창 시계열은 메모리에 남겨 새 창을 받는 동안 대신 응답 (stale-while-revalidate)
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class TrendStore:
+    def __init__(self, path, stale_ttl=2 * 86400):
+        self.path = Path(path)
+        self.stale_ttl = stale_ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS trend_series (
+                keyword TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                time_unit TEXT NOT NULL,
+                ratios TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (keyword, start_date, end_date, time_unit)
+            )
+            """
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._memory = {}  # (keyword, start, end, unit) → ratios
+        self._previous = {}  # (keyword, unit) → 지난 창 ratios
+        self._window = None
+
+    def warm(self, start_date, end_date, time_unit="month"):
+        """현재 창 행을 메모리로 적재하고 지난 창 행은 삭제. 적재한 키워드 수 반환."""
+        with self._lock:
+            self._window = (start_date, end_date, time_unit)
+            stale_rows = self._conn.execute(
+                "SELECT keyword, ratios FROM trend_series"
+                " WHERE time_unit = ? AND (start_date != ? OR end_date != ?) AND fetched_at >= ?"
+                " ORDER BY end_date",
+                (time_unit, start_date, end_date, time.time() - self.stale_ttl),
+            ).fetchall()
+            if stale_rows:
+                # 같은 키워드는 가장 최근 창 (end_date 순 정렬 → 마지막 값)
+                self._previous = {(kw, time_unit): json.loads(ratios) for kw, ratios in stale_rows}
+            self._conn.execute(
+                "DELETE FROM trend_series WHERE time_unit = ? AND (start_date != ? OR end_date != ?)",
+                (time_unit, start_date, end_date),
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT keyword, ratios FROM trend_series"
+                " WHERE start_date = ? AND end_date = ? AND time_unit = ?",
+                (start_date, end_date, time_unit),
+            ).fetchall()
+            self._memory = {
+                (keyword, start_date, end_date, time_unit): json.loads(ratios)
+                for keyword, ratios in rows
+            }
+        return len(rows)
+
+    def get_many(self, keywords, start_date, end_date, time_unit="month"):
+        """저장된 시계열 → {keyword: ratios}. 없는 키워드는 빠짐."""
+        if self._window != (start_date, end_date, time_unit):
+            self.warm(start_date, end_date, time_unit)
+        found = {}
+        missing = []
+        for kw in keywords:
+            ratios = self._memory.get((kw, start_date, end_date, time_unit))
+            if ratios is None:
+                missing.append(kw)
+            else:
+                found[kw] = ratios
+        if not missing:
+            return found
+        # 날짜 창이 바뀐 뒤 다른 프로세스가 먼저 채운 행 확인
+        with self._lock:
+            placeholders = ",".join("?" * len(missing))
+            rows = self._conn.execute(
+                f"SELECT keyword, ratios FROM trend_series WHERE keyword IN ({placeholders})"
+                " AND start_date = ? AND end_date = ? AND time_unit = ?",
+                (*missing, start_date, end_date, time_unit),
+            ).fetchall()
+        for kw, ratios in rows:
+            found[kw] = self._memory[(kw, start_date, end_date, time_unit)] = json.loads(ratios)
+        return found
+
+    def get_stale_many(self, keywords, time_unit="month"):
+        """지난 창 시계열 → {keyword: ratios}. 없는 키워드는 빠짐."""
+        found = {}
+        for kw in keywords:
+            ratios = self._previous.get((kw, time_unit))
+            if ratios is not None:
+                found[kw] = ratios
+        return found
+
+    def put_many(self, series, start_date, end_date, time_unit="month"):
+        """{keyword: ratios} 저장."""
+        if not series:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO trend_series VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (kw, start_date, end_date, time_unit, json.dumps(ratios), now)
+                    for kw, ratios in series.items()
+                ],
+            )
+            self._conn.commit()
+        for kw, ratios in series.items():
+            self._memory[(kw, start_date, end_date, time_unit)] = ratios
+
+    def stats(self):
+        return {
+            "path": str(self.path),
+            "memory_entries": len(self._memory),
+            "stale_entries": len(self._previous),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,406 @@
+"""
+업스트림(네이버 / 도매꾹 / 카카오 / 스마트스토어 / 쿠팡) 공용 HTTP 클라이언트.
+- 호스트별 httpx.AsyncClient 1개를 앱 수명(lifespan) 동안 재사용 → TCP/TLS 핸드셰이크 절약
+- 커넥션 풀·keep-alive·타임아웃은 환경변수로 조정
+- 엔드포인트 × API 키별 속도 제한·일일 쿼터 (ratelimit.Governor)
+- 요청 마감 시각 안에서만 호출, 엔드포인트별 회로 차단, 멱등 요청 재시도(지수 백오프 + 지터),
+  GET은 p95보다 늦으면 같은 요청 1건 더 보내 먼저 온 응답 사용 (resilience)
+"""
+import asyncio
+import importlib.util
+import os
+import random
+import re
+import time
+
+import httpx
+
+import metrics
+import resilience
+from ratelimit import Governor, Policy, UpstreamLimited
+from resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, LatencyTracker
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# gunicorn 워커 수. 속도 제한·일일 쿼터는 프로세스별로 세므로 워커 수로 나눠 서버 전체 한도를 지킴
+WORKERS = max(1, _env_int("WEB_CONCURRENCY", 1))
+
+
+def _per_worker(value):
+    if not value:
+        return value
+    return max(1, value // WORKERS) if isinstance(value, int) else value / WORKERS
+
+
+# 업스트림 이름 → 기본 URL (로컬 스텁 서버로 돌릴 때 환경변수로 교체)
+UPSTREAMS = {
+    "naver": os.environ.get("NAVER_API_BASE", "https://openapi.naver.com"),
+    "domeggook": os.environ.get("DOMEGGOOK_API_BASE", "https://domeggook.com"),
+    "kakao": os.environ.get("KAKAO_API_BASE", "https://kapi.kakao.com"),
+    # 카카오 토큰 갱신은 인증 서버(kauth)
+    "kakao_auth": os.environ.get("KAKAO_AUTH_BASE", "https://kauth.kakao.com"),
+    "smartstore": os.environ.get("SMARTSTORE_API_BASE", "https://api.commerce.naver.com"),
+    "coupang": os.environ.get("COUPANG_API_BASE", "https://api-gateway.coupang.com"),
+}
+
+# HTTP/2 사용 호스트 (h2 패키지가 없으면 전부 HTTP/1.1)
+HTTP2_UPSTREAMS = {
+    name.strip()
+    for name in os.environ.get("UPSTREAM_HTTP2", "naver,kakao").split(",")
+    if name.strip()
+}
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+LIMITS = httpx.Limits(
+    max_connections=_env_int("UPSTREAM_MAX_CONNECTIONS", 100),
+    max_keepalive_connections=_env_int("UPSTREAM_MAX_KEEPALIVE", 20),
+    keepalive_expiry=_env_float("UPSTREAM_KEEPALIVE_EXPIRY", 30.0),
+)
+TIMEOUT = httpx.Timeout(
+    connect=_env_float("UPSTREAM_CONNECT_TIMEOUT", 3.0),
+    read=_env_float("UPSTREAM_READ_TIMEOUT", 10.0),
+    write=_env_float("UPSTREAM_WRITE_TIMEOUT", 10.0),
+    pool=_env_float("UPSTREAM_POOL_TIMEOUT", 5.0),
+)
+
+# 네이버: Client ID 단위 (검색 25,000회/일, 데이터랩·쇼핑인사이트 각 1,000회/일)
+# 도매꾹: 사용자 API 키 단위, 카카오: 액세스 토큰 단위. 값은 서버 전체 기준 (워커별로 나눠 적용)
+governor = Governor(
+    [
+        Policy(
+            "naver.shop", "naver", "/v1/search/",
+            rate=_per_worker(_env_float("NAVER_RATE_PER_SEC", 10.0)),
+            burst=_per_worker(_env_int("NAVER_RATE_BURST", 10)),
+            daily_limit=_per_worker(_env_int("NAVER_SEARCH_DAILY_LIMIT", 25000)),
+        ),
+        Policy(
+            "naver.datalab", "naver", "/v1/datalab/search",
+            rate=_per_worker(_env_float("NAVER_RATE_PER_SEC", 10.0)),
+            burst=_per_worker(_env_int("NAVER_RATE_BURST", 10)),
+            daily_limit=_per_worker(_env_int("NAVER_DATALAB_DAILY_LIMIT", 1000)),
+        ),
+        Policy(
+            "naver.shopping_insight", "naver", "/v1/datalab/shopping/",
+            rate=_per_worker(_env_float("NAVER_RATE_PER_SEC", 10.0)),
+            burst=_per_worker(_env_int("NAVER_RATE_BURST", 10)),
+            daily_limit=_per_worker(_env_int("NAVER_INSIGHT_DAILY_LIMIT", 1000)),
+        ),
+        Policy(
+            "domeggook", "domeggook", "/",
+            rate=_per_worker(_env_float("DOMEGGOOK_RATE_PER_SEC", 5.0)),
+            burst=_per_worker(_env_int("DOMEGGOOK_RATE_BURST", 10)),
+            daily_limit=_per_worker(_env_int("DOMEGGOOK_DAILY_LIMIT", 0)),
+        ),
+        Policy(
+            "kakao.memo", "kakao", "/",
+            rate=_per_worker(_env_float("KAKAO_RATE_PER_SEC", 5.0)),
+            burst=_per_worker(_env_int("KAKAO_RATE_BURST", 5)),
+        ),
+        Policy(
+            "kakao.auth", "kakao_auth", "/",
+            rate=_per_worker(_env_float("KAKAO_RATE_PER_SEC", 5.0)),
+            burst=_per_worker(_env_int("KAKAO_RATE_BURST", 5)),
+        ),
+        # 커머스API·쿠팡 Wing: 판매자 계정 단위 초당 호출 제한
+        Policy(
+            "smartstore", "smartstore", "/",
+            rate=_per_worker(_env_float("SMARTSTORE_RATE_PER_SEC", 2.0)),
+            burst=_per_worker(_env_int("SMARTSTORE_RATE_BURST", 2)),
+        ),
+        Policy(
+            "coupang", "coupang", "/",
+            rate=_per_worker(_env_float("COUPANG_RATE_PER_SEC", 5.0)),
+            burst=_per_worker(_env_int("COUPANG_RATE_BURST", 5)),
+        ),
+    ],
+    max_wait=_env_float("RATE_LIMIT_MAX_WAIT", 2.0),
+    # 이 시간 동안 안 쓴 토큰·키의 속도 제한 상태는 정리 (사용자 토큰마다 상태가 쌓이지 않게)
+    idle_ttl=_env_float("RATE_LIMIT_IDLE_SEC", 600.0),
+)
+
+# 회로 차단: 엔드포인트별 최근 BREAKER_WINDOW초 호출 중 실패(연결 오류·타임아웃·5xx) 비율 기준
+BREAKER_WINDOW = _env_float("BREAKER_WINDOW", 30.0)
+BREAKER_MIN_CALLS = _env_int("BREAKER_MIN_CALLS", 10)
+BREAKER_FAILURE_RATE = _env_float("BREAKER_FAILURE_RATE", 0.5)
+BREAKER_OPEN_SEC = _env_float("BREAKER_OPEN_SEC", 15.0)
+# 요청 마감에 잘린 호출은 이 시간 이상 걸렸을 때만 실패로 셈 (남은 시간이 짧았던 요청 탓은 제외)
+BREAKER_SLOW_CALL = _env_float("BREAKER_SLOW_CALL", 2.0)
+# 멱등 요청 재시도 (연결 오류·타임아웃·500/502/503/504)
+RETRIES = _env_int("UPSTREAM_RETRIES", 2)
+RETRY_BASE = _env_float("UPSTREAM_RETRY_BASE", 0.1)
+RETRY_STATUSES = {500, 502, 503, 504}
+# 헤지: 해당 업스트림 GET이 p95(최소 HEDGE_MIN_DELAY초)까지 안 오면 1건 더. 헤지 수는 요청 수의 HEDGE_MAX_RATIO 이하
+HEDGE_UPSTREAMS = {
+    name.strip()
+    for name in os.environ.get("UPSTREAM_HEDGE", "naver,domeggook").split(",")
+    if name.strip()
+}
+HEDGE_MIN_DELAY = _env_float("UPSTREAM_HEDGE_MIN_DELAY", 0.05)
+HEDGE_MAX_RATIO = _env_float("UPSTREAM_HEDGE_MAX_RATIO", 0.1)
+
+_clients = {}
+_breakers = {}  # (업스트림, 엔드포인트) → CircuitBreaker
+_latency = {}  # (업스트림, 엔드포인트) → LatencyTracker
+_hedge_budget = {}  # (업스트림, 엔드포인트) → [요청 수, 헤지 수]
+
+
+def _build_client(name):
+    return httpx.AsyncClient(
+        base_url=UPSTREAMS[name],
+        limits=LIMITS,
+        timeout=TIMEOUT,
+        http2=_HTTP2_AVAILABLE and name in HTTP2_UPSTREAMS,
+    )
+
+
+def client(name):
+    """업스트림 이름으로 공용 클라이언트 반환. lifespan 밖(테스트 등)에서는 지연 생성."""
+    c = _clients.get(name)
+    if c is None or c.is_closed:
+        c = _clients[name] = _build_client(name)
+    return c
+
+
+async def open_clients():
+    for name in UPSTREAMS:
+        client(name)
+
+
+async def close_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    for c in clients:
+        await c.aclose()
+
+
+def api_key_for(name, headers=None, params=None):
+    """속도 제한·쿼터를 나눌 키: 네이버 Client ID / 도매꾹 aid / 쿠팡 access-key / 카카오·스마트스토어 토큰."""
+    headers = headers or {}
+    if name == "naver":
+        return headers.get("X-Naver-Client-Id", "")
+    if name == "domeggook":
+        return str((params or {}).get("aid", ""))
+    if name == "coupang":
+        # 서명 헤더는 요청마다 달라짐 → access-key만
+        match = re.search(r"access-key=([^,\s]+)", headers.get("Authorization", ""))
+        return match.group(1) if match else ""
+    return headers.get("Authorization", "")
+
+
+def endpoint_label(name, url, params=None):
+    """메트릭용 엔드포인트 이름: shop.json, datalab/search, getItemList, memo ..."""
+    if name == "naver":
+        return url.replace("/v1/search/", "").replace("/v1/", "")
+    if name == "domeggook":
+        return str((params or {}).get("cmd", url))
+    if name == "kakao":
+        return "memo" if "/memo/" in url else url.rstrip("/").rsplit("/", 1)[-1]
+    if name == "kakao_auth":
+        return url.rstrip("/").rsplit("/", 1)[-1]
+    if name == "smartstore":
+        return url.rstrip("/").rsplit("/", 1)[-1]
+    if name == "coupang":
+        return url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+    return url
+
+
+def breaker(name, endpoint):
+    b = _breakers.get((name, endpoint))
+    if b is None:
+        b = _breakers[(name, endpoint)] = CircuitBreaker(
+            BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_FAILURE_RATE, BREAKER_OPEN_SEC
+        )
+    return b
+
+
+def circuits():
+    """엔드포인트별 회로 상태 (관리용)."""
+    out = []
+    for (name, endpoint), b in _breakers.items():
+        tracker = _latency.get((name, endpoint))
+        p95 = tracker.p95() if tracker else None
+        requests, hedges = _hedge_budget.get((name, endpoint), (0, 0))
+        out.append({
+            "upstream": name,
+            "endpoint": endpoint,
+            **b.snapshot(),
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "hedges": hedges,
+            "requests": requests,
+        })
+    return out
+
+
+async def _acquire(name, url, key, endpoint, max_wait=None):
+    """속도 제한·쿼터 허가. 대기는 요청 남은 시간까지만."""
+    budget = resilience.remaining()
+    if budget is not None:
+        if budget <= 0:
+            metrics.upstream_errors.inc(name, endpoint, "DeadlineExceeded")
+            raise DeadlineExceeded("요청 처리 시간이 초과되었습니다.")
+        max_wait = min(governor.max_wait if max_wait is None else max_wait, budget)
+    try:
+        await governor.acquire(name, url, key, max_wait)
+    except UpstreamLimited as e:
+        metrics.upstream_errors.inc(name, endpoint, type(e).__name__)
+        raise
+
+
+async def _send(name, method, url, endpoint, kwargs):
+    """업스트림 1회 호출 (요청 남은 시간으로 제한). 결과를 회로 차단기·지연 추적에 기록."""
+    b = breaker(name, endpoint)
+    budget = resilience.remaining()
+    started = time.perf_counter()
+    metrics.upstream_in_flight.inc(name)
+    try:
+        call = client(name).request(method, url, **kwargs)
+        res = await (call if budget is None else asyncio.wait_for(call, max(budget, 0.001)))
+    except asyncio.TimeoutError:
+        metrics.upstream_errors.inc(name, endpoint, "DeadlineExceeded")
+        if time.perf_counter() - started >= BREAKER_SLOW_CALL:
+            b.record(True)
+        else:
+            b.release()
+        raise DeadlineExceeded("업스트림 응답이 늦어 요청 처리 시간을 넘었습니다.") from None
+    except httpx.TransportError as e:
+        metrics.upstream_errors.inc(name, endpoint, type(e).__name__)
+        b.record(True)
+        raise
+    except BaseException as e:
+        # 헤지에서 진 쪽 취소 등 → 결과 없음
+        if not isinstance(e, asyncio.CancelledError):
+            metrics.upstream_errors.inc(name, endpoint, type(e).__name__)
+        b.release()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.upstream_in_flight.dec(name)
+        metrics.upstream_latency.observe(elapsed, name, endpoint)
+    metrics.upstream_requests.inc(name, endpoint, str(res.status_code))
+    b.record(res.status_code >= 500)
+    if res.status_code < 400:
+        _latency.setdefault((name, endpoint), LatencyTracker()).observe(elapsed)
+    return res
+
+
+async def _hedge_permit(name, url, key, endpoint):
+    """헤지 1건 허가: 헤지 비율 한도 안 + 속도 제한 토큰을 기다리지 않고 받을 수 있을 때만."""
+    budget = _hedge_budget[(name, endpoint)]
+    if budget[1] >= budget[0] * HEDGE_MAX_RATIO:
+        return False
+    try:
+        await governor.acquire(name, url, key, max_wait=0)
+    except UpstreamLimited:
+        return False
+    budget[1] += 1
+    return True
+
+
+async def _hedged(name, method, url, key, endpoint, kwargs):
+    """GET 1회. p95까지 응답이 없으면 같은 요청 1건 더 보내고 먼저 성공한 응답 사용."""
+    tracker = _latency.get((name, endpoint))
+    delay = tracker.p95() if tracker else None
+    budget = resilience.remaining()
+    first = asyncio.ensure_future(_send(name, method, url, endpoint, kwargs))
+    if delay is None or (budget is not None and budget <= max(delay, HEDGE_MIN_DELAY)):
+        return await first
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=max(delay, HEDGE_MIN_DELAY))
+        if not done and breaker(name, endpoint).state == "closed" and await _hedge_permit(name, url, key, endpoint):
+            metrics.upstream_hedges.inc(name, endpoint, "sent")
+            pending.add(asyncio.ensure_future(_send(name, method, url, endpoint, kwargs)))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        metrics.upstream_hedges.inc(name, endpoint, "won")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def request(name, method, url, idempotent=None, **kwargs):
+    """
+    공용 클라이언트로 요청. url은 업스트림 기본 URL 기준 경로.
+    속도 제한 대기 한도·일일 쿼터 초과 시 업스트림 호출 없이 RateLimited / QuotaExceeded,
+    회로 차단 중이면 CircuitOpen, 요청 마감이 지나면 DeadlineExceeded (모두 UpstreamLimited).
+    idempotent(기본: GET/HEAD)면 연결 오류·5xx를 남은 시간 안에서 RETRIES번까지 재시도.
+    """
+    key = api_key_for(name, kwargs.get("headers"), kwargs.get("params"))
+    endpoint = endpoint_label(name, url, kwargs.get("params"))
+    if idempotent is None:
+        idempotent = method in ("GET", "HEAD")
+    retries = RETRIES if idempotent else 0
+    hedge = method == "GET" and name in HEDGE_UPSTREAMS
+    b = breaker(name, endpoint)
+    budget = _hedge_budget.setdefault((name, endpoint), [0, 0])
+    budget[0] += 1
+    if budget[0] >= 1000:
+        # 최근 트래픽 기준 비율이 되도록 절반으로 감쇠
+        budget[0] //= 2
+        budget[1] //= 2
+    attempt = 0
+    while True:
+        if not b.allow():
+            metrics.upstream_errors.inc(name, endpoint, "CircuitOpen")
+            metrics.upstream_circuit_open.set(name, endpoint, value=1)
+            raise CircuitOpen(
+                f"{name} 응답 장애로 잠시 호출을 멈췄습니다. ({b.retry_after():.0f}초 후 다시 시도)"
+            )
+        try:
+            await _acquire(name, url, key, endpoint)
+        except BaseException:
+            # 속도 제한·쿼터·마감으로 호출 못 함 → 시험 호출 자리를 돌려줌 (안 그러면 half-open에 갇힘)
+            b.release()
+            raise
+        try:
+            if hedge:
+                res = await _hedged(name, method, url, key, endpoint, kwargs)
+            else:
+                res = await _send(name, method, url, endpoint, kwargs)
+        except httpx.TransportError:
+            metrics.upstream_circuit_open.set(name, endpoint, value=int(b.state != "closed"))
+            if not _retry_fits(attempt, retries):
+                raise
+        else:
+            metrics.upstream_circuit_open.set(name, endpoint, value=int(b.state != "closed"))
+            if res.status_code == 429:
+                try:
+                    retry_after = float(res.headers.get("Retry-After", 1))
+                except ValueError:
+                    retry_after = 1.0
+                governor.backoff(name, url, key, retry_after)
+                return res
+            if res.status_code not in RETRY_STATUSES or not _retry_fits(attempt, retries):
+                return res
+        # 지수 백오프 + full jitter
+        await asyncio.sleep(random.uniform(0, RETRY_BASE * 2 ** attempt))
+        attempt += 1
+        metrics.upstream_retries.inc(name, endpoint)
+
+
+def _retry_fits(attempt, retries):
+    """재시도 횟수가 남았고, 최대 백오프 후에도 요청 남은 시간이 있을 때."""
+    if attempt >= retries:
+        return False
+    budget = resilience.remaining()
+    return budget is None or budget > RETRY_BASE * 2 ** attempt + 0.05
@@ -0,0 +1,248 @@
+"""
+관심 상품(워치리스트) 저장소 + 알림 판단 (SQLite, 외부 서비스 없음).
+- 사용자(카카오 회원번호로 확인한 "kakao:<id>")별 (검색어, 원가, 배송비, 기준값) 등록, 카카오 토큰은 사용자 단위로 최신 값 보관
+- 액세스 토큰은 몇 시간이면 만료 → 리프레시 토큰도 보관해 주기 알림 때 갱신, 갱신도 안 되면 사용자를 stale로 표시
+- evaluate(): 주기마다 받은 시세로 기준 통과 여부 판단. 조건이 새로 성립할 때만 알림 (같은 상태 반복 알림 없음)
+- compose(): 한 사용자의 이번 주기 알림을 카카오 메모 1건으로 합침
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# 카카오 텍스트 템플릿 text 최대 길이
+KAKAO_TEXT_LIMIT = 200
+
+
+class WatchStore:
+    def __init__(self, path, max_per_user=100):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_per_user = max_per_user
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS watch_users (
+                user_id TEXT PRIMARY KEY,
+                kakao_token TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                refresh_token TEXT,
+                stale_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS watches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                query TEXT NOT NULL,
+                cost REAL NOT NULL,
+                sup_ship REAL NOT NULL,
+                mkt_ship REAL NOT NULL,
+                min_margin REAL,
+                price_below REAL,
+                price_above REAL,
+                season INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT '{}',
+                checked_at REAL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS watches_user ON watches (user_id);
+            """
+        )
+        # 리프레시 토큰 이전에 만든 DB
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(watch_users)")}
+        for column, kind in (("refresh_token", "TEXT"), ("stale_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE watch_users ADD COLUMN {column} {kind}")
+        self._conn.commit()
+
+    def set_token(self, user_id, kakao_token, refresh_token=None):
+        """최신 토큰 저장 (stale 해제). refresh_token이 None이면 저장된 리프레시 토큰 유지."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO watch_users (user_id, kakao_token, updated_at, refresh_token, stale_at)"
+                " VALUES (?, ?, ?, ?, NULL)"
+                " ON CONFLICT (user_id) DO UPDATE SET"
+                " kakao_token = excluded.kakao_token,"
+                " updated_at = excluded.updated_at,"
+                " refresh_token = COALESCE(excluded.refresh_token, refresh_token),"
+                " stale_at = NULL",
+                (user_id, kakao_token, time.time(), refresh_token),
+            )
+            self._conn.commit()
+
+    def mark_stale(self, user_id):
+        """토큰 만료 + 갱신 실패 → 다시 로그인할 때까지 알림을 못 보내는 사용자로 표시."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE watch_users SET stale_at = COALESCE(stale_at, ?) WHERE user_id = ?",
+                (time.time(), user_id),
+            )
+            self._conn.commit()
+
+    def user_status(self, user_id):
+        """알림 수신 상태 → {registered, refreshable, stale, stale_since}."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT refresh_token, stale_at FROM watch_users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return {"registered": False, "refreshable": False, "stale": False, "stale_since": None}
+        return {
+            "registered": True,
+            "refreshable": bool(row["refresh_token"]),
+            "stale": row["stale_at"] is not None,
+            "stale_since": row["stale_at"],
+        }
+
+    def claim(self, user_id, kakao_token):
+        """
+        클라이언트가 정한 user_id로 저장된 예전 항목 중 같은 카카오 토큰으로 등록된 것을 확인된 user_id로 옮김
+        → 옮긴 관심 상품 수.
+        """
+        with self._lock:
+            legacy = [
+                r[0] for r in self._conn.execute(
+                    "SELECT user_id FROM watch_users WHERE kakao_token = ? AND user_id != ?",
+                    (kakao_token, user_id),
+                ).fetchall()
+                if not r[0].startswith("kakao:")
+            ]
+            if not legacy:
+                return 0
+            placeholders = ",".join("?" * len(legacy))
+            moved = self._conn.execute(
+                f"UPDATE watches SET user_id = ? WHERE user_id IN ({placeholders})", [user_id, *legacy]
+            ).rowcount
+            self._conn.execute(f"DELETE FROM watch_users WHERE user_id IN ({placeholders})", legacy)
+            self._conn.commit()
+        return moved
+
+    def tokens(self, user_ids):
+        """user_id 목록 → {user_id: (액세스 토큰, 리프레시 토큰 또는 None)}."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        placeholders = ",".join("?" * len(user_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT user_id, kakao_token, refresh_token FROM watch_users WHERE user_id IN ({placeholders})",
+                user_ids,
+            ).fetchall()
+        return {r["user_id"]: (r["kakao_token"], r["refresh_token"]) for r in rows}
+
+    def add(self, user_id, watch):
+        """watch: {query, cost, sup_ship, mkt_ship, min_margin, price_below, price_above, season} → id."""
+        with self._lock:
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM watches WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+            if count >= self.max_per_user:
+                raise ValueError(f"사용자당 최대 {self.max_per_user}개까지 등록할 수 있습니다.")
+            cur = self._conn.execute(
+                "INSERT INTO watches (user_id, query, cost, sup_ship, mkt_ship, min_margin,"
+                " price_below, price_above, season, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    user_id,
+                    watch["query"],
+                    watch["cost"],
+                    watch["sup_ship"],
+                    watch["mkt_ship"],
+                    watch.get("min_margin"),
+                    watch.get("price_below"),
+                    watch.get("price_above"),
+                    1 if watch.get("season") else 0,
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+        return cur.lastrowid
+
+    def remove(self, user_id, watch_id):
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM watches WHERE id = ? AND user_id = ?", (watch_id, user_id)
+            ).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def list(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                rows = self._conn.execute("SELECT * FROM watches ORDER BY id").fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM watches WHERE user_id = ? ORDER BY id", (user_id,)
+                ).fetchall()
+        return [{**dict(r), "season": bool(r["season"]), "state": json.loads(r["state"])} for r in rows]
+
+    def save_states(self, states, checked_at=None):
+        """{watch_id: state} 일괄 저장."""
+        if not states:
+            return
+        checked_at = checked_at or time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE watches SET state = ?, checked_at = ? WHERE id = ?",
+                [(json.dumps(s, ensure_ascii=False), checked_at, wid) for wid, s in states.items()],
+            )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            watches, users, queries = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT user_id), COUNT(DISTINCT query) FROM watches"
+            ).fetchone()
+        return {"path": str(self.path), "watches": watches, "users": users, "queries": queries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def evaluate(watch, snapshot):
+    """
+    watch + 이번 주기 시세 snapshot {avg_price, best_market, best_margin, season} → (알림 문구 목록, 새 state).
+    기준 조건은 거짓→참으로 바뀔 때만 알림. 시즌은 이전 값이 있고 달라졌을 때만.
+    """
+    prev = watch.get("state") or {}
+    price = snapshot["avg_price"]
+    best = snapshot["best_margin"]
+    state = {
+        "avg_price": price,
+        "best_market": snapshot["best_market"],
+        "best_margin": best,
+        "season": snapshot.get("season") or prev.get("season"),
+        "margin_low": watch.get("min_margin") is not None and best < watch["min_margin"],
+        "price_low": watch.get("price_below") is not None and price <= watch["price_below"],
+        "price_high": watch.get("price_above") is not None and price >= watch["price_above"],
+    }
+    query = watch["query"]
+    events = []
+    if state["margin_low"] and not prev.get("margin_low"):
+        events.append(f"{query}: 최고 마진 {best}% ({snapshot['best_market']}) — 기준 {watch['min_margin']:g}% 미만")
+    elif prev.get("margin_low") and not state["margin_low"] and watch.get("min_margin") is not None:
+        events.append(f"{query}: 마진 회복 {best}% ({snapshot['best_market']})")
+    if state["price_low"] and not prev.get("price_low"):
+        events.append(f"{query}: 시중 평균가 {price:,}원 — {int(watch['price_below']):,}원 이하")
+    if state["price_high"] and not prev.get("price_high"):
+        events.append(f"{query}: 시중 평균가 {price:,}원 — {int(watch['price_above']):,}원 이상")
+    if watch.get("season") and snapshot.get("season") and prev.get("season") not in (None, snapshot["season"]):
+        events.append(f"{query}: 시즌 {prev['season']} → {snapshot['season']}")
+    return events, state
+
+
+def compose(events, limit=KAKAO_TEXT_LIMIT):
+    """알림 문구 목록 → 카카오 메모 1건 텍스트 (길이 초과분은 '외 N건')."""
+    text = "[셀러마진 관심상품 알림]"
+    for i, line in enumerate(events):
+        rest = len(events) - i
+        candidate = f"{text}\n• {line}"
+        # 마지막 줄이 아니면 '외 N건' 자리를 남겨둠
+        reserve = 0 if rest == 1 else len(f"\n외 {rest - 1}건")
+        if len(candidate) + reserve > limit:
+            return f"{text}\n외 {rest}건"
+        text = candidate
+    return text